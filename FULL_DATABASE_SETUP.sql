@@ -76,3 +76,12 @@ $$ LANGUAGE plpgsql;
 
 -- 7. Buckets de Storage (Execute manualmente no Dashboard se falhar)
 -- Certifique-se de criar o bucket 'product-images' como PÚBLICO.
+
+-- 8. Controle de versão do schema (lido no cold start do app)
+-- Migrações posteriores: rode `python migrations.py` com DATABASE_URL definido.
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+INSERT INTO schema_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
@@ -1,12 +1,31 @@
 import os
+import json
 import urllib.parse
-import requests
-import re
 from flask import Flask, render_template, request, session, redirect, url_for, jsonify
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from pix_utils import PixGenerator
+from pix_utils import PixGenerator, QRCache, QR_MIME_TYPES, payload_hash
+from migrations import check_schema, LATEST_VERSION
+from cache_utils import StoreCache
+from catalog_utils import fetch_catalog_page, fetch_search_page, parse_limit
+from search_utils import SearchIndex
+from click_utils import ClickCounter
+from cachetools import TTLCache
+from checkout_utils import place_order, describe_failure, is_product_id
+from image_utils import (download_and_persist, download_and_persist_many, rank_image_candidates, default_index,
+                         persist_image, content_type_for, srcset, pick_rendition)
+from scraper_utils import fetch_product_data, default_strategy_stats, default_scrape_cache
+from marketing_utils import optimize_marketing_data
+from import_utils import CatalogImporter, detect_format, DEFAULT_BATCH_SIZE, IMPORT_SYNC_MAX_ROWS
+import http_utils
+import trace_utils
+from upload_utils import (UploadRequest, upload_limit, open_image_upload, MAX_UPLOAD_BYTES, LOGO_MAX_BYTES,
+                          PRODUCT_IMAGE_MAX_BYTES, IMPORT_MAX_BYTES)
+from dashboard_utils import empty_stats, fetch_store_stats, fetch_orders_page, fetch_products_page, ORDER_STATUSES, parse_day, fetch_sales_summary
 import uuid
+from datetime import datetime, timezone
+import threading
+import tempfile
 import urllib3
 import httpx
 import ssl
@@ -44,6 +63,8 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 load_dotenv()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 app.secret_key = os.getenv("SECRET_KEY", "prod_secret_vapt123")
 app.config['PERMANENT_SESSION_LIFETIME'] = 60 * 60 * 24 * 7  # 7 dias
 app.config['SESSION_PERMANENT'] = True
@@ -57,55 +78,57 @@ key: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 # Nota: Como ClientOptions não aceita verify diretamente em algumas versões,
 # mantemos as opções padrão e garantimos que o httpx ignore SSL se houver erro global.
 supabase: Client = create_client(url, key)
+# Conta/cronometra as idas ao PostgREST/Storage por requisição (Server-Timing + log)
+trace_utils.instrument_supabase(supabase, url)
+trace_utils.init_app(app)
 
-# --- AUTO SETUP DO BANCO/SCHEMA ---
-def init_db():
-    try:
-        # Garantir Store padrão
-        res = supabase.table('stores').select("id").eq('slug', 'default').execute()
-        if not res.data:
-            supabase.table('stores').insert({
-                "slug": "default",
-                "name": "Venda Vapt Vupt",
-                "whatsapp": "5511999999999",
-                "admin_user": "admin",
-                "admin_password": "admin"
-            }).execute()
-
-        # Sincronização de Colunas (Schema Evolution)
-        rpc_cols = [
-            {'t_name': 'products', 'c_name': 'external_url', 'c_type': 'TEXT'},
-            {'t_name': 'products', 'c_name': 'is_active', 'c_type': 'BOOLEAN DEFAULT TRUE'},
-            {'t_name': 'products', 'c_name': 'clicks_count', 'c_type': 'INTEGER DEFAULT 0'},
-            {'t_name': 'stores', 'c_name': 'pix_key', 'c_type': 'TEXT'},
-            {'t_name': 'stores', 'c_name': 'pix_name', 'c_type': 'TEXT'},
-            {'t_name': 'stores', 'c_name': 'pix_city', 'c_type': 'TEXT'},
-            {'t_name': 'stores', 'c_name': 'admin_user', 'c_type': 'TEXT DEFAULT \'admin\''},
-            {'t_name': 'stores', 'c_name': 'admin_password', 'c_type': 'TEXT DEFAULT \'admin\''},
-            {'t_name': 'customers', 'c_name': 'password', 'c_type': 'TEXT'}
-        ]
-        for col in rpc_cols:
-            try: supabase.rpc('add_column_if_not_exists', col).execute()
-            except: pass
-
-        # Forçar admin/admin no default se não existir
-        try:
-            check = supabase.table('stores').select("admin_user").eq('slug', 'default').execute()
-            if check.data and not check.data[0].get('admin_user'):
-                supabase.table('stores').update({"admin_user": "admin", "admin_password": "admin"}).eq('slug', 'default').execute()
-        except: pass
-    except Exception as e:
-        print(f"Erro init_db: {e}")
+# --- VERIFICAÇÃO DO SCHEMA (Cold Start) ---
+# Apenas uma query na linha de `schema_version`; migrações rodam via `python migrations.py`.
+def check_schema_version():
+    current, ok = check_schema(supabase)
+    if not ok:
+        app.logger.warning(f"Schema desatualizado (v{current}, esperado v{LATEST_VERSION}). Rode: python migrations.py")
+    return ok
 
-init_db()
+check_schema_version()
 
 # --- HELPERS ---
-def get_store():
-    fallback = {"id": str(uuid.uuid4()), "name": "Vapt Vupt", "whatsapp": "5511999999999", "primary_color": "#0EA5E9"}
+store_cache = StoreCache(ttl=int(os.getenv("STORE_CACHE_TTL", "60")), maxsize=int(os.getenv("STORE_CACHE_SIZE", "128")))
+
+def _load_store(slug):
+    # Retorna None em falha para que o fallback nunca fique no cache
     try:
-        res = supabase.table('stores').select("*").eq('slug', 'default').execute()
-        return res.data[0] if res.data else fallback
-    except: return fallback
+        res = supabase.table('stores').select("*").eq('slug', slug).execute()
+        return res.data[0] if res.data else None
+    except Exception as e:
+        app.logger.error(f"Erro ao carregar loja {slug}: {e}")
+        return None
+
+def get_store(slug='default'):
+    fallback = {"id": str(uuid.uuid4()), "name": "Vapt Vupt", "whatsapp": "5511999999999", "primary_color": "#0EA5E9"}
+    return store_cache.get(slug, _load_store) or fallback
+
+search_index = SearchIndex(max_age=int(os.getenv("SEARCH_INDEX_TTL", "300")))
+
+def _load_search_docs(since=None):
+    # Só texto + id, em lotes por id (o PostgREST limita linhas por resposta).
+    # Com `since`: só as alteradas (migração 9), inclusive as desativadas, que saem do índice
+    docs, last_id = [], None
+    since_iso = datetime.fromtimestamp(since, timezone.utc).isoformat() if since else None
+    while True:
+        req = supabase.table('products').select("id, name, description, created_at, is_active")
+        req = req.gte('updated_at', since_iso) if since_iso else req.eq('is_active', True)
+        if last_id: req = req.gt('id', last_id)
+        batch = req.order('id').limit(1000).execute().data or []
+        docs.extend(batch)
+        if len(batch) < 1000: return docs
+        last_id = batch[-1]['id']
+
+def get_catalog_page(query, cursor, limit):
+    if query:
+        search_index.ensure_fresh(_load_search_docs)
+        return fetch_search_page(supabase, search_index, query, cursor=cursor, limit=limit)
+    return fetch_catalog_page(supabase, cursor=cursor, limit=limit)
 
 def check_auth():
     return session.get('is_admin') or session.get('is_superadmin')
@@ -122,61 +145,36 @@ def generate_wa_link(phone, base_msg, cart_items=None, total=None):
         if total: msg += f"\n💰 *TOTAL:* R$ {total:.2f}"
     return f"https://wa.me/{phone}?text={urllib.parse.quote(msg)}"
 
+image_index = default_index()
+
 def download_and_persist_image(image_url, prefix="img"):
     """
     Baixa imagem de URL externa, valida e persiste no Supabase Storage.
+    Nome endereçado por conteúdo (sha256): `prefix` fica só no log.
     Retorna URL pública do storage ou None se falhar.
     """
-    try:
-        # 1. Download com timeout e fallback para SSL se necessário
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        try:
-            response = requests.get(image_url, headers=headers, timeout=15, stream=True)
-        except requests.exceptions.SSLError:
-            response = requests.get(image_url, headers=headers, timeout=15, stream=True, verify=False)
-
-        if response.status_code != 200:
-            app.logger.warning(f"Falha download imagem: {response.status_code} - {image_url}")
-            return None
-
-        # 2. Verificar tamanho (max 10MB)
-        content_length = response.headers.get('content-length')
-        if content_length and int(content_length) > 10 * 1024 * 1024:
-            app.logger.warning(f"Imagem muito grande: {content_length} bytes - {image_url}")
-            return None
-
-        image_data = response.content
-
-        # 3. Validar MIME básico
-        content_type = response.headers.get('content-type', '')
-        if not any(t in content_type.lower() for t in ['image/', 'jpeg', 'png', 'webp', 'gif']):
-            # Verificar magic bytes
-            if not (image_data[:3] == b'\xff\xd8\xff' or  # JPEG
-                    image_data[:8] == b'\x89PNG\r\n\x1a\n' or  # PNG
-                    image_data[:4] == b'RIFF' or  # WebP
-                    image_data[:6] in (b'GIF87a', b'GIF89a')):  # GIF
-                app.logger.warning(f"Arquivo não é imagem válida: {content_type} - {image_url}")
-                return None
-
-        # 4. Determinar extensão
-        ext = 'jpg'
-        if b'\x89PNG' in image_data[:10]: ext = 'png'
-        elif b'RIFF' in image_data[:10]: ext = 'webp'
-        elif b'GIF8' in image_data[:10]: ext = 'gif'
-
-        # 5. Gerar nome único e fazer upload
-        filename = f"{prefix}_{uuid.uuid4()}.{ext}"
-
-        supabase.storage.from_('product-images').upload(filename, image_data, {"content-type": f"image/{ext}"})
-
-        # 6. Retornar URL pública
-        public_url = supabase.storage.from_('product-images').get_public_url(filename)
-        app.logger.info(f"Imagem persistida: {filename} de {image_url}")
-        return public_url
+    public_url = download_and_persist(supabase, image_url, index=image_index)
+    if public_url: app.logger.info(f"Imagem persistida ({prefix}): {public_url}")
+    return public_url
 
-    except Exception as e:
-        app.logger.error(f"Erro ao persistir imagem {image_url}: {e}")
-        return None
+def renditions_for(image_url):
+    """Versões responsivas de uma imagem já persistida (via índice local), ou None."""
+    return image_index.renditions_for_url(image_url) if image_index and image_url else None
+
+def persist_uploaded_image(file):
+    """Upload do painel: mesmo caminho das importadas (sha256 + versões). Retorna {"url", "renditions"} ou None."""
+    with open_image_upload(file, PRODUCT_IMAGE_MAX_BYTES) as upload:
+        if not upload: return None
+        return persist_image(supabase, upload["source"], upload["digest"], upload["ext"],
+                             index=image_index, size=upload["size"])
+
+app.add_template_filter(srcset, 'srcset')
+app.add_template_filter(pick_rendition, 'rendition')
+
+def download_and_persist_images(image_urls):
+    """Versão concorrente (ordem preservada); falhas/atrasos voltam como None."""
+    return download_and_persist_many(supabase, image_urls, index=image_index,
+                                     deadline=float(os.getenv("IMAGE_FETCH_DEADLINE", "20")))
 
 
 # --- ROTAS VITRINE ---
@@ -184,36 +182,66 @@ def download_and_persist_image(image_url, prefix="img"):
 def index():
     store = get_store()
     query = request.args.get('q', '').strip()
-    products = []
+    cursor = request.args.get('cursor') or None
+    products, next_cursor = [], None
     try:
-        # VITRINE GLOBAL: Pega produtos de TODAS as lojas para máxima exposição
-        req = supabase.table('products').select("*, product_images(*), stores(*)").eq('is_active', True)
-        if query: req = req.ilike('name', f'%{query}%')
-        products = req.order('created_at', desc=True).execute().data or []
+        # VITRINE GLOBAL: Pega produtos de TODAS as lojas para máxima exposição (paginado por cursor)
+        products, next_cursor = get_catalog_page(query, cursor, parse_limit(request.args.get('limit')))
+    except ValueError:
+        return redirect(url_for('index', q=query or None))
     except Exception as e: app.logger.error(f"Erro Vitrine: {e}")
 
     try:
-        return render_template('store.html', store=store, products=products, query=query)
+        return render_template('store.html', store=store, products=products, query=query, next_cursor=next_cursor)
     except Exception as e:
         app.logger.error(f"Erro Render: {e}")
         return render_template('error.html', error="Erro de exibição", store=store), 500
 
+@app.route('/api/catalogo')
+def api_catalog():
+    query = request.args.get('q', '').strip()
+    try:
+        products, next_cursor = get_catalog_page(query, request.args.get('cursor') or None, parse_limit(request.args.get('limit')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Erro API Catálogo: {e}")
+        return jsonify({"error": "erro ao carregar catálogo"}), 500
+    return jsonify({"products": products, "next_cursor": next_cursor})
+
+# Cliques: agregados em memória e enviados em lote como incremento atômico (RPC increment_clicks)
+def _flush_clicks(batch):
+    supabase.rpc('increment_clicks', {"increments": batch}).execute()
+
+click_counter = ClickCounter(_flush_clicks, interval=float(os.getenv("CLICK_FLUSH_INTERVAL", "10"))).start()
+click_targets = TTLCache(maxsize=4096, ttl=300)
+click_targets_lock = threading.Lock()
+
 @app.route('/clique/<product_id>')
 def track_click(product_id):
-    try:
-        # Incrementa contador de cliques de forma atômica se possível, ou via update simples
-        p_res = supabase.table('products').select("external_url, clicks_count").eq('id', product_id).execute()
-        if p_res.data:
-            prod = p_res.data[0]
-            current_clicks = prod.get('clicks_count') or 0
-            supabase.table('products').update({"clicks_count": current_clicks + 1}).eq('id', product_id).execute()
-            if prod.get('external_url'): return redirect(prod['external_url'])
-    except: pass
+    with click_targets_lock: target = click_targets.get(product_id)
+    if target is None:
+        try:
+            p_res = supabase.table('products').select("external_url").eq('id', product_id).execute()
+            if p_res.data:
+                target = p_res.data[0].get('external_url') or ''
+                with click_targets_lock: click_targets[product_id] = target
+        except: pass
+
+    if target is not None: click_counter.add(product_id)
+    if target: return redirect(target)
     return redirect(url_for('index'))
 
 @app.errorhandler(404)
 def page_not_found(e): return render_template('error.html', error="Página não encontrada", store=get_store()), 404
 
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit = (request.max_content_length or MAX_UPLOAD_BYTES) // (1024 * 1024)
+    message = f"Arquivo grande demais (máximo {limit} MB)"
+    if request.path.startswith('/vendedor/importar'): return jsonify({"error": message}), 413
+    return render_template('error.html', error=message, store=get_store()), 413
+
 @app.errorhandler(500)
 def server_error(e):
     app.logger.error(f"500: {e}")
@@ -223,6 +251,8 @@ def server_error(e):
 def add_to_cart():
     product_id = request.form.get('product_id')
     qty_requested = int(request.form.get('quantity', 1))
+    if not is_product_id(product_id):
+        return jsonify({"status": "error", "message": "Produto não encontrado"})
 
     try:
         p_res = supabase.table('products').select("name, stock_quantity").eq('id', product_id).execute()
@@ -277,55 +307,62 @@ def checkout():
             return render_template('checkout.html', error="Erro ao processar dados do cliente.", store=store)
 
         cart = session.get('cart', {})
-        total = 0
-        order_items_to_save = []
-        cart_for_wa = []
+        try:
+            order, failures = place_order(supabase, store['id'], customer_id, cart, address_details)
+        except Exception as e:
+            app.logger.error(f"Erro Checkout: {e}")
+            return render_template('checkout.html', error="Erro ao registrar o pedido. Tente novamente.", store=store)
 
-        for pid, qty in cart.items():
-            try:
-                p_res = supabase.table('products').select("name, price, stock_quantity").eq('id', pid).execute()
-                if p_res.data:
-                    p = p_res.data[0]
-                    price = float(p['price'])
-                    total += price * qty
-                    order_items_to_save.append({"product_id": pid, "quantity": qty, "unit_price": price})
-                    cart_for_wa.append({"name": p['name'], "quantity": qty})
-
-                    new_stock = (p.get('stock_quantity') or 0) - qty
-                    supabase.table('products').update({"stock_quantity": new_stock}).eq('id', pid).execute()
-            except: pass
-
-        order_res = supabase.table('orders').insert({
-            "store_id": store['id'],
-            "customer_id": customer_id,
-            "subtotal": total,
-            "total": total,
-            "status": "pending_payment",
-            "delivery_address": address_details
-        }).execute()
-
-        order_id = order_res.data[0]['id']
-        for item in order_items_to_save:
-            item['order_id'] = order_id
-            supabase.table('order_items').insert(item).execute()
+        if not order:
+            for f in failures: app.logger.warning(f"Checkout recusado: {f}")
+            error = "; ".join(describe_failure(f) for f in failures) or "Carrinho vazio."
+            return render_template('checkout.html', error=error, failures=failures, store=store)
 
+        order_id, total, cart_for_wa = order['id'], order['total'], order['items']
         wa_link = generate_wa_link(store['whatsapp'], store.get('whatsapp_message', 'Novo pedido!'), cart_for_wa, total)
         session.pop('cart', None)
         return redirect(url_for('order_confirmation', order_id=order_id, wa_link=wa_link))
 
     return render_template('checkout.html', store=store)
 
+qr_cache = QRCache(max_bytes=int(os.getenv("QR_CACHE_BYTES", str(8 * 1024 * 1024))), disk_dir=os.getenv("QR_CACHE_DIR") or None)
+
+def order_pix_payload(order):
+    pix_chave = order['stores'].get('pix_key') or "pendente@pix.com"
+    pix_nome = order['stores'].get('pix_name') or order['stores'].get('name', 'VAPT VUPT')
+    pix_cidade = order['stores'].get('pix_city') or "SAO PAULO"
+    return PixGenerator(pix_chave, pix_nome, pix_cidade, float(order['total'])).generate_payload()
+
 @app.route('/confirmacao/<order_id>')
 def order_confirmation(order_id):
     order_res = supabase.table('orders').select("*, stores(*)").eq('id', order_id).execute()
     order = order_res.data[0]
     wa_link = request.args.get('wa_link')
-    pix_chave = order['stores'].get('pix_key') or "pendente@pix.com"
-    pix_nome = order['stores'].get('pix_name') or order['stores'].get('name', 'VAPT VUPT')
-    pix_cidade = order['stores'].get('pix_city') or "SAO PAULO"
-    pix = PixGenerator(pix_chave, pix_nome, pix_cidade, float(order['total']))
-    qr_code, payload = pix.generate_qr_base64()
-    return render_template('confirmation.html', order=order, qr_code=qr_code, payload=payload, wa_link=wa_link)
+    payload = order_pix_payload(order)
+    # O QR é servido por /pix/<id>.png (cacheado); o HTML só leva o payload
+    return render_template('confirmation.html', order=order, payload=payload, payload_hash=payload_hash(payload)[:16], wa_link=wa_link)
+
+@app.route('/pix/<order_id>.<fmt>')
+def order_pix_qr(order_id, fmt):
+    if fmt not in QR_MIME_TYPES: return "Formato inválido", 404
+    try:
+        order_res = supabase.table('orders').select("total, stores(name, pix_key, pix_name, pix_city)").eq('id', order_id).execute()
+    except Exception as e:
+        app.logger.error(f"Erro QR Pix {order_id}: {e}")
+        return "Erro ao gerar QR Code", 500
+    if not order_res.data: return "Pedido não encontrado", 404
+
+    payload = order_pix_payload(order_res.data[0])
+    etag = payload_hash(payload)
+    if etag in request.if_none_match:
+        resp = app.response_class(status=304)
+    else:
+        data, _ = qr_cache.get(payload, fmt)
+        resp = app.response_class(data, mimetype=QR_MIME_TYPES[fmt])
+    resp.set_etag(etag)
+    # O conteúdo depende só do payload; a página referencia ?v=<hash>, então é seguro ser imutável
+    resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return resp
 
 # --- CADASTRO E LOGIN ---
 
@@ -451,40 +488,53 @@ def admin_dashboard():
     if is_superadmin():
         try:
             stores = supabase.table('stores').select("*").execute().data
-            orders_all = supabase.table('orders').select("total, status").execute().data
 
-            # BI Superadmin
-            total_sales = sum(o['total'] for o in orders_all if o['status'] != 'cancelled')
-            total_orders = len(orders_all)
-            avg_ticket = total_sales / total_orders if total_orders > 0 else 0
+            # BI Superadmin: lido do rollup diário, com recorte por período e por loja
+            date_from, date_to = parse_day(request.args.get('from')), parse_day(request.args.get('to'))
+            store_filter = request.args.get('store')
+            try: store_filter = str(uuid.UUID(store_filter)) if store_filter else None
+            except ValueError: store_filter = None
+            summary = fetch_sales_summary(supabase, date_from, date_to, store_filter)
 
             return render_template('super_admin.html',
                                  stores=stores,
-                                 total_sales=total_sales,
-                                 total_orders=total_orders,
-                                 avg_ticket=avg_ticket)
+                                 total_sales=summary['total_sales'],
+                                 total_orders=summary['total_orders'],
+                                 avg_ticket=summary['avg_ticket'],
+                                 summary=summary,
+                                 date_from=date_from, date_to=date_to, store_filter=store_filter)
         except Exception as e:
             app.logger.error(f"Erro Carregar Super Panel: {e}")
 
     # Dashboard para Vendedor (Sua própria loja + BI Local)
     store = get_store()
     orders, products = [], []
-    stats = {"total_revenue": 0, "order_count": 0, "product_count": 0}
+    next_orders, next_products = None, None
+    stats = empty_stats()
+    status = request.args.get('status') if request.args.get('status') in ORDER_STATUSES else None
+    tab = request.args.get('tab') if request.args.get('tab') in ('orders', 'products') else 'orders'
 
     if store and store.get('id') != "00000000-0000-0000-0000-000000000000":
         try:
-            orders = supabase.table('orders').select("*, customers(*)").eq('store_id', store['id']).order('created_at', desc=True).execute().data
-            products = supabase.table('products').select("*, product_images(*)").eq('store_id', store['id']).order('created_at', desc=True).execute().data
-
-            # BI Local
-            stats["total_revenue"] = sum(o['total'] for o in orders if o['status'] != 'cancelled')
-            stats["order_count"] = len(orders)
-            stats["product_count"] = len(products)
-        except: pass
-
-    return render_template('admin.html', store=store, orders=orders, products=products, stats=stats)
+            # BI Local: agregados calculados no banco; listas só da página atual
+            stats = fetch_store_stats(supabase, store['id'])
+            orders, next_orders = fetch_orders_page(supabase, store['id'], request.args.get('orders_cursor') or None, status=status)
+            products, next_products = fetch_products_page(supabase, store['id'], request.args.get('products_cursor') or None)
+        except ValueError:
+            return redirect(url_for('admin_dashboard', tab=tab))
+        except Exception as e: app.logger.error(f"Erro Carregar Painel: {e}")
+
+    return render_template('admin.html', store=store, orders=orders, products=products, stats=stats,
+                           next_orders=next_orders, next_products=next_products, status=status, tab=tab)
+
+@app.route('/vendedor/cache-stats')
+def cache_stats():
+    if not is_superadmin(): return jsonify({"error": "unauthorized"}), 401
+    return jsonify({"store_cache": store_cache.stats(), "clicks": click_counter.stats(), "qr_cache": qr_cache.stats(),
+                    "http": http_utils.stats()})
 
 @app.route('/vendedor/configuracoes', methods=['POST'])
+@upload_limit(LOGO_MAX_BYTES)
 def update_settings():
     if not check_auth(): return redirect(url_for('admin_login'))
 
@@ -506,22 +556,25 @@ def update_settings():
         # Só atualiza a senha se for fornecida
         if request.form.get('admin_password'):
             store_data["admin_password"] = request.form.get('admin_password')
-        file = request.files.get('file')
-        if file and file.filename:
-            try:
-                filename = f"logo_{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-                supabase.storage.from_('product-images').upload(filename, file.read())
-                store_data["logo_url"] = supabase.storage.from_('product-images').get_public_url(filename)
-            except: pass
+        try:
+            with open_image_upload(request.files.get('file'), LOGO_MAX_BYTES) as upload:
+                if upload:
+                    filename = f"logo_{upload['digest'][:16]}.{upload['ext']}"
+                    bucket = supabase.storage.from_('product-images')
+                    bucket.upload(filename, upload["source"], {"content-type": content_type_for(upload["ext"]), "upsert": "true"})
+                    store_data["logo_url"] = bucket.get_public_url(filename)
+        except Exception as e: app.logger.error(f"Erro no upload do logo: {e}")
 
         # Upsert com proteção de erro
         supabase.table('stores').upsert(dict(store_data, slug="default")).execute()
+        store_cache.invalidate('default')
         return redirect(url_for('admin_dashboard'))
     except Exception as e:
         app.logger.error(f"Erro ao salvar configurações: {e}")
         return render_template('error.html', error=f"Erro ao salvar: {str(e)}", store=get_store())
 
 @app.route('/vendedor/produto/novo', methods=['POST'])
+@upload_limit(PRODUCT_IMAGE_MAX_BYTES)
 def admin_add_product():
     if not check_auth(): return redirect(url_for('admin_login'))
     store = get_store()
@@ -534,34 +587,32 @@ def admin_add_product():
         "image_url": request.form.get('image_url'),
         "external_url": request.form.get('external_url')
     }
+    product_data["renditions"] = renditions_for(product_data["image_url"])
     file = request.files.get('file')
     if file and file.filename:
         try:
-            filename = f"prod_{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-            supabase.storage.from_('product-images').upload(filename, file.read())
-            product_data["image_url"] = supabase.storage.from_('product-images').get_public_url(filename)
-        except: pass
+            persisted = persist_uploaded_image(file)
+            if persisted: product_data.update(image_url=persisted["url"], renditions=persisted["renditions"] or None)
+        except Exception as e: app.logger.error(f"Erro no upload da imagem: {e}")
     p_res = supabase.table('products').insert(product_data).execute()
 
     if p_res.data:
         new_prod_id = p_res.data[0]['id']
+        if search_index.built_at: search_index.add(p_res.data[0])
         extra_images_json = request.form.get('extra_images')
 
         if extra_images_json:
             try:
-                import json
                 images_list = json.loads(extra_images_json)
                 if isinstance(images_list, list):
+                    # Se já é URL do Supabase Storage, não baixar novamente; as externas baixam em paralelo
+                    external = [u for u in images_list if not ('supabase' in u.lower() or 'storage' in u.lower())]
+                    persisted = dict(zip(external, download_and_persist_images(external)))
                     img_rows = []
                     for i, img_url in enumerate(images_list):
-                        # Se já é URL do Supabase Storage, não baixar novamente
-                        if 'supabase' in img_url.lower() or 'storage' in img_url.lower():
-                            final_url = img_url
-                        else:
-                            # Baixar e persistir imagem externa no Storage
-                            persisted_url = download_and_persist_image(img_url, prefix=f"prod_{new_prod_id}")
-                            final_url = persisted_url if persisted_url else img_url
-                        img_rows.append({"product_id": new_prod_id, "image_url": final_url, "display_order": i})
+                        final_url = persisted.get(img_url) or img_url
+                        img_rows.append({"product_id": new_prod_id, "image_url": final_url, "display_order": i,
+                                         "renditions": renditions_for(final_url)})
                     if img_rows:
                         supabase.table('product_images').insert(img_rows).execute()
             except Exception as e:
@@ -573,6 +624,7 @@ def admin_add_product():
 def admin_delete_product(product_id):
     if not check_auth(): return redirect(url_for('admin_login'))
     supabase.table('products').delete().eq('id', product_id).execute()
+    search_index.remove(product_id)
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/vendedor/pedido/<order_id>/status', methods=['POST'])
@@ -584,63 +636,8 @@ def update_order_status(order_id):
 
 # --- NOVAS FUNCIONALIDADES AVANÇADAS ---
 
-def optimize_marketing_data(raw_data):
-    """
-    IA de Marketing: Otimiza título e descrição para venda profissional.
-    """
-    title = raw_data.get('title', '').strip()
-    desc = raw_data.get('description', '').strip()
-
-    # 1. Otimização de Título (Magnético)
-    if title:
-        # Remover lixo comum de SEO/venda (OBS: escapar o pipe | para não remover espaços)
-        cleanups = [
-            r" - .*?$", r" \| .*?$", r" lojas? oficial$", r" frete grátis.*$",
-            r" cupom de desconto.*$", r" compre aqui.*$", r" melhor preço.*$",
-            r" parcelas? sem juros.*$", r" até \d+x.*$"
-        ]
-        for pattern in cleanups:
-            title = re.sub(pattern, "", title, flags=re.I).strip()
-
-        # Se for muito longo, resumir mantendo apenas as primeiras palavras (Marca + Modelo)
-        if len(title) > 60:
-            words = title.split()
-            title = " ".join(words[:10]) # Primeiras 10 palavras ou 60 chars
-            if len(title) > 57: title = title[:57] + "..."
-
-        # Title Case amigável e limpeza de espaços extras
-        title = re.sub(r'\s+', ' ', title).strip()
-        if title.isupper() or title.islower():
-            title = title.title()
-
-    # 2. Otimização de Descrição (Structure & Copywriting)
-    if desc:
-        # Limpar excesso de HTML/Espaços
-        desc = re.sub(r'<[^>]+>', '', desc)
-        desc = re.sub(r'\s+', ' ', desc).strip()
-
-        # Identificar se já tem bullets ou criar estrutura
-        points = []
-        # Tentar quebrar por pontos ou frases longas para criar bullets
-        potential_points = re.split(r'[;.]', desc)
-        for p in potential_points:
-            p = p.strip()
-            if len(p) > 20 and len(points) < 5:
-                # Adicionar emoji de destaque se não tiver
-                points.append(f"✨ {p}")
-
-        # Construir Copy
-        intro = "💎 **Oportunidade Premium**\n\n"
-        if len(points) > 0:
-            body = "\n".join(points)
-        else:
-            body = desc[:300]
-
-        footer = "\n\n🚀 *Garanta o seu hoje mesmo! Estoque limitado.*"
-
-        desc = f"{intro}{body}{footer}"
-
-    return title, desc
+scraper_stats = default_strategy_stats()
+scrape_cache = default_scrape_cache()
 
 @app.route('/vendedor/fetch-metadata')
 def fetch_metadata():
@@ -648,161 +645,34 @@ def fetch_metadata():
     url_to_fetch = request.args.get('url')
     if not url_to_fetch: return jsonify({"error": "no url"}), 400
 
-    try:
-        from bs4 import BeautifulSoup
-        import requests
-
-        headers = { 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36' }
-
-        try:
-            response = requests.get(url_to_fetch, headers=headers, timeout=15)
-        except requests.exceptions.SSLError:
-            app.logger.warning(f"SSL falhou para {url_to_fetch}, tentando sem verificar cert...")
-            response = requests.get(url_to_fetch, headers=headers, timeout=15, verify=False)
-
-        response.raise_for_status()
-        html = response.text
-        soup = BeautifulSoup(html, 'lxml')
-
-        data = { "title": "", "description": "", "price": 0.0, "original_price": 0.0, "images": [], "video": "", "stock": 1 }
+    cached = scrape_cache.get(url_to_fetch) if scrape_cache else None
+    if cached and cached["fresh"]: return jsonify(cached["result"])
 
-        # 1. Tentar JSON-LD (Product)
-        import json
-        for script in soup.find_all('script', type='application/ld+json'):
-            try:
-                ld_text = script.string.strip()
-                if not ld_text: continue
-                ld = json.loads(ld_text)
-                if isinstance(ld, list): ld = ld[0]
-
-                target = None
-                if ld.get('@type') == 'Product': target = ld
-                elif '@graph' in ld:
-                    for item in ld['@graph']:
-                        if item.get('@type') == 'Product': target = item; break
-
-                if target:
-                    data["title"] = target.get('name', '')
-                    data["description"] = target.get('description', '')
-                    offers = target.get('offers')
-                    if isinstance(offers, dict):
-                        data["price"] = float(offers.get('price', 0))
-                    elif isinstance(offers, list) and len(offers) > 0:
-                        data["price"] = float(offers[0].get('price', 0))
-
-                    imgs = target.get('image')
-                    if isinstance(imgs, str): data["images"].append(imgs)
-                    elif isinstance(imgs, list): data["images"].extend(imgs)
-                    break
-            except: pass
-
-        # 2. Meta Tags Fallback & Imagens
-        if not data["title"]:
-            tag = soup.find('meta', property='og:title') or soup.find('meta', attrs={'name': 'twitter:title'}) or soup.find('title')
-            data["title"] = tag.get('content') if tag and tag.name == 'meta' else (tag.text if tag else "")
-
-        if not data["description"]:
-            tag = soup.find('meta', property='og:description') or soup.find('meta', attrs={'name': 'description'})
-            data["description"] = tag.get('content') if tag else ""
-
-        # === EXTRAÇÃO DE PREÇO AVANÇADA ===
-        if not data["price"] or data["price"] == 0:
-            # 1. Tentar meta tags específicas de valor
-            price_tag = soup.find('meta', property='product:price:amount') or \
-                        soup.find('meta', property='og:price:amount') or \
-                        soup.find('meta', attrs={'name': 'twitter:data1'})
-
-            if price_tag:
-                try:
-                    val = price_tag.get('content') or price_tag.get('value')
-                    data["price"] = float(re.sub(r'[^\d.]', '', val.replace(',', '.')))
-                except: pass
-
-        if not data["price"] or data["price"] == 0:
-            # 2. Procurar em seletores comuns de e-commerce
-            selectors = [
-                 '.price', '.current-price', '#priceblock_ourprice', '#priceblock_dealprice',
-                 '.vtex-product-summary-2-x-currencyInteger', '.valor-por', '.price-tag-fraction',
-                 '[itemprop="price"]', '.product-price', '.sales-price'
-            ]
-            for sel in selectors:
-                el = soup.select_one(sel)
-                if el:
-                    try:
-                        val = el.get_text(strip=True)
-                        data["price"] = float(re.sub(r'[^\d.]', '', val.replace('.', '').replace(',', '.')))
-                        if data["price"] > 0: break
-                    except: pass
-
-        if not data["price"] or data["price"] == 0:
-            # 3. Regex exaustiva no corpo do texto (Fallback final)
-            price_patterns = [
-                r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})',
-                r'R\$\s?(\d+,\d{2})'
-            ]
-            text = soup.get_text()
-            for pattern in price_patterns:
-                match = re.search(pattern, text)
-                if match:
-                    try:
-                        val = match.group(1).replace('.', '').replace(',', '.')
-                        data["price"] = float(val)
-                        if data["price"] > 0: break
-                    except: pass
-
-        data["price"] = round(float(data["price"] or 0), 2)
-        data["original_price"] = data["price"] # Guardar para sugestão
-
-        # 3. EXTRAÇÃO DE IMAGENS PREMIUM
-        found_imgs = []
-        og_img = soup.find('meta', property='og:image')
-        if og_img: found_imgs.append(og_img.get('content'))
-
-        for img in soup.find_all('img', src=True):
-            src = img.get('src')
-            if not src.startswith('http'):
-                from urllib.parse import urljoin
-                src = urljoin(url_to_fetch, src)
-
-            # Filtro inteligente: excluir imagens pequenas ou sem contexto de produto
-            alt = img.get('alt', '').lower()
-            width = img.get('width', '100')
-            try: w = int(re.sub(r'\D', '', width))
-            except: w = 100
-
-            if any(x in src.lower() or x in alt for x in ['icon', 'logo', 'button', 'sprite', 'pixel', 'banner']): continue
-            if w < 50: continue # Provável ícone
-            found_imgs.append(src)
-
-        data["images"] = list(dict.fromkeys(found_imgs))
+    try:
+        data, info = fetch_product_data(url_to_fetch, stats=scraper_stats,
+                                        etag=cached and cached["etag"], last_modified=cached and cached["last_modified"])
+        if info["not_modified"]:
+            scrape_cache.touch(url_to_fetch)
+            return jsonify(cached["result"])
 
         # === CAMADA DE INTELIGÊNCIA DE MARKETING ===
         opt_title, opt_desc = optimize_marketing_data(data)
         data["title"] = opt_title
         data["description"] = opt_desc
 
-        # Finalizar Preço
-        data["price"] = round(float(data["price"] or 0), 2)
-
-        # Video
-        og_vid = soup.find('meta', property='og:video')
-        if og_vid: data["video"] = og_vid.get('content')
-
         # === PERSISTÊNCIA NO STORAGE ===
         persisted_images = []
         main_image_persisted = ""
 
-        for i, img_url in enumerate(data["images"][:5]):
-            try:
-                # Sufixo informativo para o log
-                persisted_url = download_and_persist_image(img_url, prefix=f"expert_{uuid.uuid4().hex[:6]}")
-                if persisted_url:
-                    persisted_images.append(persisted_url)
-                    if i == 0: main_image_persisted = persisted_url
-                else: persisted_images.append(img_url)
-            except: persisted_images.append(img_url)
-
-        return jsonify({
+        # Só as 5 melhores por resolução real (sondagem parcial) são baixadas por inteiro
+        candidates = rank_image_candidates(data["images"], top=5)
+        for i, (img_url, persisted_url) in enumerate(zip(candidates, download_and_persist_images(candidates))):
+            if persisted_url:
+                persisted_images.append(persisted_url)
+                if i == 0: main_image_persisted = persisted_url
+            else: persisted_images.append(img_url)
+
+        result = {
             "title": data["title"],
             "description": data["description"],
             "image": main_image_persisted,
@@ -812,23 +682,26 @@ def fetch_metadata():
             "original_price": data["original_price"],
             "stock": 1,
             "images_persisted": True
-        })
+        }
+        if scrape_cache: scrape_cache.put(url_to_fetch, result, info.get("etag"), info.get("last_modified"))
+        return jsonify(result)
 
     except Exception as e:
         app.logger.error(f"Erro Scraper Inteligente: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/vendedor/produto/<product_id>/imagem/nova', methods=['POST'])
+@upload_limit(PRODUCT_IMAGE_MAX_BYTES)
 def admin_add_product_image(product_id):
     if not check_auth(): return redirect(url_for('admin_login'))
     file = request.files.get('file')
     if file and file.filename:
         try:
-            filename = f"prod_gal_{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-            supabase.storage.from_('product-images').upload(filename, file.read())
-            img_url = supabase.storage.from_('product-images').get_public_url(filename)
-            supabase.table('product_images').insert({"product_id": product_id, "image_url": img_url}).execute()
-        except: pass
+            persisted = persist_uploaded_image(file)
+            if persisted:
+                supabase.table('product_images').insert({"product_id": product_id, "image_url": persisted["url"],
+                                                         "renditions": persisted["renditions"] or None}).execute()
+        except Exception as e: app.logger.error(f"Erro no upload da imagem: {e}")
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/vendedor/produto/imagem/<image_id>/delete', methods=['POST'])
@@ -837,6 +710,42 @@ def admin_delete_product_image(image_id):
     supabase.table('product_images').delete().eq('id', image_id).execute()
     return redirect(url_for('admin_dashboard'))
 
+# --- IMPORTAÇÃO EM LOTE (CSV/JSONL) ---
+# Síncrona e limitada: na Vercel nada roda depois da resposta (sem thread de fundo
+# nem estado entre instâncias). Feeds maiores: python import_utils.py feed.csv --store <slug>
+
+@app.route('/vendedor/importar', methods=['POST'])
+@upload_limit(IMPORT_MAX_BYTES)
+def admin_import_catalog():
+    if not check_auth(): return jsonify({"error": "unauthorized"}), 401
+    file = request.files.get('file')
+    if not file or not file.filename: return jsonify({"error": "no file"}), 400
+    fmt = request.form.get('format') or detect_format(file.filename)
+    if fmt not in ('csv', 'jsonl'): return jsonify({"error": "format must be csv or jsonl"}), 400
+
+    # Vai para disco em blocos; a importação lê o arquivo em streaming
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    with os.fdopen(fd, 'wb') as out: file.save(out)
+
+    importer = CatalogImporter(supabase, get_store()['id'],
+                               batch_size=request.form.get('batch_size', type=int) or DEFAULT_BATCH_SIZE,
+                               persist_images=request.form.get('images', '1') != '0',
+                               optimize=request.form.get('optimize') == '1',
+                               index=image_index)
+    try:
+        report = importer.import_file(path, fmt, max_rows=IMPORT_SYNC_MAX_ROWS)
+    except Exception as e:
+        app.logger.error(f"Erro na importação: {e}")
+        return jsonify({"error": "falha na importação", **importer.snapshot()}), 500
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+        search_index.invalidate()
+    if report["truncated"]:
+        report["message"] = (f"Importadas só as primeiras {IMPORT_SYNC_MAX_ROWS} linhas; "
+                             "use python import_utils.py para arquivos maiores")
+    return jsonify(report)
+
 @app.route('/vendedor/clientes')
 def admin_customers():
     if not check_auth(): return redirect(url_for('admin_login'))
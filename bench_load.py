@@ -0,0 +1,230 @@
+"""
+Teste de carga dos fluxos da loja contra um Supabase local (supabase_stub.py).
+
+    python bench_load.py                                  # 16 usuários, 20 s, 20 ms por ida ao "Supabase"
+    python bench_load.py --users 64 --duration 60 --latency 0.05 --jitter 0.02
+    python bench_load.py --fixture dados.json --save base.json
+    python bench_load.py --baseline base.json             # sai com código 1 se o p95 piorar além da tolerância
+    python bench_load.py --target http://127.0.0.1:8000   # app já rodando (gunicorn etc.) apontado para o stub
+
+Cada usuário virtual tem sua própria sessão (cookies) e repete o fluxo
+vitrine -> (busca) -> adicionar ao carrinho -> checkout -> confirmação,
+escolhendo produtos com popularidade desigual (poucos concentram os pedidos).
+Sai uma tabela por rota com requisições, erros, req/s, p50/p95/p99 e a média
+de idas ao banco por requisição (lida do cabeçalho Server-Timing).
+
+O stub roda em outro processo; o app (servidor com threads do werkzeug) e os
+usuários virtuais dividem este. Os números servem para comparar rodadas entre
+si; para medir o servidor de produção, suba-o à parte e use --target.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import defaultdict
+
+import httpx
+
+from supabase_stub import make_server as make_stub, load_fixture
+
+ROUTES = ("vitrine", "busca", "carrinho", "checkout", "confirmacao")
+SEARCH_WORDS = ("fone", "cabo", "carregador", "camiseta", "tenis", "garrafa", "mochila", "relogio")
+DB_TIMING_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) ')
+
+
+def demo_tables(products=300, seed=1):
+    """Loja 'default' + produtos com estoque de sobra (o checkout não deve falhar por estoque)."""
+    rng = random.Random(seed)
+    store = {"id": "00000000-0000-4000-8000-000000000001", "slug": "default", "name": "Loja Bench", "is_active": True,
+             "whatsapp": "5511999999999", "pix_key": "bench@pix.com", "pix_name": "LOJA BENCH", "pix_city": "SAO PAULO"}
+    rows, images = [], []
+    for i in range(products):
+        pid = f"00000000-0000-4000-9000-{i:012d}"
+        word = SEARCH_WORDS[i % len(SEARCH_WORDS)]
+        rows.append({"id": pid, "store_id": store["id"], "name": f"{word.title()} modelo {i}", "description": f"{word} de teste {i}",
+                     "price": round(rng.uniform(10, 500), 2), "stock_quantity": 10 ** 6, "is_active": True, "clicks_count": 0,
+                     "image_url": f"https://cdn.example.com/{pid}.jpg", "created_at": f"2025-01-01T00:00:{i % 60:02d}.{i:06d}+00:00"})
+        images += [{"id": f"00000000-0000-4000-a{k:03d}-{i:012d}", "product_id": pid, "image_url": f"https://cdn.example.com/{pid}-{k}.jpg",
+                    "display_order": k} for k in range(2)]
+    return {"stores": [store], "products": rows, "product_images": images}
+
+
+def percentile(values, p):
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.db_calls = defaultdict(list)
+
+    def add(self, route, seconds, ok, response=None):
+        db = None
+        if response is not None:
+            match = DB_TIMING_RE.search(response.headers.get('server-timing', ''))
+            db = int(match.group(1)) if match else 0
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if not ok: self.errors[route] += 1
+            if db is not None: self.db_calls[route].append(db)
+
+    def report(self, elapsed):
+        out = {}
+        for route in ROUTES:
+            lat = self.latencies.get(route)
+            if not lat: continue
+            calls = self.db_calls.get(route) or [0]
+            out[route] = {"requests": len(lat), "errors": self.errors[route], "rps": round(len(lat) / elapsed, 1),
+                          "p50_ms": round(percentile(lat, 50) * 1000, 1), "p95_ms": round(percentile(lat, 95) * 1000, 1),
+                          "p99_ms": round(percentile(lat, 99) * 1000, 1), "max_ms": round(max(lat) * 1000, 1),
+                          "db_calls": round(sum(calls) / len(calls), 1)}
+        return out
+
+
+def timed(recorder, route, send, check):
+    t0 = time.perf_counter()
+    try:
+        response = send()
+        ok = check(response)
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.add(route, time.perf_counter() - t0, ok, response)
+    return response if ok else None
+
+
+def user_flow(base, product_ids, weights, recorder, deadline, seed, search_ratio):
+    rng = random.Random(seed)
+    with httpx.Client(base_url=base, timeout=30, follow_redirects=False) as client:
+        while time.time() < deadline:
+            timed(recorder, "vitrine", lambda: client.get('/'), lambda r: r.status_code == 200)
+            if rng.random() < search_ratio:
+                timed(recorder, "busca", lambda: client.get('/', params={"q": rng.choice(SEARCH_WORDS)}), lambda r: r.status_code == 200)
+
+            for pid in set(rng.choices(product_ids, weights=weights, k=rng.randint(1, 3))):
+                timed(recorder, "carrinho", lambda: client.post('/carrinho/adicionar', data={"product_id": pid, "quantity": 1}),
+                      lambda r: r.status_code == 200 and r.json().get("status") == "success")
+
+            n = rng.randrange(10 ** 6)
+            form = {"name": f"Cliente {n}", "email": f"cliente{n}@bench.local", "whatsapp": "11999999999", "street": "Rua A",
+                    "number": str(n % 999), "neighborhood": "Centro", "city": "São Paulo", "state": "SP", "cep": "01000-000"}
+            done = timed(recorder, "checkout", lambda: client.post('/checkout', data=form),
+                         lambda r: r.status_code == 302 and '/confirmacao/' in r.headers.get('location', ''))
+            if done is None: continue
+            location = done.headers['location']
+            timed(recorder, "confirmacao", lambda: client.get(location), lambda r: r.status_code == 200)
+
+
+def _serve_stub(queue, tables, latency, jitter):
+    server = make_stub(tables=tables, latency=latency, jitter=jitter)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_process(tables, latency, jitter):
+    """Stub em processo separado: não disputa o GIL com o app nem com os usuários virtuais."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve_stub, args=(queue, tables, latency, jitter), name="supabase-stub", daemon=True)
+    proc.start()
+    return proc, f"http://127.0.0.1:{queue.get(timeout=60)}"
+
+
+def start_app(stub_base):
+    """Importa o app apontado para o stub e serve numa thread (servidor WSGI com threads do werkzeug)."""
+    os.environ.update({"SUPABASE_URL": stub_base, "SUPABASE_SERVICE_ROLE_KEY": "stub",
+                       "IMAGE_INDEX_PATH": os.path.join(tempfile.mkdtemp(), "bench_index.sqlite")})
+    from werkzeug.serving import make_server
+    import app as vapt
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, vapt.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def fetch_product_ids(base, limit=100):
+    ids, cursor = [], None
+    with httpx.Client(base_url=base, timeout=30) as client:
+        while len(ids) < 1000:
+            body = client.get('/api/catalogo', params={"limit": limit, **({"cursor": cursor} if cursor else {})}).json()
+            ids += [p["id"] for p in body.get("products", [])]
+            cursor = body.get("next_cursor")
+            if not cursor: break
+    return ids
+
+
+def compare(results, baseline, tolerance):
+    """Rotas cujo p95 piorou mais que `tolerance` (fração) em relação à base."""
+    worse = []
+    for route, row in results.items():
+        base = baseline.get(route)
+        if base and base["p95_ms"] > 0 and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            worse.append(f"{route}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+    return worse
+
+
+def main(args):
+    stub_base = None
+    base = args.target
+    if not base:
+        tables = load_fixture(args.fixture) if args.fixture else demo_tables(args.products, args.seed)
+        _, stub_base = start_stub_process(tables, args.latency, args.jitter)
+        base = start_app(stub_base)
+
+    product_ids = fetch_product_ids(base)
+    if not product_ids: sys.exit("Nenhum produto na vitrine: confira a fixture/o alvo.")
+    # Popularidade desigual (Zipf): poucos produtos concentram os carrinhos
+    weights = [1 / (rank + 1) for rank in range(len(product_ids))]
+
+    print(f"{args.users} usuários por {args.duration}s contra {base} "
+          f"(latência do stub {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, {len(product_ids)} produtos)")
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=user_flow, args=(base, product_ids, weights, recorder, deadline, args.seed + i, args.search),
+                                daemon=True) for i in range(args.users)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+
+    results = recorder.report(elapsed)
+    print(f"\n{'rota':<12} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'db/req':>7}")
+    for route, r in results.items():
+        print(f"{route:<12} {r['requests']:>7} {r['errors']:>6} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['db_calls']:>7}")
+    total = sum(r['requests'] for r in results.values())
+    print(f"\nTotal: {total} requisições em {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    if stub_base: print(f"Chamadas ao stub: {httpx.get(f'{stub_base}/__stats').json()}")
+
+    if args.save:
+        with open(args.save, 'w') as f: json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f: worse = compare(results, json.load(f), args.tolerance)
+        for line in worse: print(f"REGRESSÃO {line}")
+        if worse: sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga dos fluxos da loja")
+    parser.add_argument('--users', type=int, default=16, help="usuários virtuais simultâneos")
+    parser.add_argument('--duration', type=float, default=20, help="segundos de carga")
+    parser.add_argument('--latency', type=float, default=0.02, help="atraso por chamada ao stub (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="atraso extra aleatório por chamada (s)")
+    parser.add_argument('--products', type=int, default=300, help="produtos da massa embutida (sem --fixture)")
+    parser.add_argument('--fixture', help="JSON {tabela: [linhas]} para o stub (ex.: seed_data.py --fixture)")
+    parser.add_argument('--search', type=float, default=0.3, help="fração de iterações com busca")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--target', help="URL de um app já rodando (não sobe stub nem app)")
+    parser.add_argument('--save', help="grava o resultado em JSON (base para --baseline)")
+    parser.add_argument('--baseline', help="JSON de uma rodada anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="piora aceitável do p95 (fração)")
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Benchmark do pipeline de copy de marketing.
+
+    python bench_marketing.py             # 20.000 produtos
+    python bench_marketing.py -n 100000 --variants 4
+
+Compara a função original (re.sub com padrões em string a cada chamada) com o
+pipeline pré-compilado, produto a produto e em lote (`optimize_many`).
+`--variants` simula feeds de fornecedor em que o mesmo texto se repete entre
+variações (cor/tamanho) do mesmo item.
+"""
+import re
+import time
+import random
+import argparse
+from marketing_utils import optimize_marketing_data, optimize_many
+
+
+def legacy_optimize(raw_data):
+    # Implementação original, mantida só como referência de comparação
+    title = raw_data.get('title', '').strip()
+    desc = raw_data.get('description', '').strip()
+    if title:
+        cleanups = [
+            r" - .*?$", r" \| .*?$", r" lojas? oficial$", r" frete grátis.*$",
+            r" cupom de desconto.*$", r" compre aqui.*$", r" melhor preço.*$",
+            r" parcelas? sem juros.*$", r" até \d+x.*$"
+        ]
+        for pattern in cleanups:
+            title = re.sub(pattern, "", title, flags=re.I).strip()
+        if len(title) > 60:
+            words = title.split()
+            title = " ".join(words[:10])
+            if len(title) > 57: title = title[:57] + "..."
+        title = re.sub(r'\s+', ' ', title).strip()
+        if title.isupper() or title.islower():
+            title = title.title()
+    if desc:
+        desc = re.sub(r'<[^>]+>', '', desc)
+        desc = re.sub(r'\s+', ' ', desc).strip()
+        points = []
+        for p in re.split(r'[;.]', desc):
+            p = p.strip()
+            if len(p) > 20 and len(points) < 5:
+                points.append(f"✨ {p}")
+        body = "\n".join(points) if points else desc[:300]
+        desc = f"💎 **Oportunidade Premium**\n\n{body}\n\n🚀 *Garanta o seu hoje mesmo! Estoque limitado.*"
+    return title, desc
+
+
+WORDS = ("fone bluetooth sem fio cancelamento ruído bateria longa duração tela amoled "
+         "smartwatch resistente água aço inox panela antiaderente tênis corrida "
+         "amortecimento leve respirável kit ferramentas profissional").split()
+SUFFIXES = ["", " - Loja Oficial", " | Frete Grátis", " loja oficial", " FRETE GRÁTIS para todo Brasil",
+            " Cupom de desconto", " compre aqui", " melhor preço do Brasil", " 12 parcelas sem juros",
+            " até 10x sem juros"]
+
+
+def make_corpus(n, variants, seed=42):
+    rnd = random.Random(seed)
+    corpus = []
+    while len(corpus) < n:
+        title = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 16)))
+        if rnd.random() < 0.3: title = title.upper()
+        title += rnd.choice(SUFFIXES)
+        sentences = [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 12))) for _ in range(rnd.randint(1, 12))]
+        desc = "<p>" + ". ".join(sentences) + "</p>\n<ul><li>Garantia de 12 meses;</li></ul>"
+        for _ in range(variants):
+            corpus.append({"title": title, "description": desc})
+    return corpus[:n]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main(n, variants):
+    corpus = make_corpus(n, variants)
+    legacy, t_legacy = timed(lambda: [legacy_optimize(p) for p in corpus])
+    single, t_single = timed(lambda: [optimize_marketing_data(p) for p in corpus])
+    batch, t_batch = timed(lambda: optimize_many(corpus))
+
+    assert legacy == single == batch, "saídas divergentes!"
+
+    print(f"{n} produtos, {variants} variação(ões) por texto")
+    print(f"{'implementação':<32}{'total (ms)':>12}{'produtos/s':>14}{'speedup':>10}")
+    for label, t in (("re.sub por chamada (antigo)", t_legacy), ("pré-compilado, por produto", t_single), ("optimize_many (lote)", t_batch)):
+        print(f"{label:<32}{t * 1000:>12.1f}{n / t:>14,.0f}{t_legacy / t:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de marketing")
+    parser.add_argument('-n', type=int, default=20000, help="número de produtos")
+    parser.add_argument('--variants', type=int, default=1, help="produtos que compartilham o mesmo texto")
+    args = parser.parse_args()
+    main(args.n, args.variants)
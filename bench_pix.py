@@ -0,0 +1,65 @@
+"""
+Micro-benchmark do CRC16/BR Code Pix.
+
+    python bench_pix.py            # 10.000 pedidos
+    python bench_pix.py -n 100000
+
+Compara o CRC bit a bit antigo (loop Python) com o novo (binascii) e a
+geração pedido a pedido com a API em lote `PixGenerator.generate_payloads`.
+"""
+import time
+import random
+import argparse
+from pix_utils import PixGenerator
+
+
+def crc16_bitwise(data):
+    # Implementação original, mantida só como referência de comparação
+    data = data.encode('utf-8')
+    poly = 0x1021
+    res = 0xFFFF
+    for b in data:
+        res ^= b << 8
+        for _ in range(8):
+            if res & 0x8000:
+                res = (res << 1) ^ poly
+            else:
+                res = res << 1
+            res &= 0xFFFF
+    return hex(res).upper()[2:].zfill(4)
+
+
+def legacy_payload(pix):
+    payload = pix.generate_payload()[:-4]
+    return f"{payload}{crc16_bitwise(payload)}"
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main(n, stores):
+    rnd = random.Random(42)
+    merchants = [(f"loja{i}@pix.com", f"LOJA {i}", "SAO PAULO") for i in range(stores)]
+    orders = [(*rnd.choice(merchants), round(rnd.uniform(5, 2000), 2)) for _ in range(n)]
+
+    legacy, t_legacy = timed(lambda: [legacy_payload(PixGenerator(*o)) for o in orders])
+    single, t_single = timed(lambda: [PixGenerator(*o).generate_payload() for o in orders])
+    batch, t_batch = timed(lambda: PixGenerator.generate_payloads(orders))
+
+    assert legacy == single == batch, "payloads divergentes!"
+
+    print(f"{n} pedidos, {stores} lojas")
+    print(f"{'implementação':<32}{'total (ms)':>12}{'pedidos/s':>14}{'speedup':>10}")
+    for label, t in (("CRC bit a bit (antigo)", t_legacy), ("CRC binascii, por pedido", t_single), ("generate_payloads (lote)", t_batch)):
+        print(f"{label:<32}{t * 1000:>12.1f}{n / t:>14,.0f}{t_legacy / t:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de geração de BR Code Pix")
+    parser.add_argument('-n', type=int, default=10000, help="número de pedidos")
+    parser.add_argument('--stores', type=int, default=20, help="número de recebedores distintos")
+    args = parser.parse_args()
+    main(args.n, args.stores)
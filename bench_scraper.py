@@ -0,0 +1,90 @@
+"""
+Benchmark do motor de extração do scraper.
+
+    python bench_scraper.py --corpus paginas_salvas/   # arquivos .html salvos
+    python bench_scraper.py                            # corpus sintético
+
+Compara o parse antigo (BeautifulSoup do documento inteiro + get_text) com
+`scraper_utils.extract_from_stream` (passo rápido com parada antecipada).
+"""
+import os
+import re
+import json
+import time
+import random
+import argparse
+from bs4 import BeautifulSoup
+from scraper_utils import extract_from_stream, CHUNK_SIZE
+
+
+def legacy_extract(html):
+    # Caminho antigo de fetch_metadata (documento inteiro no DOM), só para referência
+    soup = BeautifulSoup(html, 'lxml')
+    data = {"title": "", "price": 0.0, "images": []}
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            ld = json.loads(script.string.strip())
+            if isinstance(ld, list): ld = ld[0]
+            if ld.get('@type') == 'Product':
+                data["title"] = ld.get('name', '')
+                offers = ld.get('offers')
+                if isinstance(offers, dict): data["price"] = float(offers.get('price', 0))
+                break
+        except Exception: pass
+    if not data["title"]:
+        tag = soup.find('meta', property='og:title') or soup.find('title')
+        data["title"] = tag.get('content') if tag and tag.name == 'meta' else (tag.text if tag else "")
+    if not data["price"]:
+        m = re.search(r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})', soup.get_text())
+        if m: data["price"] = float(m.group(1).replace('.', '').replace(',', '.'))
+    og_img = soup.find('meta', property='og:image')
+    if og_img: data["images"].append(og_img.get('content'))
+    for img in soup.find_all('img', src=True): data["images"].append(img.get('src'))
+    return data
+
+
+def synthetic_corpus(n, size_kb):
+    rnd = random.Random(7)
+    pages = []
+    for i in range(n):
+        price = round(rnd.uniform(10, 3000), 2)
+        head = (f'<html><head><title>Produto {i} | Loja</title>'
+                f'<meta property="og:title" content="Produto {i}"><meta property="og:image" content="https://cdn.x/{i}.jpg">'
+                f'<script type="application/ld+json">{json.dumps({"@type": "Product", "name": f"Produto {i}", "image": [f"https://cdn.x/{i}-1.jpg"], "offers": {"price": price}})}</script>'
+                '</head><body>')
+        filler = ''.join(f'<div class="card"><img src="/thumb/{j}.jpg" width="120"><span class="price">R$ {j},90</span><p>{"lorem ipsum " * 20}</p></div>'
+                         for j in range(size_kb * 1024 // 330))
+        pages.append((f"sintetica_{i}.html", (head + filler + '</body></html>').encode()))
+    return pages
+
+
+def load_corpus(path):
+    return [(f, open(os.path.join(path, f), 'rb').read()) for f in sorted(os.listdir(path)) if f.endswith(('.html', '.htm'))]
+
+
+def chunks(data):
+    for i in range(0, len(data), CHUNK_SIZE): yield data[i:i + CHUNK_SIZE]
+
+
+def main(pages):
+    t_legacy = t_new = 0.0
+    early = full = 0
+    print(f"{'página':<28}{'KB':>8}{'antigo ms':>11}{'novo ms':>10}{'lidos KB':>10}  modo")
+    for name, raw in pages:
+        t0 = time.perf_counter(); legacy_extract(raw.decode('utf-8', 'replace')); dt_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter(); data, stats = extract_from_stream(chunks(raw), "https://exemplo.com/"); dt_new = time.perf_counter() - t0
+        t_legacy += dt_legacy; t_new += dt_new
+        early += stats["early_exit"]; full += stats["full_dom"]
+        mode = "parada antecipada" if stats["early_exit"] else ("DOM completo" if stats["full_dom"] else "passo rápido")
+        print(f"{name[:27]:<28}{len(raw) / 1024:>8.0f}{dt_legacy * 1000:>11.1f}{dt_new * 1000:>10.1f}{stats['bytes'] / 1024:>10.0f}  {mode}")
+    print(f"\nTotal: antigo {t_legacy * 1000:.0f} ms | novo {t_new * 1000:.0f} ms | speedup {t_legacy / max(t_new, 1e-9):.1f}x")
+    print(f"Parada antecipada: {early}/{len(pages)} | fallback DOM completo: {full}/{len(pages)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do extrator de produtos")
+    parser.add_argument('--corpus', help="diretório com páginas .html salvas")
+    parser.add_argument('-n', type=int, default=10, help="páginas sintéticas (sem --corpus)")
+    parser.add_argument('--size-kb', type=int, default=2048, help="tamanho de cada página sintética")
+    args = parser.parse_args()
+    main(load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.n, args.size_kb))
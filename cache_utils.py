@@ -0,0 +1,46 @@
+import threading
+from cachetools import TTLCache
+
+
+class StoreCache:
+    """
+    Cache em processo da configuração das lojas, chaveado por slug.
+    TTL curto + tamanho limitado; invalidação explícita quando a loja é salva.
+    """
+    def __init__(self, ttl=60, maxsize=128):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, slug, loader):
+        with self._lock:
+            store = self._cache.get(slug)
+            if store is not None:
+                self.hits += 1
+                return store
+            self.misses += 1
+
+        # Carrega fora do lock para não serializar requests em I/O
+        store = loader(slug)
+        if store is not None:
+            with self._lock:
+                self._cache[slug] = store
+        return store
+
+    def invalidate(self, slug=None):
+        with self._lock:
+            if slug is None: self._cache.clear()
+            else: self._cache.pop(slug, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl
+            }
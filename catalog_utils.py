@@ -0,0 +1,77 @@
+import json
+import uuid
+import base64
+from datetime import datetime
+
+# Apenas as colunas que o card da vitrine usa (store.html)
+CARD_COLUMNS = ("id, name, description, price, image_url, renditions, external_url, stock_quantity, created_at, "
+                "product_images(image_url, renditions)")
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(product):
+    raw = json.dumps([product['created_at'], product['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retorna (created_at, id) ou levanta ValueError se o cursor for inválido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pid = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        # O cursor vem do cliente e vai para dentro de um filtro `or=(...)`: só timestamp e uuid reserializados
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(pid))
+    except Exception:
+        raise ValueError("cursor inválido")
+
+
+def parse_limit(value):
+    try: limit = int(value)
+    except (TypeError, ValueError): return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def fetch_catalog_page(supabase, cursor=None, limit=DEFAULT_PAGE_SIZE, columns=CARD_COLUMNS):
+    """
+    Paginação por cursor (keyset) em (created_at, id) DESC.
+    O custo de cada página independe do tamanho do catálogo: o banco só
+    percorre o índice a partir do último item visto, nunca faz OFFSET.
+    Retorna (produtos, proximo_cursor).
+    """
+    return keyset_page(supabase.table('products').select(columns).eq('is_active', True), cursor, limit)
+
+
+def keyset_page(req, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Aplica o cursor (created_at, id) DESC a qualquer consulta já filtrada. Retorna (linhas, proximo_cursor)."""
+    if cursor:
+        created_at, pid = decode_cursor(cursor)
+        req = req.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{pid}")')
+
+    # Busca um item extra só para saber se existe próxima página
+    rows = req.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data or []
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def fetch_products_by_ids(supabase, ids, columns=CARD_COLUMNS):
+    """Busca por chave primária mantendo a ordem de `ids` (ex.: ranking da busca)."""
+    if not ids: return []
+    rows = supabase.table('products').select(columns).in_('id', ids).eq('is_active', True).execute().data or []
+    by_id = {str(r['id']): r for r in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def fetch_search_page(supabase, search_index, query, cursor=None, limit=DEFAULT_PAGE_SIZE, columns=CARD_COLUMNS):
+    """
+    Busca textual: o ranking sai do índice em memória e o banco só recebe um
+    lookup por id da página atual. Aqui o cursor é o deslocamento no ranking.
+    """
+    try: offset = max(0, int(cursor)) if cursor else 0
+    except ValueError: raise ValueError("cursor inválido")
+
+    ranked = search_index.search(query)
+    rows = fetch_products_by_ids(supabase, ranked[offset:offset + limit], columns)
+    next_cursor = str(offset + limit) if len(ranked) > offset + limit else None
+    return rows, next_cursor
@@ -0,0 +1,86 @@
+"""
+Pipeline de checkout em lote.
+
+1 query `in_()` para todos os produtos do carrinho + 1 RPC `place_order`
+que, numa única transação no Postgres, trava as linhas dos produtos, confere
+o estoque, decrementa, cria o pedido e insere todos os itens de uma vez.
+Nada de read-modify-write no app, então não há venda acima do estoque.
+"""
+import uuid
+
+
+def _failure(product_id, reason, name=None, requested=0, available=0):
+    return {"product_id": product_id, "name": name, "reason": reason, "requested": requested, "available": available}
+
+
+def is_product_id(value):
+    """Só UUIDs vão para o `in_()`: um id inválido derruba a query inteira (22P02 no PostgREST)."""
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def describe_failure(f):
+    name = f.get('name') or "Produto"
+    if f['reason'] == 'insufficient_stock':
+        return f"{name}: estoque insuficiente ({f['available']} disponíveis, {f['requested']} pedidos)"
+    return f"{name}: produto indisponível"
+
+
+def validate_cart(supabase, cart):
+    """
+    Confere todos os itens com uma única query.
+    Retorna (linhas_validas, falhas); cada linha traz name/price para o resumo.
+    """
+    ids = [pid for pid in cart if is_product_id(pid)]
+    rows = []
+    if ids:
+        rows = supabase.table('products').select("id, name, price, stock_quantity, is_active").in_('id', ids).execute().data or []
+    products = {str(p['id']): p for p in rows}
+
+    lines, failures = [], []
+    for pid, qty in cart.items():
+        p = products.get(pid)
+        if not p or p.get('is_active') is False:
+            failures.append(_failure(pid, 'not_found', requested=qty))
+            continue
+        stock = p.get('stock_quantity') or 0
+        if stock < qty:
+            failures.append(_failure(pid, 'insufficient_stock', p['name'], qty, stock))
+            continue
+        lines.append({"product_id": pid, "quantity": qty, "name": p['name'], "unit_price": float(p['price'])})
+    return lines, failures
+
+
+def place_order(supabase, store_id, customer_id, cart, delivery_address):
+    """
+    Cria o pedido de forma transacional (tudo ou nada).
+    Retorna (pedido, falhas): pedido = {"id", "total", "items"} ou None se alguma linha falhar.
+    """
+    if not cart: return None, []
+
+    lines, failures = validate_cart(supabase, cart)
+    if failures: return None, failures
+
+    res = supabase.rpc('place_order', {
+        "p_store_id": store_id,
+        "p_customer_id": customer_id,
+        "p_delivery_address": delivery_address,
+        "p_items": [{"product_id": l['product_id'], "quantity": l['quantity']} for l in lines]
+    }).execute()
+    result = res.data or {}
+
+    # O estoque pode ter mudado entre a validação e a transação (concorrência)
+    if result.get('failures'):
+        names = {l['product_id']: l['name'] for l in lines}
+        failures = [dict(f, name=names.get(str(f['product_id']))) for f in result['failures']]
+        return None, failures
+
+    order = {
+        "id": result['order_id'],
+        "total": float(result['total']),
+        "items": [{"name": l['name'], "quantity": l['quantity']} for l in lines]
+    }
+    return order, []
@@ -0,0 +1,98 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCounter:
+    """
+    Agregador write-behind de cliques: incrementos ficam em memória por produto
+    e são enviados de tempos em tempos numa única chamada RPC (incremento
+    atômico no servidor). Também descarrega ao atingir max_pending e no shutdown.
+    Uma única thread envia; `add` só a acorda. Se o envio falhar, a próxima
+    tentativa espera o dobro (até max_backoff), sem empilhar chamadas.
+    Em serverless a thread fica congelada entre invocações e o atexit não roda:
+    por isso o próprio `add` descarrega quando já passou `interval` desde o
+    último envio (sem esperar, se outro envio estiver em andamento).
+    """
+    def __init__(self, flush_fn, interval=10.0, max_pending=500, max_backoff=300.0):
+        self._flush_fn = flush_fn      # recebe {product_id: incremento}
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._backoff = 0.0
+        self._last_flush = time.monotonic()
+        self.flushed_total = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="click-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._backoff:
+                # Banco fora: nem o intervalo nem max_pending adiantam a próxima tentativa
+                if self._stop.wait(self._backoff): break
+            else:
+                self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set(): break
+            self.flush()
+
+    def add(self, product_id, n=1):
+        with self._lock:
+            self._pending[str(product_id)] += n
+            self._pending_total += n
+            full = self._pending_total >= self.max_pending
+            due = time.monotonic() - self._last_flush >= (self._backoff or self.interval)
+        if full: self._wake.set()
+        if due: self.flush(blocking=False)
+
+    def flush(self, blocking=True):
+        if not self._flush_lock.acquire(blocking=blocking): return 0  # outro envio em andamento
+        try:
+            with self._lock:
+                if not self._pending: return 0
+                batch, flushed = dict(self._pending), self._pending_total
+                self._pending, self._pending_total = Counter(), 0
+                self._last_flush = time.monotonic()
+            try:
+                self._flush_fn(batch)
+            except Exception as e:
+                # Devolve ao buffer para a próxima tentativa: nenhum clique se perde
+                with self._lock:
+                    self._pending.update(batch)
+                    self._pending_total += flushed
+                self.failures += 1
+                self._backoff = min(self.max_backoff, max(self.interval, self._backoff * 2))
+                logger.error(f"Erro ao descarregar cliques ({len(batch)} produtos), nova tentativa em {self._backoff:.0f}s: {e}")
+                return 0
+            self._backoff = 0.0
+            self.flushed_total += flushed
+            return flushed
+        finally:
+            self._flush_lock.release()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending_total, "products": len(self._pending), "flushed_total": self.flushed_total,
+                    "failures": self.failures, "backoff": self._backoff}
@@ -0,0 +1,65 @@
+"""
+Painéis do vendedor e do superadmin.
+
+Faturamento, contagens e pedidos por status vêm prontos do banco (RPCs
+`store_dashboard_stats` e `sales_summary`, ambas sobre o rollup diário);
+pedidos e produtos são listados por página com cursor (created_at, id).
+O custo de abrir o painel depende do tamanho da página, não do histórico.
+"""
+from datetime import date
+from catalog_utils import keyset_page
+
+# Só o que admin.html mostra
+ORDER_COLUMNS = "id, status, total, delivery_address, created_at, customers(name)"
+PRODUCT_COLUMNS = ("id, name, price, image_url, renditions, external_url, stock_quantity, clicks_count, created_at, "
+                   "product_images(id, image_url, renditions)")
+
+DASHBOARD_PAGE_SIZE = 20
+ORDER_STATUSES = ("pending_payment", "paid", "shipped", "delivered", "cancelled")
+
+
+def empty_stats():
+    return {"total_revenue": 0, "order_count": 0, "product_count": 0, "status_breakdown": {}}
+
+
+def fetch_store_stats(supabase, store_id):
+    """Agregados da loja numa única chamada: {total_revenue, order_count, product_count, status_breakdown}."""
+    data = supabase.rpc('store_dashboard_stats', {"p_store_id": store_id}).execute().data or {}
+    stats = empty_stats()
+    stats.update({k: v for k, v in data.items() if k in stats and v is not None})
+    stats["total_revenue"] = float(stats["total_revenue"])
+    return stats
+
+
+def fetch_orders_page(supabase, store_id, cursor=None, limit=DASHBOARD_PAGE_SIZE, status=None):
+    req = supabase.table('orders').select(ORDER_COLUMNS).eq('store_id', store_id)
+    if status: req = req.eq('status', status)
+    return keyset_page(req, cursor, limit)
+
+
+def fetch_products_page(supabase, store_id, cursor=None, limit=DASHBOARD_PAGE_SIZE):
+    return keyset_page(supabase.table('products').select(PRODUCT_COLUMNS).eq('store_id', store_id), cursor, limit)
+
+
+# --- BI GLOBAL (superadmin) ---
+# Lê a tabela daily_sales (loja, dia, status), mantida por trigger em orders:
+# o custo depende do número de dias/lojas no período, não do número de pedidos.
+
+def parse_day(value):
+    """'AAAA-MM-DD' -> mesma string normalizada, ou None se vazio/inválido."""
+    try: return date.fromisoformat((value or '').strip()).isoformat()
+    except ValueError: return None
+
+
+def fetch_sales_summary(supabase, date_from=None, date_to=None, store_id=None):
+    data = supabase.rpc('sales_summary', {"p_from": date_from, "p_to": date_to, "p_store_id": store_id}).execute().data or {}
+    total_sales = float(data.get('total_sales') or 0)
+    total_orders = int(data.get('total_orders') or 0)
+    return {
+        "total_sales": total_sales,
+        "total_orders": total_orders,
+        "avg_ticket": total_sales / total_orders if total_orders > 0 else 0,
+        "by_status": data.get('by_status') or {},
+        "by_store": data.get('by_store') or [],
+        "by_day": data.get('by_day') or [],
+    }
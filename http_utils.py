@@ -0,0 +1,114 @@
+"""
+Cliente HTTP de saída compartilhado (scraper, imagens, Uber Direct).
+
+Um único httpx.Client por processo: pool de conexões com keep-alive e
+HTTP/2 quando o pacote h2 está instalado, então buscas repetidas ao mesmo
+fornecedor/CDN reaproveitam a conexão TCP+TLS. Timeouts uniformes e um
+limite de requisições simultâneas por host valem para tudo que passa por aqui.
+
+    with http_utils.stream('GET', url, headers=h, timeout=5) as response:
+        for chunk in response.iter_bytes(65536): ...
+
+    response = http_utils.request('POST', url, json=payload)
+"""
+import os
+import ssl
+import threading
+import logging
+import urllib.parse
+from contextlib import contextmanager
+
+import httpx
+
+import trace_utils
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (só para saber se HTTP/2 está disponível)
+    HTTP2 = os.getenv("OUTBOUND_HTTP2", "1") != "0"
+except ImportError:
+    HTTP2 = False
+
+DEFAULT_TIMEOUT = float(os.getenv("OUTBOUND_TIMEOUT", "15"))
+CONNECT_TIMEOUT = float(os.getenv("OUTBOUND_CONNECT_TIMEOUT", "5"))
+MAX_CONNECTIONS = int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE = int(os.getenv("OUTBOUND_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = 30.0
+PER_HOST_LIMIT = int(os.getenv("OUTBOUND_PER_HOST", "6"))
+
+# Falhas de rede/protocolo que os chamadores tratam como "não deu, segue"
+HTTPError = (httpx.HTTPError, httpx.InvalidURL, httpx.StreamError)
+
+_lock = threading.Lock()
+_clients = {}       # verify -> (pid, httpx.Client)
+_host_limits = {}   # host -> semáforo
+_stats = {"requests": 0, "ssl_fallbacks": 0}
+
+
+def timeout_for(seconds=None):
+    total = DEFAULT_TIMEOUT if seconds is None else seconds
+    return httpx.Timeout(total, connect=min(CONNECT_TIMEOUT, total))
+
+
+def get_client(verify=True):
+    """Cliente do processo (um por modo de verificação de cert). Recriado depois de um fork."""
+    pid = os.getpid()
+    with _lock:
+        entry = _clients.get(verify)
+        if entry is None or entry[0] != pid:
+            client = trace_utils.instrument_httpx(httpx.Client(
+                http2=HTTP2, verify=verify, follow_redirects=True, timeout=timeout_for(),
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY)))
+            entry = _clients[verify] = (pid, client)
+        return entry[1]
+
+
+def host_limit(url):
+    host = urllib.parse.urlsplit(str(url)).netloc
+    with _lock:
+        sem = _host_limits.get(host)
+        if sem is None: sem = _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+    return sem
+
+
+def _is_cert_error(exc):
+    while exc is not None:
+        if isinstance(exc, ssl.SSLError): return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def _send(method, url, stream, headers=None, timeout=None, **kwargs):
+    with _lock: _stats["requests"] += 1
+    client = get_client()
+    try:
+        return client.send(client.build_request(method, url, headers=headers, timeout=timeout_for(timeout), **kwargs), stream=stream)
+    except httpx.ConnectError as e:
+        # Proxy/firewall que intercepta HTTPS com cert próprio: mesma tolerância que o app já tinha
+        if not _is_cert_error(e): raise
+        logger.warning(f"SSL falhou para {url}, tentando sem verificar cert...")
+        with _lock: _stats["ssl_fallbacks"] += 1
+        client = get_client(verify=False)
+        return client.send(client.build_request(method, url, headers=headers, timeout=timeout_for(timeout), **kwargs), stream=stream)
+
+
+@contextmanager
+def stream(method, url, headers=None, timeout=None, **kwargs):
+    """Resposta em streaming; a vaga do host fica ocupada até o bloco `with` terminar."""
+    with host_limit(url):
+        response = _send(method, url, True, headers, timeout, **kwargs)
+        try: yield response
+        finally: response.close()
+
+
+def request(method, url, headers=None, timeout=None, **kwargs):
+    """Requisição com corpo já lido (respostas pequenas: APIs, JSON)."""
+    with host_limit(url):
+        return _send(method, url, False, headers, timeout, **kwargs)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, http2=HTTP2, hosts=len(_host_limits), per_host_limit=PER_HOST_LIMIT)
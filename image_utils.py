@@ -0,0 +1,384 @@
+"""
+Persistência de imagens no Supabase Storage, endereçada por conteúdo.
+
+O download é em streaming com teto rígido de bytes (vale mesmo quando o
+servidor não manda content-length) e o sha256 é calculado enquanto os
+blocos chegam. O arquivo é salvo como `<sha256>.<ext>`, então a mesma imagem
+de fornecedor vira um único objeto no bucket; um índice local (SQLite) de
+hashes já persistidos evita até a chamada de upload nos repetidos.
+Na mesma passada saem as versões responsivas (WebP e JPEG em algumas
+larguras) que a vitrine usa no srcset.
+"""
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import hashlib
+import logging
+import threading
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from PIL import Image, ImageOps
+
+import http_utils
+
+logger = logging.getLogger(__name__)
+
+BUCKET = 'product-images'
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+CONTENT_TYPE_EXT = {'image/jpeg': 'jpg', 'image/jpg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+
+
+def sniff_image_type(head):
+    """Extensão pelos magic bytes (jpg/png/webp/gif) ou None."""
+    if head[:3] == b'\xff\xd8\xff': return 'jpg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n': return 'png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP': return 'webp'
+    if head[:6] in (b'GIF87a', b'GIF89a'): return 'gif'
+    return None
+
+
+def content_type_for(ext):
+    return f"image/{'jpeg' if ext == 'jpg' else ext}"
+
+
+class ImageIndex:
+    """Índice local sha256 -> URL pública (e versões responsivas) das imagens já enviadas ao Storage."""
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS images (sha256 TEXT PRIMARY KEY, url TEXT NOT NULL, size INTEGER, created_at REAL)")
+            try: conn.execute("ALTER TABLE images ADD COLUMN renditions TEXT")
+            except sqlite3.OperationalError: pass  # coluna já existe
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_images_url ON images (url)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, digest):
+        entry = self.get_entry(digest)
+        return entry["url"] if entry else None
+
+    def get_entry(self, digest):
+        """{"url", "renditions"}; renditions None = entrada anterior às versões, {} = geração falhou."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT url, renditions FROM images WHERE sha256 = ?", (digest,)).fetchone()
+        if not row: return None
+        return {"url": row[0], "renditions": json.loads(row[1]) if row[1] else None}
+
+    def renditions_for_url(self, url):
+        with self._connect() as conn:
+            row = conn.execute("SELECT renditions FROM images WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def put(self, digest, url, size, renditions=None):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO images (sha256, url, size, created_at, renditions) VALUES (?, ?, ?, ?, ?)",
+                         (digest, url, size, time.time(), json.dumps(renditions) if renditions is not None else None))
+
+
+def download_image(image_url, max_bytes=MAX_IMAGE_BYTES, timeout=15):
+    """
+    Baixa em blocos com teto de bytes e hash incremental.
+    Retorna (bytes, sha256_hex, ext) ou None (motivo no log).
+    """
+    with http_utils.stream('GET', image_url, headers=DOWNLOAD_HEADERS, timeout=timeout) as response:
+        if response.status_code != 200:
+            logger.warning(f"Falha download imagem: {response.status_code} - {image_url}")
+            return None
+
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            logger.warning(f"Imagem muito grande: {content_length} bytes - {image_url}")
+            return None
+
+        content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+        hasher = hashlib.sha256()
+        buf = bytearray()
+        ext = None
+        for chunk in response.iter_bytes(CHUNK_SIZE):
+            if not chunk: continue
+            if not buf:
+                # Decide pelo primeiro bloco: não baixa o resto de algo que não é imagem
+                ext = sniff_image_type(chunk[:16]) or CONTENT_TYPE_EXT.get(content_type)
+                if not ext:
+                    logger.warning(f"Arquivo não é imagem válida: {content_type} - {image_url}")
+                    return None
+            if len(buf) + len(chunk) > max_bytes:
+                logger.warning(f"Imagem excedeu {max_bytes} bytes durante o download - {image_url}")
+                return None
+            hasher.update(chunk)
+            buf.extend(chunk)
+
+    if not buf: return None
+    return bytes(buf), hasher.hexdigest(), ext
+
+
+def _upload(bucket, filename, data, content_type):
+    try:
+        bucket.upload(filename, data, {"content-type": content_type})
+    except Exception as e:
+        # Mesmo hash já enviado (por outra instância/índice apagado): o objeto é idêntico, reaproveita
+        if 'duplicate' not in str(e).lower() and '409' not in str(e) and 'already exists' not in str(e).lower():
+            raise
+    return bucket.get_public_url(filename)
+
+
+def persist_image(supabase, data, digest, ext, index=None, size=None):
+    """
+    Envia `<sha256>.<ext>` e as versões responsivas `r/<sha256>/<largura>.<fmt>`
+    (se ainda não existirem). Retorna {"url", "renditions"}.
+    `data` pode ser bytes ou um arquivo aberto em 'rb' (upload em blocos; passe `size`).
+    """
+    if index:
+        # Só entradas anteriores às versões (None) reenviam; falha fica gravada como {} e não repete
+        cached = index.get_entry(digest)
+        if cached and cached["renditions"] is not None: return cached
+
+    bucket = supabase.storage.from_(BUCKET)
+    # As versões saem antes do upload: o storage3 fecha o arquivo que recebe
+    try: made = make_renditions(data)
+    except Exception as e:
+        logger.warning(f"Versões responsivas falharam para {digest[:12]}: {e}")
+        made = {}
+    if hasattr(data, 'seek'): data.seek(0)
+    public_url = _upload(bucket, f"{digest}.{ext}", data, content_type_for(ext))
+    try:
+        renditions = upload_renditions(bucket, made, digest)
+    except Exception as e:
+        # A original já está salva; sem versões o template cai no src original
+        logger.warning(f"Envio das versões responsivas falhou para {digest[:12]}: {e}")
+        renditions = {}
+    if index: index.put(digest, public_url, len(data) if size is None else size, renditions)
+    return {"url": public_url, "renditions": renditions}
+
+
+def persist_image_bytes(supabase, data, digest, ext, index=None):
+    """Como persist_image, mas só a URL pública da original."""
+    return persist_image(supabase, data, digest, ext, index)["url"]
+
+
+def download_and_persist_full(supabase, image_url, index=None, max_bytes=MAX_IMAGE_BYTES, timeout=15):
+    """Baixa, deduplica e persiste. Retorna {"url", "renditions"} ou None se falhar."""
+    try:
+        result = download_image(image_url, max_bytes=max_bytes, timeout=timeout)
+        if not result: return None
+        data, digest, ext = result
+        persisted = persist_image(supabase, data, digest, ext, index)
+        logger.info(f"Imagem persistida: {digest[:12]}.{ext} de {image_url}")
+        return persisted
+    except Exception as e:
+        logger.error(f"Erro ao persistir imagem {image_url}: {e}")
+        return None
+
+
+def download_and_persist(supabase, image_url, index=None, max_bytes=MAX_IMAGE_BYTES, timeout=15):
+    """Baixa, deduplica e persiste. Retorna a URL pública do storage ou None se falhar."""
+    persisted = download_and_persist_full(supabase, image_url, index, max_bytes, timeout)
+    return persisted["url"] if persisted else None
+
+
+def default_index():
+    path = os.getenv("IMAGE_INDEX_PATH", os.path.join(tempfile.gettempdir(), "vapt_image_index.sqlite"))
+    try: return ImageIndex(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Índice local de imagens indisponível ({path}): {e}")
+        return None
+
+
+def map_bounded(fn, urls, max_workers=6, per_host=3, deadline=20.0, label="img-fetch"):
+    """
+    Aplica fn(url, timeout=segundos_restantes) em paralelo mantendo a ordem de `urls`.
+    Limita conexões simultâneas por host (não martela o CDN do fornecedor) e
+    respeita um prazo total: o que não terminar até `deadline` volta como None.
+    Cada chamada recebe só o tempo que sobra do prazo, e as que ainda estão na
+    fila quando ele vence nem começam. O tempo total fica próximo da URL mais
+    lenta, não da soma de todas.
+    """
+    if not urls: return []
+    host_limits = defaultdict(lambda: threading.Semaphore(per_host))
+    for u in urls: host_limits[urllib.parse.urlsplit(u).netloc]  # cria no thread principal
+    ends_at = time.monotonic() + deadline
+
+    def task(url):
+        with host_limits[urllib.parse.urlsplit(url).netloc]:
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0: return None
+            return fn(url, timeout=remaining)
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix=label)
+    try:
+        futures = [pool.submit(task, u) for u in urls]
+        done, pending = wait(futures, timeout=deadline)
+        for f in pending:
+            f.cancel()
+        if pending: logger.warning(f"{label}: {len(pending)} de {len(urls)} não concluída(s) em {deadline}s")
+        return [f.result() if f in done and not f.exception() else None for f in futures]
+    finally:
+        # Não espera os atrasados: terminam em segundo plano e o resultado é descartado
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- VERSÕES RESPONSIVAS ---
+# Geradas uma vez, quando a imagem é persistida; a vitrine escolhe pelo srcset.
+
+RENDITION_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_RENDITION_WIDTHS", "320,640,1024").split(','))
+RENDITION_FORMATS = (
+    ("webp", "WEBP", "image/webp", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+)
+MAX_RENDITION_PIXELS = 40_000_000
+
+
+def make_renditions(data, widths=RENDITION_WIDTHS):
+    """
+    {fmt: [(largura, bytes), ...]} em larguras crescentes. Nunca amplia: uma
+    imagem menor que a maior largura entra também no tamanho original.
+    `data`: bytes ou arquivo aberto (o Pillow lê sob demanda).
+    """
+    if hasattr(data, 'read'): data.seek(0)
+    img = Image.open(data if hasattr(data, 'read') else BytesIO(data))
+    if img.size[0] * img.size[1] > MAX_RENDITION_PIXELS: return {}
+    top = max(widths)
+    img.draft('RGB', (top, top))  # JPEG: o decoder já entrega reduzido (1/2, 1/4, 1/8)
+    img = ImageOps.exif_transpose(img)
+
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    w, h = img.size
+    targets = sorted({min(tw, w) for tw in widths}, reverse=True)
+
+    out = {fmt: [] for fmt, _, _, _ in RENDITION_FORMATS}
+    frame = img
+    for tw in targets:
+        # Cada versão sai da anterior (maior): menos pixels para reamostrar
+        if tw != frame.size[0]: frame = frame.resize((tw, max(1, round(h * tw / w))), Image.LANCZOS, reducing_gap=3.0)
+        for fmt, pil_fmt, _, opts in RENDITION_FORMATS:
+            pic = frame
+            if pil_fmt == 'JPEG' and pic.mode == 'RGBA':
+                pic = Image.new('RGB', frame.size, (255, 255, 255))
+                pic.paste(frame, mask=frame.getchannel('A'))
+            buf = BytesIO()
+            pic.save(buf, pil_fmt, **opts)
+            out[fmt].append((tw, buf.getvalue()))
+    for items in out.values(): items.reverse()
+    return out
+
+
+def upload_renditions(bucket, made, digest):
+    """Envia o resultado de make_renditions. Retorna {fmt: [[largura, url], ...]} (formato de products/product_images.renditions)."""
+    content_types = {fmt: ctype for fmt, _, ctype, _ in RENDITION_FORMATS}
+    return {fmt: [[w, _upload(bucket, f"r/{digest}/{w}.{fmt}", blob, content_types[fmt])] for w, blob in items]
+            for fmt, items in made.items()}
+
+
+def srcset(items):
+    """[[320, url], [640, url]] -> 'url 320w, url 640w'."""
+    return ", ".join(f"{url} {w}w" for w, url in items or [])
+
+
+def pick_rendition(renditions, width, fmt='jpg'):
+    """URL da menor versão com pelo menos `width` px (ou a maior que houver); None sem versões."""
+    items = (renditions or {}).get(fmt) or []
+    for w, url in items:
+        if w >= width: return url
+    return items[-1][1] if items else None
+
+
+def download_and_persist_many(supabase, image_urls, index=None, max_workers=6, per_host=3, deadline=20.0, max_bytes=MAX_IMAGE_BYTES):
+    """Persiste várias imagens em paralelo (ordem preservada); falhas/atrasos voltam como None."""
+    return map_bounded(lambda u, timeout: download_and_persist(supabase, u, index=index, max_bytes=max_bytes, timeout=min(timeout, 15)),
+                       image_urls, max_workers, per_host, deadline, label="img-fetch")
+
+
+# --- SONDAGEM DE DIMENSÕES ---
+# Lê só o começo do arquivo (Range GET) e decodifica o cabeçalho JPEG/PNG/WebP/GIF.
+
+PROBE_BYTES = 32 * 1024
+PROBE_MAX_BYTES = 128 * 1024  # JPEG com EXIF grande pode ter o SOF mais adiante
+MIN_IMAGE_SIDE = 200
+MAX_PROBE_CANDIDATES = 20
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_dimensions(head):
+    """(largura, altura) a partir dos primeiros bytes, ou None se ainda não der para saber."""
+    kind = sniff_image_type(head[:16])
+    if kind == 'png' and len(head) >= 24:
+        return int.from_bytes(head[16:20], 'big'), int.from_bytes(head[20:24], 'big')
+    if kind == 'gif' and len(head) >= 10:
+        return int.from_bytes(head[6:8], 'little'), int.from_bytes(head[8:10], 'little')
+    if kind == 'webp' and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b'VP8 ':
+            return int.from_bytes(head[26:28], 'little') & 0x3FFF, int.from_bytes(head[28:30], 'little') & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(head[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    if kind == 'jpg':
+        i = 2
+        while i + 9 < len(head):
+            if head[i] != 0xFF:
+                i += 1
+                continue
+            marker = head[i + 1]
+            if marker in (0xFF, 0x01) or 0xD0 <= marker <= 0xD9:
+                i += 2 if marker != 0xFF else 1
+                continue
+            size = int.from_bytes(head[i + 2:i + 4], 'big')
+            if marker in _JPEG_SOF:
+                return int.from_bytes(head[i + 7:i + 9], 'big'), int.from_bytes(head[i + 5:i + 7], 'big')
+            i += 2 + size
+    return None
+
+
+def probe_image(image_url, max_bytes=PROBE_MAX_BYTES, timeout=5):
+    """Dimensões reais lendo poucos KB (Range GET; se o servidor ignorar o Range, para de ler no teto)."""
+    headers = dict(DOWNLOAD_HEADERS, Range=f"bytes=0-{PROBE_BYTES - 1}")
+    try:
+        with http_utils.stream('GET', image_url, headers=headers, timeout=timeout) as response:
+            if response.status_code not in (200, 206): return None
+            head = bytearray()
+            chunks = response.iter_bytes(4096)
+            for chunk in chunks:
+                head.extend(chunk)
+                dims = image_dimensions(bytes(head))
+                if dims:
+                    if response.status_code == 206:
+                        for _ in chunks: pass  # resto do Range (até 32 KB): a conexão volta ao pool
+                    return dims
+                if len(head) >= max_bytes: break
+
+        # Range servido mas SOF além dele: uma segunda leitura maior (mesma conexão, keep-alive)
+        if response.status_code == 206 and len(head) < max_bytes and sniff_image_type(bytes(head[:16])) == 'jpg':
+            r = http_utils.request('GET', image_url, headers=dict(DOWNLOAD_HEADERS, Range=f"bytes=0-{max_bytes - 1}"), timeout=timeout)
+            return image_dimensions(r.content[:max_bytes])
+    except http_utils.HTTPError:
+        return None
+    return None
+
+
+def rank_image_candidates(image_urls, top=5, min_side=MIN_IMAGE_SIDE, deadline=8.0):
+    """
+    Sonda as candidatas em paralelo e devolve as `top` melhores por resolução,
+    descartando pixels de rastreio e miniaturas (lado menor < min_side).
+    A primeira candidata (imagem principal da página) continua na frente se passar no filtro;
+    as que não puderam ser sondadas ficam no fim, na ordem original.
+    """
+    urls = list(dict.fromkeys(u for u in image_urls if u))[:MAX_PROBE_CANDIDATES]
+    dims = map_bounded(lambda u, timeout: probe_image(u, timeout=min(timeout, 5)), urls,
+                       max_workers=8, per_host=4, deadline=deadline, label="img-probe")
+
+    known, unknown = [], []
+    for pos, (url, d) in enumerate(zip(urls, dims)):
+        if d is None: unknown.append(url)
+        elif min(d) >= min_side: known.append((pos, url, d[0] * d[1]))
+    known.sort(key=lambda k: (k[0] != 0, -k[2], k[0]))
+    return ([url for _, url, _ in known] + unknown)[:top]
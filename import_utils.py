@@ -0,0 +1,347 @@
+"""
+Importação em lote de catálogo (CSV ou JSONL), em streaming.
+
+    python import_utils.py fornecedor.csv --store demo
+    python import_utils.py feed.jsonl --store demo --batch-size 1000 --workers 16
+    python import_utils.py feed.csv --store demo --no-images --optimize
+
+O arquivo é lido linha a linha, nunca inteiro em memória. Por lote:
+1 consulta das imagens principais já persistidas em importações anteriores,
+1 upsert de produtos (chave: loja + sku) e 1 upsert de product_images
+(chave: produto + URL de origem; as já existentes não são tocadas).
+As imagens novas vão para um pool limitado em segundo plano. A fila tem
+tamanho máximo: se o download ficar para trás, a leitura do arquivo espera.
+
+Colunas aceitas (CSV com "," ou ";"): sku, name, description, price,
+stock_quantity, image_url, images (URLs separadas por "|"), external_url,
+is_active. Também em português: nome, descricao, preco, estoque, imagem, imagens, link.
+
+No painel (POST /vendedor/importar) a importação roda dentro da própria
+requisição e para em IMPORT_SYNC_MAX_ROWS linhas: na Vercel a função é
+congelada ao responder, então nada pode ficar rodando depois. Feeds maiores
+vão por esta linha de comando.
+"""
+import os
+import io
+import csv
+import json
+import time
+import logging
+import argparse
+import itertools
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from image_utils import download_and_persist_full
+from marketing_utils import optimize_many
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+DEFAULT_IMAGE_WORKERS = 8
+IMAGES_PER_HOST = 4
+QUEUE_PER_WORKER = 4
+MAX_IMAGES_PER_PRODUCT = 10
+MAX_ERRORS_KEPT = 200
+LOOKUP_CHUNK = 50  # URLs por filtro in_() (tamanho da query string)
+IMPORT_SYNC_MAX_ROWS = int(os.getenv("IMPORT_SYNC_MAX_ROWS", "2000"))  # teto da importação pelo painel
+
+ALIASES = {
+    "nome": "name", "title": "name", "titulo": "name", "título": "name",
+    "descricao": "description", "descrição": "description",
+    "preco": "price", "preço": "price",
+    "estoque": "stock_quantity", "stock": "stock_quantity", "quantidade": "stock_quantity",
+    "imagem": "image_url", "image": "image_url",
+    "imagens": "images",
+    "link": "external_url", "url": "external_url",
+    "ativo": "is_active",
+}
+TRUE_VALUES = {"1", "true", "sim", "s", "yes", "y", "ativo"}
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().rsplit('.', 1)[-1] in ('jsonl', 'ndjson', 'json') else 'csv'
+
+
+def iter_rows(stream, fmt='csv'):
+    """Gera (nº da linha, dict) a partir de um arquivo binário ou texto; linha ilegível vem como None."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip(): continue
+            try: row = json.loads(line)
+            except ValueError: row = None
+            yield line_no, row if isinstance(row, dict) else None
+        return
+
+    header = stream.readline()
+    if not header: return
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(itertools.chain([header], stream), delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_price(val):
+    if isinstance(val, (int, float)): return float(val)
+    val = str(val or '').replace('R$', '').replace(' ', '')
+    if ',' in val: val = val.replace('.', '').replace(',', '.')  # formato brasileiro "1.299,90"
+    return float(val)
+
+
+def _image_list(row):
+    raw = []
+    for key in ('image_url', 'images'):
+        val = row.get(key)
+        if isinstance(val, list): raw.extend(val)
+        elif val: raw.extend(str(val).replace('|', ' ').split())
+    images = []
+    for url in raw:
+        url = str(url).strip()
+        if url.startswith(('http://', 'https://')) and url not in images:
+            images.append(url)
+    return images[:MAX_IMAGES_PER_PRODUCT]
+
+
+def validate_row(raw):
+    """Retorna (produto, imagens, erro). Produto sem store_id/image_url (preenchidos no lote)."""
+    row = {ALIASES.get(k, k): v for k, v in ((str(k).strip().lower(), v) for k, v in raw.items() if k is not None)}
+
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku: return None, None, "sku obrigatório"
+    if not name: return None, None, "nome obrigatório"
+
+    try: price = parse_price(row.get('price'))
+    except ValueError: return None, None, f"preço inválido: {row.get('price')!r}"
+    if price < 0: return None, None, "preço negativo"
+
+    stock = row.get('stock_quantity')
+    try: stock = 1 if stock in (None, '') else int(float(stock))
+    except (TypeError, ValueError): return None, None, f"estoque inválido: {stock!r}"
+    if stock < 0: return None, None, "estoque negativo"
+
+    active = row.get('is_active')
+    if not isinstance(active, bool):
+        active = True if active in (None, '') else str(active).strip().lower() in TRUE_VALUES
+
+    product = {
+        "sku": sku,
+        "name": name,
+        "description": str(row.get('description') or '').strip() or None,
+        "price": round(price, 2),
+        "stock_quantity": stock,
+        "external_url": str(row.get('external_url') or '').strip() or None,
+        "is_active": active,
+    }
+    return product, _image_list(row), None
+
+
+class CatalogImporter:
+    """
+    Importa um fluxo de linhas em lotes. `progress(report)` é chamado após
+    cada lote e no fim; `report` também pode ser lido a qualquer momento
+    (snapshot) enquanto a importação roda em outra thread.
+    """
+    def __init__(self, supabase, store_id, batch_size=DEFAULT_BATCH_SIZE, image_workers=DEFAULT_IMAGE_WORKERS,
+                 persist_images=True, optimize=False, progress=None, index=None):
+        self.supabase = supabase
+        self.store_id = store_id
+        self.batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+        self.optimize = optimize
+        self.progress = progress
+        self.index = index
+        self._lock = threading.Lock()
+        self._pool = None
+        if persist_images:
+            self._pool = ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix="import-img")
+            self._slots = threading.BoundedSemaphore(image_workers * QUEUE_PER_WORKER)
+            self._hosts = {}
+        self.started = time.time()
+        self.report = {"read": 0, "imported": 0, "invalid": 0, "failed": 0, "batches": 0,
+                       "images_queued": 0, "images_persisted": 0, "images_failed": 0,
+                       "elapsed": 0.0, "done": False, "truncated": False, "errors": []}
+
+    def snapshot(self):
+        with self._lock:
+            report = dict(self.report, errors=list(self.report["errors"]))
+        if not report["done"]: report["elapsed"] = round(time.time() - self.started, 1)
+        return report
+
+    def import_file(self, path, fmt=None, max_rows=None):
+        with open(path, 'rb') as f:
+            return self.run(iter_rows(f, fmt or detect_format(path)), max_rows)
+
+    def run(self, rows, max_rows=None):
+        """Com `max_rows`, para nesse número de linhas e marca `truncated` se o arquivo tinha mais."""
+        batch = {}
+        try:
+            for line_no, raw in rows:
+                if max_rows and self.report["read"] >= max_rows:
+                    with self._lock: self.report["truncated"] = True
+                    break
+                with self._lock: self.report["read"] += 1
+                if raw is None:
+                    self._error(line_no, "linha ilegível")
+                    continue
+                product, images, error = validate_row(raw)
+                if error:
+                    self._error(line_no, error)
+                    continue
+                # sku repetido dentro do lote: vale a última linha (o upsert não aceita duplicata)
+                batch.pop(product['sku'], None)
+                batch[product['sku']] = (line_no, product, images)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = {}
+            if batch: self._flush(batch)
+        finally:
+            if self._pool: self._pool.shutdown(wait=True)
+            with self._lock:
+                self.report["elapsed"] = round(time.time() - self.started, 1)
+                self.report["done"] = True
+            self._notify()
+        return self.snapshot()
+
+    def _error(self, line_no, message, invalid=True):
+        with self._lock:
+            if invalid: self.report["invalid"] += 1
+            if len(self.report["errors"]) < MAX_ERRORS_KEPT:
+                self.report["errors"].append({"line": line_no, "error": message})
+
+    def _notify(self):
+        if self.progress:
+            try: self.progress(self.snapshot())
+            except Exception as e: logger.warning(f"import: callback de progresso falhou: {e}")
+
+    def _persisted_urls(self, sources):
+        """URL de origem -> (URL no Storage, versões), para imagens já persistidas em importações anteriores."""
+        known = {}
+        for i in range(0, len(sources), LOOKUP_CHUNK):
+            rows = self.supabase.table('product_images').select("source_url, image_url, renditions") \
+                .in_('source_url', sources[i:i + LOOKUP_CHUNK]).execute().data or []
+            for r in rows:
+                if r['image_url'] != r['source_url']: known[r['source_url']] = (r['image_url'], r.get('renditions'))
+        return known
+
+    def _flush(self, batch):
+        entries = list(batch.values())
+        products = [p for _, p, _ in entries]
+
+        if self.optimize:
+            copy = optimize_many({"title": p['name'], "description": p['description'] or ''} for p in products)
+            for p, (title, desc) in zip(products, copy):
+                p['name'] = title or p['name']
+                p['description'] = desc or p['description']
+
+        try:
+            known = self._persisted_urls(list({imgs[0] for _, _, imgs in entries if imgs}))
+            for _, p, imgs in entries:
+                p['store_id'] = self.store_id
+                p['image_url'], p['renditions'] = known.get(imgs[0], (imgs[0], None)) if imgs else (None, None)
+            res = self.supabase.table('products').upsert(products, on_conflict='store_id,sku').execute()
+        except Exception as e:
+            logger.error(f"import: lote com {len(entries)} produto(s) falhou: {e}")
+            with self._lock: self.report["failed"] += len(entries)
+            self._error(entries[0][0], f"falha no lote de {len(entries)} linha(s): {e}", invalid=False)
+            return
+
+        ids = {r['sku']: r['id'] for r in res.data or []}
+        with self._lock:
+            self.report["imported"] += len(ids)
+            self.report["batches"] += 1
+
+        img_rows = []
+        for _, p, imgs in entries:
+            if p['sku'] not in ids: continue
+            for i, url in enumerate(imgs):
+                final_url, renditions = known.get(url, (url, None))
+                img_rows.append({"product_id": ids[p['sku']], "image_url": final_url, "renditions": renditions,
+                                 "source_url": url, "display_order": i})
+        if img_rows:
+            try:
+                # ignore_duplicates: só as linhas realmente novas voltam (e vão para o download)
+                new_rows = self.supabase.table('product_images') \
+                    .upsert(img_rows, on_conflict='product_id,source_url', ignore_duplicates=True).execute().data or []
+            except Exception as e:
+                logger.error(f"import: imagens do lote falharam: {e}")
+                new_rows = []
+            if self._pool:
+                for r in new_rows:
+                    if r['image_url'] == r['source_url']:
+                        self._submit(r['product_id'], r['source_url'], r.get('display_order') == 0)
+        self._notify()
+
+    def _submit(self, product_id, source, is_main):
+        self._slots.acquire()  # fila cheia: a leitura do arquivo espera
+        host = urllib.parse.urlsplit(source).netloc
+        host_slot = self._hosts.get(host) or self._hosts.setdefault(host, threading.Semaphore(IMAGES_PER_HOST))
+        with self._lock: self.report["images_queued"] += 1
+        self._pool.submit(self._persist, host_slot, product_id, source, is_main)
+
+    def _persist(self, host_slot, product_id, source, is_main):
+        url = None
+        try:
+            with host_slot:
+                persisted = download_and_persist_full(self.supabase, source, index=self.index)
+            if persisted:
+                url = persisted["url"]
+                update = {"image_url": url, "renditions": persisted["renditions"] or None}
+                self.supabase.table('product_images').update(update) \
+                    .eq('product_id', product_id).eq('source_url', source).execute()
+                if is_main:
+                    self.supabase.table('products').update(update) \
+                        .eq('id', product_id).eq('image_url', source).execute()
+        except Exception as e:
+            logger.warning(f"import: imagem {source} falhou: {e}")
+            url = None
+        finally:
+            self._slots.release()
+        with self._lock: self.report["images_persisted" if url else "images_failed"] += 1
+
+
+def _print_progress(report):
+    rate = report["read"] / report["elapsed"] if report["elapsed"] else 0
+    print(f"  linhas {report['read']:>8} | importados {report['imported']:>8} | inválidas {report['invalid']:>6} | "
+          f"imagens {report['images_persisted']}/{report['images_queued']} ({report['images_failed']} falhas) | "
+          f"{rate:,.0f} linhas/s", flush=True)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from supabase import create_client
+    from image_utils import default_index
+
+    parser = argparse.ArgumentParser(description="Importação em lote de catálogo (CSV/JSONL)")
+    parser.add_argument('path', help="arquivo .csv ou .jsonl")
+    parser.add_argument('--store', default='default', help="slug da loja de destino")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="padrão: pela extensão do arquivo")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_IMAGE_WORKERS, help="downloads de imagem simultâneos")
+    parser.add_argument('--no-images', action='store_true', help="mantém as URLs externas, sem baixar")
+    parser.add_argument('--optimize', action='store_true', help="aplica a copy de marketing em título/descrição")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.WARNING)
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+    store = supabase.table('stores').select("id").eq('slug', args.store).limit(1).execute().data
+    if not store: raise SystemExit(f"Loja '{args.store}' não encontrada.")
+
+    importer = CatalogImporter(supabase, store[0]['id'], batch_size=args.batch_size, image_workers=args.workers,
+                               persist_images=not args.no_images, optimize=args.optimize,
+                               progress=_print_progress, index=default_index())
+    print(f"Importando {args.path} para a loja '{args.store}'...")
+    report = importer.import_file(args.path, args.format)
+
+    print("\n--- RELATÓRIO DE IMPORTAÇÃO ---")
+    print(f"Linhas lidas: {report['read']} | importados: {report['imported']} | inválidas: {report['invalid']} | "
+          f"em lotes com falha: {report['failed']}")
+    print(f"Imagens: {report['images_persisted']} persistidas, {report['images_failed']} falhas")
+    print(f"Tempo total: {report['elapsed']} s")
+    for e in report['errors'][:20]:
+        print(f"  linha {e['line']}: {e['error']}")
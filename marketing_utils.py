@@ -0,0 +1,104 @@
+"""
+IA de Marketing: pipeline de copy (título magnético + descrição em bullets).
+
+As regras são compiladas uma única vez no import. Cada limpeza de título
+carrega um literal obrigatório: se ele não aparece no título (em minúsculas),
+a regex nem roda. `optimize_many` processa um lote inteiro (importação de
+catálogo) reaproveitando o resultado de títulos/descrições repetidos.
+"""
+import re
+
+# (literal obrigatório, regex). Ordem importa: as regras são aplicadas em sequência.
+# OBS: escapar o pipe | para não remover espaços
+TITLE_CLEANUPS = [(hint, re.compile(pattern, re.I)) for hint, pattern in (
+    (" - ", r" - .*?$"),
+    (" | ", r" \| .*?$"),
+    (" loja", r" lojas? oficial$"),
+    (" frete", r" frete grátis.*$"),
+    (" cupom", r" cupom de desconto.*$"),
+    (" compre", r" compre aqui.*$"),
+    (" melhor", r" melhor preço.*$"),
+    (" parcela", r" parcelas? sem juros.*$"),
+    (" até ", r" até \d+x.*$"),
+)]
+
+WS_RE = re.compile(r'\s+')
+TAG_RE = re.compile(r'<[^>]+>')
+SENTENCE_RE = re.compile(r'[;.]')
+
+MAX_TITLE_CHARS = 60
+MAX_TITLE_WORDS = 10
+MAX_POINTS = 5
+MIN_POINT_CHARS = 20
+
+DESC_INTRO = "💎 **Oportunidade Premium**\n\n"
+DESC_FOOTER = "\n\n🚀 *Garanta o seu hoje mesmo! Estoque limitado.*"
+
+
+def optimize_title(title):
+    title = (title or '').strip()
+    if not title: return title
+
+    # Remover lixo comum de SEO/venda; só o sufixo é cortado, então o literal
+    # de uma regra continua ausente depois das regras anteriores
+    lowered = title.lower()
+    for hint, pattern in TITLE_CLEANUPS:
+        if hint in lowered:
+            title = pattern.sub("", title).strip()
+
+    # Se for muito longo, resumir mantendo apenas as primeiras palavras (Marca + Modelo)
+    if len(title) > MAX_TITLE_CHARS:
+        title = " ".join(title.split()[:MAX_TITLE_WORDS])
+        if len(title) > 57: title = title[:57] + "..."
+
+    # Title Case amigável e limpeza de espaços extras
+    title = WS_RE.sub(' ', title).strip()
+    if title.isupper() or title.islower():
+        title = title.title()
+    return title
+
+
+def optimize_description(desc):
+    desc = (desc or '').strip()
+    if not desc: return desc
+
+    # Limpar excesso de HTML/Espaços
+    if '<' in desc: desc = TAG_RE.sub('', desc)
+    desc = WS_RE.sub(' ', desc).strip()
+
+    # Quebrar por pontos/ponto e vírgula para criar bullets (frases longas)
+    points = []
+    for p in SENTENCE_RE.split(desc):
+        p = p.strip()
+        if len(p) > MIN_POINT_CHARS:
+            points.append(f"✨ {p}")
+            if len(points) == MAX_POINTS: break
+
+    body = "\n".join(points) if points else desc[:300]
+    return f"{DESC_INTRO}{body}{DESC_FOOTER}"
+
+
+def optimize_marketing_data(raw_data):
+    """
+    IA de Marketing: Otimiza título e descrição para venda profissional.
+    """
+    return optimize_title(raw_data.get('title', '')), optimize_description(raw_data.get('description', ''))
+
+
+def optimize_many(products):
+    """
+    Modo em lote: `products` é um iterável de dicts com title/description.
+    Retorna a lista de (titulo, descricao) na mesma ordem. Feeds de fornecedor
+    repetem muito texto (variações de cor/tamanho), então cada título ou
+    descrição distinta é processada uma vez só.
+    """
+    titles, descs = {}, {}
+    results = []
+    for p in products:
+        t, d = p.get('title', '') or '', p.get('description', '') or ''
+        ot = titles.get(t)
+        if ot is None: ot = titles[t] = optimize_title(t)
+        od = descs.get(d)
+        if od is None: od = descs[d] = optimize_description(d)
+        results.append((ot, od))
+    return results
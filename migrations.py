@@ -0,0 +1,373 @@
+"""
+Migrações versionadas do schema (Supabase/Postgres).
+
+O app NÃO executa migrações no import: no cold start ele apenas lê a linha
+única de `schema_version` (uma query) e segue. As migrações rodam somente
+pela CLI abaixo, com relatório de tempo:
+
+    python migrations.py            # aplica pendentes
+    python migrations.py --status   # mostra versão atual x esperada
+    python migrations.py --dry-run  # lista o que seria aplicado
+
+Requer DATABASE_URL (string de conexão Postgres do Supabase).
+"""
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+BOOTSTRAP_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+INSERT INTO schema_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+"""
+
+# Lista ordenada: (versão, descrição, sql). Nunca edite uma migração já publicada,
+# adicione uma nova no final.
+MIGRATIONS = [
+    (1, "colunas base (antigo init_db) + loja default", """
+        CREATE OR REPLACE FUNCTION add_column_if_not_exists(t_name TEXT, c_name TEXT, c_type TEXT)
+        RETURNS void AS $$
+        BEGIN
+            EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS %I %s', t_name, c_name, c_type);
+        END;
+        $$ LANGUAGE plpgsql;
+
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS external_url TEXT;
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS clicks_count INTEGER DEFAULT 0;
+        ALTER TABLE stores ADD COLUMN IF NOT EXISTS pix_key TEXT;
+        ALTER TABLE stores ADD COLUMN IF NOT EXISTS pix_name TEXT;
+        ALTER TABLE stores ADD COLUMN IF NOT EXISTS pix_city TEXT;
+        ALTER TABLE stores ADD COLUMN IF NOT EXISTS admin_user TEXT DEFAULT 'admin';
+        ALTER TABLE stores ADD COLUMN IF NOT EXISTS admin_password TEXT DEFAULT 'admin';
+        ALTER TABLE customers ADD COLUMN IF NOT EXISTS password TEXT;
+
+        INSERT INTO stores (slug, name, whatsapp, admin_user, admin_password)
+        SELECT 'default', 'Venda Vapt Vupt', '5511999999999', 'admin', 'admin'
+        WHERE NOT EXISTS (SELECT 1 FROM stores WHERE slug = 'default');
+
+        UPDATE stores SET admin_user = 'admin', admin_password = 'admin'
+        WHERE slug = 'default' AND (admin_user IS NULL OR admin_user = '');
+    """),
+    (2, "índice keyset da vitrine (created_at, id)", """
+        CREATE INDEX IF NOT EXISTS idx_products_active_keyset
+            ON products (created_at DESC, id DESC) WHERE is_active = TRUE;
+    """),
+    (3, "RPC increment_clicks (incremento em lote, atômico)", """
+        CREATE OR REPLACE FUNCTION increment_clicks(increments JSONB)
+        RETURNS void AS $$
+            UPDATE products p
+            SET clicks_count = COALESCE(p.clicks_count, 0) + (inc.value)::INTEGER
+            FROM jsonb_each_text(increments) AS inc
+            WHERE p.id = (inc.key)::UUID;
+        $$ LANGUAGE sql;
+    """),
+    (4, "RPC place_order (checkout transacional em lote)", """
+        CREATE OR REPLACE FUNCTION place_order(p_store_id UUID, p_customer_id UUID, p_delivery_address TEXT, p_items JSONB)
+        RETURNS JSONB AS $$
+        DECLARE
+            v_failures JSONB;
+            v_total NUMERIC;
+            v_order_id UUID;
+        BEGIN
+            -- Trava as linhas do carrinho (ordenadas por id para evitar deadlock)
+            PERFORM 1 FROM products
+            WHERE id IN (SELECT (e->>'product_id')::UUID FROM jsonb_array_elements(p_items) e)
+            ORDER BY id FOR UPDATE;
+
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                       'product_id', i.product_id,
+                       'reason', CASE WHEN p.id IS NULL THEN 'not_found' ELSE 'insufficient_stock' END,
+                       'requested', i.quantity,
+                       'available', COALESCE(p.stock_quantity, 0))), '[]'::JSONB)
+            INTO v_failures
+            FROM jsonb_to_recordset(p_items) AS i(product_id UUID, quantity INTEGER)
+            LEFT JOIN products p ON p.id = i.product_id AND p.is_active IS NOT FALSE
+            WHERE p.id IS NULL OR COALESCE(p.stock_quantity, 0) < i.quantity;
+
+            IF jsonb_array_length(v_failures) > 0 THEN
+                RETURN jsonb_build_object('order_id', NULL, 'total', 0, 'failures', v_failures);
+            END IF;
+
+            SELECT COALESCE(SUM(p.price * i.quantity), 0) INTO v_total
+            FROM jsonb_to_recordset(p_items) AS i(product_id UUID, quantity INTEGER)
+            JOIN products p ON p.id = i.product_id;
+
+            UPDATE products p SET stock_quantity = COALESCE(p.stock_quantity, 0) - i.quantity
+            FROM jsonb_to_recordset(p_items) AS i(product_id UUID, quantity INTEGER)
+            WHERE p.id = i.product_id;
+
+            INSERT INTO orders (store_id, customer_id, subtotal, total, status, delivery_address)
+            VALUES (p_store_id, p_customer_id, v_total, v_total, 'pending_payment', p_delivery_address)
+            RETURNING id INTO v_order_id;
+
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+            SELECT v_order_id, i.product_id, i.quantity, p.price
+            FROM jsonb_to_recordset(p_items) AS i(product_id UUID, quantity INTEGER)
+            JOIN products p ON p.id = i.product_id;
+
+            RETURN jsonb_build_object('order_id', v_order_id, 'total', v_total, 'failures', '[]'::JSONB);
+        END;
+        $$ LANGUAGE plpgsql;
+    """),
+    (5, "importação em lote: sku único por loja, origem das imagens", """
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS sku TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_products_store_sku ON products (store_id, sku);
+
+        ALTER TABLE product_images ADD COLUMN IF NOT EXISTS display_order INTEGER DEFAULT 0;
+        ALTER TABLE product_images ADD COLUMN IF NOT EXISTS source_url TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_product_images_source ON product_images (product_id, source_url);
+        CREATE INDEX IF NOT EXISTS idx_product_images_source_url ON product_images (source_url);
+    """),
+    (6, "painel do vendedor: agregados no banco + índices de paginação", """
+        CREATE INDEX IF NOT EXISTS idx_orders_store_keyset ON orders (store_id, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_products_store_keyset ON products (store_id, created_at DESC, id DESC);
+
+        CREATE OR REPLACE FUNCTION store_dashboard_stats(p_store_id UUID)
+        RETURNS JSONB AS $$
+            WITH by_status AS (
+                SELECT status, COUNT(*) AS order_count, COALESCE(SUM(total), 0) AS revenue
+                FROM orders WHERE store_id = p_store_id
+                GROUP BY status
+            )
+            SELECT jsonb_build_object(
+                'total_revenue', (SELECT COALESCE(SUM(revenue), 0) FROM by_status WHERE status IS DISTINCT FROM 'cancelled'),
+                'order_count', (SELECT COALESCE(SUM(order_count), 0) FROM by_status),
+                'product_count', (SELECT COUNT(*) FROM products WHERE store_id = p_store_id),
+                'status_breakdown', COALESCE((SELECT jsonb_object_agg(COALESCE(status, 'unknown'),
+                    jsonb_build_object('count', order_count, 'revenue', revenue)) FROM by_status), '{}'::jsonb)
+            );
+        $$ LANGUAGE sql STABLE;
+    """),
+    (7, "rollups diários de vendas (loja, dia, status) mantidos por trigger", """
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            store_id UUID NOT NULL,
+            day DATE NOT NULL,
+            status TEXT NOT NULL,
+            order_count BIGINT NOT NULL DEFAULT 0,
+            revenue NUMERIC(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (store_id, day, status)
+        );
+        CREATE INDEX IF NOT EXISTS idx_daily_sales_day ON daily_sales (day);
+
+        -- Dia comercial no fuso da operação, não em UTC
+        CREATE OR REPLACE FUNCTION sales_day(ts TIMESTAMPTZ) RETURNS DATE AS $$
+            SELECT (COALESCE(ts, NOW()) AT TIME ZONE 'America/Sao_Paulo')::date;
+        $$ LANGUAGE sql STABLE;
+
+        CREATE OR REPLACE FUNCTION bump_daily_sales(p_store_id UUID, p_day DATE, p_status TEXT, p_count INTEGER, p_revenue NUMERIC)
+        RETURNS void AS $$
+            INSERT INTO daily_sales (store_id, day, status, order_count, revenue)
+            VALUES (p_store_id, p_day, COALESCE(p_status, 'unknown'), p_count, COALESCE(p_revenue, 0))
+            ON CONFLICT (store_id, day, status) DO UPDATE
+                SET order_count = daily_sales.order_count + EXCLUDED.order_count,
+                    revenue = daily_sales.revenue + EXCLUDED.revenue;
+        $$ LANGUAGE sql;
+
+        -- Cada mudança de pedido sai da linha antiga e entra na nova (mesma transação do pedido)
+        CREATE OR REPLACE FUNCTION orders_rollup_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND (OLD.store_id, OLD.created_at, OLD.status, OLD.total)
+                IS NOT DISTINCT FROM (NEW.store_id, NEW.created_at, NEW.status, NEW.total) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.store_id IS NOT NULL THEN
+                PERFORM bump_daily_sales(OLD.store_id, sales_day(OLD.created_at), OLD.status, -1, -COALESCE(OLD.total, 0));
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.store_id IS NOT NULL THEN
+                PERFORM bump_daily_sales(NEW.store_id, sales_day(NEW.created_at), NEW.status, 1, COALESCE(NEW.total, 0));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_orders_rollup ON orders;
+        CREATE TRIGGER trg_orders_rollup
+            AFTER INSERT OR DELETE OR UPDATE OF store_id, created_at, status, total ON orders
+            FOR EACH ROW EXECUTE FUNCTION orders_rollup_trigger();
+
+        -- Reconstrução completa (backfill). Bloqueia escrita em orders enquanto roda.
+        CREATE OR REPLACE FUNCTION rebuild_daily_sales() RETURNS BIGINT AS $$
+        DECLARE
+            n BIGINT;
+        BEGIN
+            LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE;
+            DELETE FROM daily_sales;
+            INSERT INTO daily_sales (store_id, day, status, order_count, revenue)
+            SELECT store_id, sales_day(created_at), COALESCE(status, 'unknown'), COUNT(*), COALESCE(SUM(total), 0)
+            FROM orders WHERE store_id IS NOT NULL
+            GROUP BY 1, 2, 3;
+            GET DIAGNOSTICS n = ROW_COUNT;
+            RETURN n;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        SELECT rebuild_daily_sales();
+
+        CREATE OR REPLACE FUNCTION sales_summary(p_from DATE DEFAULT NULL, p_to DATE DEFAULT NULL, p_store_id UUID DEFAULT NULL)
+        RETURNS JSONB AS $$
+            WITH r AS (
+                SELECT * FROM daily_sales
+                WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to)
+                  AND (p_store_id IS NULL OR store_id = p_store_id)
+            )
+            SELECT jsonb_build_object(
+                'total_sales', (SELECT COALESCE(SUM(revenue), 0) FROM r WHERE status <> 'cancelled'),
+                'total_orders', (SELECT COALESCE(SUM(order_count), 0) FROM r),
+                'by_status', COALESCE((SELECT jsonb_object_agg(status, jsonb_build_object('count', c, 'revenue', v)) FROM (
+                    SELECT status, SUM(order_count) AS c, SUM(revenue) AS v FROM r
+                    GROUP BY status HAVING SUM(order_count) > 0) s), '{}'::jsonb),
+                'by_store', COALESCE((SELECT jsonb_agg(jsonb_build_object('store_id', store_id, 'orders', c, 'revenue', v) ORDER BY v DESC) FROM (
+                    SELECT store_id, SUM(order_count) AS c, COALESCE(SUM(revenue) FILTER (WHERE status <> 'cancelled'), 0) AS v FROM r
+                    GROUP BY store_id HAVING SUM(order_count) > 0) s), '[]'::jsonb),
+                'by_day', COALESCE((SELECT jsonb_agg(jsonb_build_object('day', day, 'orders', c, 'revenue', v) ORDER BY day) FROM (
+                    SELECT day, SUM(order_count) AS c, COALESCE(SUM(revenue) FILTER (WHERE status <> 'cancelled'), 0) AS v FROM r
+                    GROUP BY day HAVING SUM(order_count) > 0) s), '[]'::jsonb)
+            );
+        $$ LANGUAGE sql STABLE;
+
+        -- O painel do vendedor passa a ler do rollup também
+        CREATE OR REPLACE FUNCTION store_dashboard_stats(p_store_id UUID)
+        RETURNS JSONB AS $$
+            WITH by_status AS (
+                SELECT status, SUM(order_count) AS order_count, SUM(revenue) AS revenue
+                FROM daily_sales WHERE store_id = p_store_id
+                GROUP BY status HAVING SUM(order_count) > 0
+            )
+            SELECT jsonb_build_object(
+                'total_revenue', (SELECT COALESCE(SUM(revenue), 0) FROM by_status WHERE status <> 'cancelled'),
+                'order_count', (SELECT COALESCE(SUM(order_count), 0) FROM by_status),
+                'product_count', (SELECT COUNT(*) FROM products WHERE store_id = p_store_id),
+                'status_breakdown', COALESCE((SELECT jsonb_object_agg(status,
+                    jsonb_build_object('count', order_count, 'revenue', revenue)) FROM by_status), '{}'::jsonb)
+            );
+        $$ LANGUAGE sql STABLE;
+    """),
+    (8, "versões responsivas das imagens (srcset)", """
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS renditions JSONB;
+        ALTER TABLE product_images ADD COLUMN IF NOT EXISTS renditions JSONB;
+    """),
+    (9, "products.updated_at para a atualização incremental do índice de busca", """
+        ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+        CREATE INDEX IF NOT EXISTS idx_products_updated_at ON products (updated_at);
+
+        CREATE OR REPLACE FUNCTION touch_product_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := NOW();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Só texto e visibilidade: cliques e baixa de estoque não contam como alteração
+        DROP TRIGGER IF EXISTS trg_products_updated_at ON products;
+        CREATE TRIGGER trg_products_updated_at BEFORE UPDATE ON products
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name
+                           OR OLD.description IS DISTINCT FROM NEW.description
+                           OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+        EXECUTE FUNCTION touch_product_updated_at();
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def check_schema(supabase):
+    """
+    Fast path do cold start: lê apenas a linha de `schema_version`.
+    Retorna (versao_atual, esta_atualizado). Nunca altera o banco.
+    """
+    try:
+        res = supabase.table(SCHEMA_VERSION_TABLE).select("version").eq('id', 1).execute()
+        current = res.data[0]['version'] if res.data else 0
+    except Exception:
+        current = 0
+    return current, current >= LATEST_VERSION
+
+
+def _connect():
+    import psycopg2
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        print("ERRO: defina DATABASE_URL com a string de conexão do Postgres.")
+        sys.exit(1)
+    return psycopg2.connect(db_url)
+
+
+def _current_version(cur):
+    cur.execute(BOOTSTRAP_SQL)
+    cur.execute("SELECT version FROM schema_version WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def migrate(dry_run=False):
+    conn = _connect()
+    report = []
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            current = _current_version(cur)
+            conn.commit()
+            pending = [m for m in MIGRATIONS if m[0] > current]
+            print(f"Schema atual: v{current} | esperado: v{LATEST_VERSION} | pendentes: {len(pending)}")
+
+            for version, description, sql in pending:
+                if dry_run:
+                    print(f"  [dry-run] v{version} - {description}")
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    # Cada migração + atualização do marcador numa única transação
+                    cur.execute(sql)
+                    cur.execute("UPDATE schema_version SET version = %s, updated_at = NOW() WHERE id = 1", (version,))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"  ERRO na v{version} ({description}): {e}")
+                    break
+                elapsed = (time.perf_counter() - t0) * 1000
+                report.append((version, description, elapsed))
+                print(f"  v{version} aplicada em {elapsed:.1f} ms - {description}")
+    finally:
+        conn.close()
+
+    total = (time.perf_counter() - started) * 1000
+    if report:
+        print("\n--- RELATÓRIO DE MIGRAÇÃO ---")
+        for version, description, elapsed in report:
+            print(f"v{version:<4} {elapsed:>9.1f} ms  {description}")
+    print(f"Tempo total: {total:.1f} ms")
+    return report
+
+
+def status():
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            current = _current_version(cur)
+            conn.commit()
+    finally:
+        conn.close()
+    print(f"Schema atual: v{current} | esperado: v{LATEST_VERSION}")
+    for version, description, _ in MIGRATIONS:
+        mark = "x" if version <= current else " "
+        print(f"  [{mark}] v{version} - {description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrações de schema do Venda Vapt Vupt")
+    parser.add_argument('--status', action='store_true', help="mostra a versão aplicada e as pendentes")
+    parser.add_argument('--dry-run', action='store_true', help="lista migrações pendentes sem aplicar")
+    args = parser.parse_args()
+
+    if args.status: status()
+    else: migrate(dry_run=args.dry_run)
@@ -1,7 +1,91 @@
-import zlib
+import os
+import hashlib
+import binascii
+import threading
 import qrcode
+import qrcode.image.svg
 from io import BytesIO
 import base64
+from cachetools import LRUCache
+
+QR_MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def render_qr(payload, fmt="png"):
+    if fmt == "svg":
+        qr = qrcode.QRCode(version=1, box_size=10, border=5, image_factory=qrcode.image.svg.SvgPathImage)
+    else:
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image() if fmt == "svg" else qr.make_image(fill_color="black", back_color="white")
+
+    buffered = BytesIO()
+    if fmt == "svg": img.save(buffered)
+    else: img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def payload_hash(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QRCache:
+    """
+    Cache de QR Codes renderizados, chaveado pelo hash do payload Pix.
+    Memória: LRU limitado por bytes. Disco (opcional): um arquivo por hash,
+    sobrevive a reinícios do processo enquanto o diretório existir.
+    """
+    def __init__(self, max_bytes=8 * 1024 * 1024, disk_dir=None):
+        self._mem = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self._lock = threading.Lock()
+        self.disk_dir = disk_dir
+        if disk_dir: os.makedirs(disk_dir, exist_ok=True)
+        self.hits = self.disk_hits = self.misses = 0
+
+    def get(self, payload, fmt="png"):
+        """Retorna (bytes, etag). O etag é o hash do payload (o conteúdo é determinístico)."""
+        etag = payload_hash(payload)
+        key = f"{etag}.{fmt}"
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self.hits += 1
+                return data, etag
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock: self.disk_hits += 1
+        else:
+            data = render_qr(payload, fmt)
+            with self._lock: self.misses += 1
+            self._write_disk(key, data)
+
+        with self._lock:
+            try: self._mem[key] = data
+            except ValueError: pass  # maior que o cache inteiro
+        return data, etag
+
+    def _read_disk(self, key):
+        if not self.disk_dir: return None
+        try:
+            with open(os.path.join(self.disk_dir, key), 'rb') as f: return f.read()
+        except OSError: return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir: return
+        path = os.path.join(self.disk_dir, key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f: f.write(data)
+            os.replace(tmp, path)
+        except OSError: pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "bytes": self._mem.currsize, "max_bytes": self._mem.maxsize, "entries": len(self._mem)}
+
 
 class PixGenerator:
     def __init__(self, chave_pix, beneficiario, cidade, valor=0.0):
@@ -10,58 +94,78 @@ class PixGenerator:
         self.cidade = cidade
         self.valor = valor
 
-    def _fix_size(self, text):
+    @staticmethod
+    def _fix_size(text):
         return str(len(text)).zfill(2)
 
-    def _crc16_ccitt(self, data):
-        data = data.encode('utf-8')
-        poly = 0x1021
-        res = 0xFFFF
-        for b in data:
-            res ^= b << 8
-            for _ in range(8):
-                if res & 0x8000:
-                    res = (res << 1) ^ poly
-                else:
-                    res = res << 1
-                res &= 0xFFFF
-        return hex(res).upper()[2:].zfill(4)
+    @staticmethod
+    def _crc16_ccitt(data, crc=0xFFFF):
+        # CRC16-CCITT (poly 0x1021, init 0xFFFF) em C via binascii: mesmo resultado do loop bit a bit
+        if isinstance(data, str): data = data.encode('utf-8')
+        return binascii.crc_hqx(data, crc)
 
-    def generate_payload(self):
+    @staticmethod
+    def _crc_hex(crc):
+        return f"{crc:04X}"
+
+    @classmethod
+    def _parts(cls, chave_pix, beneficiario, cidade):
         # Payload Format Indicator
         pfi = "000201"
         # Merchant Account Information
         gui = "0014br.gov.bcb.pix"
-        key = f"01{self._fix_size(self.chave_pix)}{self.chave_pix}"
-        mai = f"26{self._fix_size(gui + key)}{gui}{key}"
+        key = f"01{cls._fix_size(chave_pix)}{chave_pix}"
+        mai = f"26{cls._fix_size(gui + key)}{gui}{key}"
         # Merchant Category Code
         mcc = "52040000"
         # Transaction Currency (Real = 986)
         curr = "5303986"
-        # Transaction Amount
-        amt = f"54{self._fix_size(f'{self.valor:.2f}')}{self.valor:.2f}" if self.valor > 0 else ""
         # Country Code
         cc = "5802BR"
         # Merchant Name
-        mn = f"59{self._fix_size(self.beneficiario)}{self.beneficiario}"
+        mn = f"59{cls._fix_size(beneficiario)}{beneficiario}"
         # Merchant City
-        mc = f"60{self._fix_size(self.cidade)}{self.cidade}"
+        mc = f"60{cls._fix_size(cidade)}{cidade}"
         # Additional Data Field Template (ID do pedido opcional)
         adft = "62070503***"
+        # Tudo antes e depois do valor (campo 54), que é a única parte variável por pedido
+        return f"{pfi}{mai}{mcc}{curr}", f"{cc}{mn}{mc}{adft}6304"
 
-        payload = f"{pfi}{mai}{mcc}{curr}{amt}{cc}{mn}{mc}{adft}6304"
-        return f"{payload}{self._crc16_ccitt(payload)}"
+    @classmethod
+    def _amount(cls, valor):
+        # Transaction Amount
+        return f"54{cls._fix_size(f'{valor:.2f}')}{valor:.2f}" if valor > 0 else ""
+
+    def generate_payload(self):
+        head, tail = self._parts(self.chave_pix, self.beneficiario, self.cidade)
+        payload = f"{head}{self._amount(self.valor)}{tail}"
+        return f"{payload}{self._crc_hex(self._crc16_ccitt(payload))}"
+
+    @classmethod
+    def generate_payloads(cls, orders):
+        """
+        BR Codes em lote para reimpressão/conciliação.
+        `orders`: iterável de (chave_pix, beneficiario, cidade, valor).
+        O trecho fixo de cada recebedor é montado e passado pelo CRC uma única
+        vez; por pedido só o valor e o sufixo entram no CRC (continuação).
+        """
+        prefixes = {}
+        payloads = []
+        for chave_pix, beneficiario, cidade, valor in orders:
+            merchant = (chave_pix, beneficiario, cidade)
+            cached = prefixes.get(merchant)
+            if cached is None:
+                head, tail = cls._parts(chave_pix, beneficiario, cidade)
+                cached = prefixes[merchant] = (head, tail.encode('utf-8'), cls._crc16_ccitt(head))
+            head, tail, head_crc = cached
+            amt = cls._amount(valor)
+            crc = cls._crc16_ccitt(tail, cls._crc16_ccitt(amt, head_crc))
+            payloads.append(f"{head}{amt}{tail.decode('utf-8')}{cls._crc_hex(crc)}")
+        return payloads
 
     def generate_qr_base64(self):
         payload = self.generate_payload()
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(payload)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode(), payload
+        return base64.b64encode(render_qr(payload, "png")).decode(), payload
 
 if __name__ == "__main__":
     # Teste rápido
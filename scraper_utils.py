@@ -0,0 +1,569 @@
+"""
+Motor de extração de produtos a partir de páginas de fornecedores.
+
+Passo rápido: lê o HTML em streaming (com teto de bytes) e, a cada bloco,
+procura com regex pré-compiladas apenas os <script type="application/ld+json">
+e as <meta> og:/product:. Assim que título, preço e imagens estão
+preenchidos o download para. Só quando algo falta é que o HTML recebido
+passa pelo BeautifulSoup (seletores CSS, <img>, regex no texto).
+
+Preço e imagens são resolvidos por estratégias (registro em STRATEGIES, com
+extratores por domínio: VTEX, Mercado Livre, Amazon). StrategyStats guarda
+qual estratégia venceu em cada domínio: a vencedora é tentada primeiro e as
+que nunca acertam ficam como último recurso.
+"""
+import os
+import re
+import json
+import codecs
+import time
+import sqlite3
+import tempfile
+import html as html_lib
+import logging
+import urllib.parse
+from bs4 import BeautifulSoup
+
+import http_utils
+
+logger = logging.getLogger(__name__)
+
+MAX_HTML_BYTES = 3 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SCAN_OVERLAP = 4096
+FETCH_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+_LD_JSON_RE = re.compile(rb'<script[^>]+type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>', re.I | re.S)
+_META_RE = re.compile(rb'<meta\s[^>]*>', re.I)
+_ATTR_RE = re.compile(rb'([a-zA-Z_:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+_CHARSET_RE = re.compile(r'charset=([\w-]+)', re.I)
+
+_NON_PRICE_RE = re.compile(r'[^\d.]')
+_NON_DIGIT_RE = re.compile(r'\D')
+_TEXT_PRICE_RES = [re.compile(r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})'), re.compile(r'R\$\s?(\d+,\d{2})')]
+
+PRICE_SELECTORS = [
+    '.price', '.current-price', '#priceblock_ourprice', '#priceblock_dealprice',
+    '.vtex-product-summary-2-x-currencyInteger', '.valor-por', '.price-tag-fraction',
+    '[itemprop="price"]', '.product-price', '.sales-price'
+]
+IMG_BLOCKLIST = ('icon', 'logo', 'button', 'sprite', 'pixel', 'banner')
+
+META_KEYS = ('og:title', 'twitter:title', 'og:description', 'description', 'product:price:amount',
+             'og:price:amount', 'twitter:data1', 'og:image', 'og:video')
+
+
+def parse_meta_price(val):
+    # Formato de meta tag: "1299.90" ou "1299,90"
+    return float(_NON_PRICE_RE.sub('', val.replace(',', '.')))
+
+
+def parse_br_price(val):
+    # Formato brasileiro exibido na página: "1.299,90"
+    return float(_NON_PRICE_RE.sub('', val.replace('.', '').replace(',', '.')))
+
+
+def empty_product():
+    return {"title": "", "description": "", "price": 0.0, "original_price": 0.0, "images": [], "video": "", "stock": 1}
+
+
+def valid_encoding(name, default='utf-8'):
+    """Charset declarado pelo servidor, se o Python o conhece ('utf8mb4' e afins caem no padrão)."""
+    try: return codecs.lookup(name).name if name else default
+    except LookupError: return default
+
+
+class FastScanner:
+    """
+    Varredura incremental de <meta>, <title> e JSON-LD sobre o buffer que vai chegando.
+    As regex rodam direto no bytearray (sem cópia) e cada uma retoma de onde parou.
+    """
+    def __init__(self, encoding='utf-8'):
+        self.encoding = valid_encoding(encoding)
+        self.buf = bytearray()
+        self.meta = {}
+        self.title = ""
+        self.ld_product = None
+        self._meta_pos = 0
+        self._title_pos = 0
+        self._ld_pos = 0
+
+    def _text(self, raw):
+        return html_lib.unescape(raw.decode(self.encoding, errors='replace')).strip()
+
+    def feed(self, chunk):
+        self.buf.extend(chunk)
+        buf = self.buf
+
+        last = None
+        for m in _META_RE.finditer(buf, self._meta_pos):
+            attrs = {}
+            for a in _ATTR_RE.finditer(m.group(0)):
+                attrs[a.group(1).lower()] = a.group(2) if a.group(2) is not None else (a.group(3) if a.group(3) is not None else a.group(4))
+            key = (attrs.get(b'property') or attrs.get(b'name') or b'').decode('ascii', 'ignore').lower()
+            content = attrs.get(b'content') if attrs.get(b'content') is not None else attrs.get(b'value')
+            if key in META_KEYS and content is not None:
+                self.meta.setdefault(key, self._text(content))
+            last = m.end()
+        self._meta_pos = last if last is not None else max(self._meta_pos, len(buf) - SCAN_OVERLAP)
+
+        if not self.title:
+            m = _TITLE_RE.search(buf, self._title_pos)
+            if m: self.title = self._text(m.group(1))
+            else:
+                # <title> aberto sem fechar: recomeça da abertura no próximo bloco
+                open_at = buf.rfind(b'<title', self._title_pos)
+                self._title_pos = open_at if open_at >= 0 else max(self._title_pos, len(buf) - SCAN_OVERLAP)
+
+        if self.ld_product is None:
+            last = None
+            for m in _LD_JSON_RE.finditer(buf, self._ld_pos):
+                last = m.end()
+                product = _ld_find_product(m.group(1).decode(self.encoding, errors='replace'))
+                if product is not None:
+                    self.ld_product = product
+                    break
+            if last is not None: self._ld_pos = last
+            else:
+                # Script ainda incompleto: recomeça da sua abertura no próximo bloco
+                open_at = buf.rfind(b'<script', self._ld_pos)
+                self._ld_pos = open_at if open_at >= 0 else max(self._ld_pos, len(buf) - SCAN_OVERLAP)
+
+
+def _ld_find_product(text):
+    try:
+        ld = json.loads(text.strip())
+    except Exception:
+        return None
+    items = ld if isinstance(ld, list) else [ld]
+    for item in items:
+        if not isinstance(item, dict): continue
+        if _is_product(item): return item
+        for node in item.get('@graph') or []:
+            if isinstance(node, dict) and _is_product(node): return node
+    return None
+
+
+def _is_product(node):
+    t = node.get('@type')
+    return t == 'Product' or (isinstance(t, list) and 'Product' in t)
+
+
+def _ld_images(imgs):
+    if isinstance(imgs, str): return [imgs]
+    if isinstance(imgs, dict): return [imgs.get('url')] if imgs.get('url') else []
+    if isinstance(imgs, list):
+        out = []
+        for i in imgs: out.extend(_ld_images(i))
+        return out
+    return []
+
+
+def _ld_price(offers):
+    if isinstance(offers, list): offers = offers[0] if offers else None
+    if not isinstance(offers, dict): return 0.0
+    for k in ('price', 'lowPrice'):
+        try:
+            if offers.get(k) is not None: return float(offers[k])
+        except (TypeError, ValueError): pass
+    return 0.0
+
+
+def is_complete(data):
+    return bool(data["title"] and data["price"] and data["images"])
+
+
+def apply_fast_pass(scanner, data):
+    """Preenche o que faltar em `data` com JSON-LD e meta tags já encontrados."""
+    ld, meta = scanner.ld_product, scanner.meta
+    if ld:
+        if not data["title"]: data["title"] = ld.get('name') or ""
+        if not data["description"]: data["description"] = ld.get('description') or ""
+        if not data["price"]: data["price"] = _ld_price(ld.get('offers'))
+        for img in _ld_images(ld.get('image')):
+            if img not in data["images"]: data["images"].append(img)
+
+    if not data["title"]: data["title"] = meta.get('og:title') or meta.get('twitter:title') or scanner.title
+    if not data["description"]: data["description"] = meta.get('og:description') or meta.get('description') or ""
+    if not data["price"]:
+        for k in ('product:price:amount', 'og:price:amount', 'twitter:data1'):
+            if meta.get(k):
+                try:
+                    data["price"] = parse_meta_price(meta[k])
+                    break
+                except ValueError: pass
+    og_img = meta.get('og:image')
+    if og_img and og_img not in data["images"]: data["images"].append(og_img)
+    if not data["video"]: data["video"] = meta.get('og:video') or ""
+    return data
+
+
+# --- ESTRATÉGIAS ---
+# Cada estratégia recebe o contexto da página e devolve {"price": float, "images": [...]} (parcial).
+# 'jsonld' e 'meta' saem do passo rápido (custo ~zero); as demais exigem o DOM completo.
+
+class PageContext:
+    def __init__(self, scanner, page_url):
+        self.scanner = scanner
+        self.page_url = page_url
+        self.domain = domain_of(page_url)
+        self._soup = None
+        self._results = {}
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.scanner.buf.decode(self.scanner.encoding, errors='replace'), 'lxml')
+        return self._soup
+
+    @property
+    def used_dom(self):
+        return self._soup is not None
+
+    def absolute(self, src):
+        return src if src.startswith('http') else urllib.parse.urljoin(self.page_url, src)
+
+    def run(self, name):
+        if name not in self._results:
+            try: self._results[name] = STRATEGIES[name](self) or {}
+            except Exception as e:
+                logger.warning(f"Estratégia {name} falhou em {self.domain}: {e}")
+                self._results[name] = {}
+        return self._results[name]
+
+
+def _first_price(soup, selectors, parse=parse_br_price, attr=None):
+    for sel in selectors:
+        el = soup.select_one(sel)
+        if not el: continue
+        try:
+            price = parse(el.get(attr) if attr else el.get_text(strip=True))
+            if price > 0: return price
+        except (TypeError, ValueError): pass
+    return 0.0
+
+
+def _strategy_jsonld(ctx):
+    ld = ctx.scanner.ld_product
+    if not ld: return {}
+    return {"price": _ld_price(ld.get('offers')), "images": _ld_images(ld.get('image'))}
+
+
+def _strategy_meta(ctx):
+    meta, out = ctx.scanner.meta, {}
+    for k in ('product:price:amount', 'og:price:amount', 'twitter:data1'):
+        if meta.get(k):
+            try:
+                out["price"] = parse_meta_price(meta[k])
+                break
+            except ValueError: pass
+    if meta.get('og:image'): out["images"] = [meta['og:image']]
+    return out
+
+
+def _strategy_selectors(ctx):
+    return {"price": _first_price(ctx.soup, PRICE_SELECTORS)}
+
+
+def _strategy_text_regex(ctx):
+    text = ctx.soup.get_text()
+    for pattern in _TEXT_PRICE_RES:
+        match = pattern.search(text)
+        if match:
+            try: return {"price": float(match.group(1).replace('.', '').replace(',', '.'))}
+            except ValueError: pass
+    return {}
+
+
+def _strategy_img_tags(ctx):
+    images = []
+    for img in ctx.soup.find_all('img', src=True):
+        src = ctx.absolute(img.get('src'))
+        # Filtro inteligente: excluir imagens pequenas ou sem contexto de produto
+        alt = (img.get('alt') or '').lower()
+        try: w = int(_NON_DIGIT_RE.sub('', img.get('width', '100')))
+        except ValueError: w = 100
+        if any(x in src.lower() or x in alt for x in IMG_BLOCKLIST): continue
+        if w < 50: continue  # Provável ícone
+        images.append(src)
+    return {"images": images}
+
+
+STRATEGIES = {
+    'jsonld': _strategy_jsonld,
+    'meta': _strategy_meta,
+    'selectors': _strategy_selectors,
+    'text_regex': _strategy_text_regex,
+    'img_tags': _strategy_img_tags,
+}
+FAST_STRATEGIES = ('jsonld', 'meta')
+FIELD_STRATEGIES = {
+    'price': ['jsonld', 'meta', 'selectors', 'text_regex'],
+    'images': ['jsonld', 'meta', 'img_tags'],
+}
+
+
+# --- EXTRATORES POR DOMÍNIO ---
+# (nome, sufixos de host, marcador no HTML). Entram na frente dos fallbacks genéricos.
+DOMAIN_EXTRACTORS = []
+
+
+def register_extractor(name, hosts=(), marker=None):
+    def decorator(fn):
+        STRATEGIES[name] = fn
+        DOMAIN_EXTRACTORS.append((name, tuple(hosts), marker))
+        return fn
+    return decorator
+
+
+def domain_of(page_url):
+    host = (urllib.parse.urlsplit(page_url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def extractors_for(ctx):
+    head = bytes(ctx.scanner.buf[:256 * 1024])
+    return [name for name, hosts, marker in DOMAIN_EXTRACTORS
+            if any(ctx.domain == h or ctx.domain.endswith('.' + h) for h in hosts)
+            or (marker and marker in head)]
+
+
+@register_extractor('vtex', hosts=('vtexcommercestable.com.br', 'myvtex.com'), marker=b'vteximg.com.br')
+def _extract_vtex(ctx):
+    soup = ctx.soup
+    price = _first_price(soup, ['.vtex-product-price-1-x-sellingPriceValue', '.vtex-product-price-1-x-currencyContainer', '.skuBestPrice'])
+    images = [ctx.absolute(i.get('src')) for i in soup.select('img.vtex-store-components-3-x-productImageTag, #image-main') if i.get('src')]
+    return {"price": price, "images": images}
+
+
+@register_extractor('mercadolivre', hosts=('mercadolivre.com.br', 'mercadolibre.com'))
+def _extract_mercadolivre(ctx):
+    soup = ctx.soup
+    price = _first_price(soup, ['meta[itemprop="price"]'], parse=parse_meta_price, attr='content')
+    if not price:
+        fraction = soup.select_one('.ui-pdp-price__second-line .andes-money-amount__fraction')
+        cents = soup.select_one('.ui-pdp-price__second-line .andes-money-amount__cents')
+        if fraction:
+            try: price = parse_br_price(fraction.get_text(strip=True) + ',' + (cents.get_text(strip=True) if cents else '00'))
+            except ValueError: pass
+    images = []
+    for img in soup.select('figure.ui-pdp-gallery__figure img, img.ui-pdp-image'):
+        src = img.get('data-zoom') or img.get('src')
+        if src and not src.startswith('data:'): images.append(ctx.absolute(src))
+    return {"price": price, "images": images}
+
+
+@register_extractor('amazon', hosts=('amazon.com.br', 'amazon.com'))
+def _extract_amazon(ctx):
+    soup = ctx.soup
+    price = _first_price(soup, ['#corePrice_feature_div .a-offscreen', '.a-price .a-offscreen', '#priceblock_ourprice', '#priceblock_dealprice'])
+    images = []
+    landing = soup.select_one('#landingImage, #imgTagWrapperId img')
+    if landing:
+        if landing.get('data-old-hires'): images.append(landing['data-old-hires'])
+        try: images.extend(json.loads(landing.get('data-a-dynamic-image') or '{}').keys())
+        except ValueError: pass
+        if not images and landing.get('src'): images.append(landing['src'])
+    return {"price": price, "images": images}
+
+
+# --- ESTATÍSTICAS POR DOMÍNIO ---
+
+class StrategyStats:
+    """
+    Qual estratégia realmente entregou preço/imagens em cada domínio (SQLite local).
+    Usado para tentar primeiro a vencedora e deixar por último as que nunca acertam.
+    """
+    DEAD_AFTER = 5
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS strategy_stats (
+                domain TEXT, field TEXT, strategy TEXT, tries INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+                PRIMARY KEY (domain, field, strategy))""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def order(self, domain, field, candidates):
+        """
+        Retorna (ordem_preferida, mortas): mortas = tentadas DEAD_AFTER vezes sem nunca vencer.
+        Ordena pela taxa de acerto (suavizada: uma vitória em uma tentativa não passa na frente
+        de 90 em 100), não pelo total de vitórias.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT strategy, tries, wins FROM strategy_stats WHERE domain = ? AND field = ?", (domain, field)).fetchall()
+        seen = {r[0]: (r[1], r[2]) for r in rows}
+        dead = [c for c in candidates if c in seen and seen[c][1] == 0 and seen[c][0] >= self.DEAD_AFTER]
+        alive = [c for c in candidates if c not in dead]
+        rate = lambda c: (seen.get(c, (0, 0))[1] + 1) / (seen.get(c, (0, 0))[0] + 2)
+        alive.sort(key=lambda c: -rate(c))  # sort estável: mantém a ordem padrão nos empates
+        return alive, dead
+
+    def record(self, domain, field, tried, winner):
+        with self._connect() as conn:
+            for strategy in tried:
+                conn.execute("""INSERT INTO strategy_stats (domain, field, strategy, tries, wins) VALUES (?, ?, ?, 1, ?)
+                                ON CONFLICT (domain, field, strategy) DO UPDATE SET tries = tries + 1, wins = wins + excluded.wins""",
+                             (domain, field, strategy, 1 if strategy == winner else 0))
+
+    def summary(self, domain):
+        with self._connect() as conn:
+            return conn.execute("SELECT field, strategy, tries, wins FROM strategy_stats WHERE domain = ? ORDER BY field, wins DESC", (domain,)).fetchall()
+
+
+def default_strategy_stats():
+    path = os.getenv("SCRAPER_STATS_PATH", os.path.join(tempfile.gettempdir(), "vapt_scraper_stats.sqlite"))
+    try: return StrategyStats(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Estatísticas do scraper indisponíveis ({path}): {e}")
+        return None
+
+
+def _resolve_field(ctx, field, stats):
+    # Passos rápidos e extratores do domínio sempre primeiro (não exigem o DOM inteiro);
+    # só os fallbacks genéricos de DOM são reordenados pelo histórico do domínio
+    generic = FIELD_STRATEGIES[field]
+    structured = [c for c in generic if c in FAST_STRATEGIES] + extractors_for(ctx)
+    fallbacks = [c for c in generic if c not in FAST_STRATEGIES]
+    alive, dead = stats.order(ctx.domain, field, fallbacks) if stats else (fallbacks, [])
+
+    tried = []
+    for strategy in structured + alive + dead:  # mortas só rodam se todas as outras falharem
+        tried.append(strategy)
+        value = ctx.run(strategy).get(field)
+        if value:
+            if stats: stats.record(ctx.domain, field, tried, strategy)
+            return value, strategy
+    if stats: stats.record(ctx.domain, field, tried, None)
+    return None, None
+
+
+def extract_from_stream(chunks, page_url, encoding='utf-8', max_bytes=MAX_HTML_BYTES, stats=None):
+    """
+    Consome blocos de HTML até o passo rápido ter título+preço+imagens (ou estourar o teto)
+    e resolve preço e imagens pela ordem aprendida do domínio.
+    Retorna (data, info): bytes lidos, parada antecipada, DOM usado e estratégia vencedora por campo.
+    """
+    scanner = FastScanner(encoding)
+    early_exit = False
+    for chunk in chunks:
+        if not chunk: continue
+        scanner.feed(chunk[:max_bytes - len(scanner.buf)])
+        if is_complete(apply_fast_pass(scanner, empty_product())):
+            early_exit = True
+            break
+        if len(scanner.buf) >= max_bytes: break
+
+    data = apply_fast_pass(scanner, empty_product())
+    ctx = PageContext(scanner, page_url)
+    price, price_from = _resolve_field(ctx, 'price', stats)
+    images, images_from = _resolve_field(ctx, 'images', stats)
+
+    data["price"] = price or 0.0
+    # Imagens da vencedora primeiro; as dos passos rápidos completam a galeria
+    extra = [i for name in FAST_STRATEGIES for i in ctx.run(name).get('images', [])]
+    data["images"] = list(dict.fromkeys(i for i in (images or []) + extra if i))
+    if not data["title"] and ctx.used_dom:
+        tag = ctx.soup.find('title')
+        data["title"] = tag.text if tag else ""
+
+    data["price"] = round(float(data["price"] or 0), 2)
+    data["original_price"] = data["price"]
+    return data, {"bytes": len(scanner.buf), "early_exit": early_exit, "full_dom": ctx.used_dom,
+                  "price_from": price_from, "images_from": images_from}
+
+
+# --- CACHE DE RESULTADOS ---
+
+class ScrapeCache:
+    """
+    Cache local (SQLite) do resultado final de uma importação, por URL normalizada.
+    Dentro do TTL responde sem tráfego externo; vencido, revalida com
+    If-None-Match/If-Modified-Since e, num 304, reaproveita o resultado (com as
+    imagens já persistidas) sem baixar nem parsear a página de novo.
+    Linhas com mais de `max_age` (padrão: 4x o TTL, ainda úteis para revalidar)
+    são apagadas a cada PRUNE_EVERY gravações, e a tabela não passa de `max_rows`.
+    """
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=6 * 3600, max_age=None, max_rows=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age if max_age is not None else ttl * 4
+        self.max_rows = max_rows
+        self._puts = 0
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS scrape_cache (
+                url TEXT PRIMARY KEY, result TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS scrape_cache_fetched_at ON scrape_cache (fetched_at)")
+        self.prune()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def normalize(page_url):
+        parts = urllib.parse.urlsplit(page_url.strip())
+        query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith('utm_')]
+        return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urllib.parse.urlencode(query), ''))
+
+    def get(self, page_url):
+        """Retorna dict com result/etag/last_modified/fresh ou None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT result, etag, last_modified, fetched_at FROM scrape_cache WHERE url = ?", (self.normalize(page_url),)).fetchone()
+        if not row: return None
+        return {"result": json.loads(row[0]), "etag": row[1], "last_modified": row[2], "fresh": (time.time() - row[3]) < self.ttl}
+
+    def put(self, page_url, result, etag=None, last_modified=None):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO scrape_cache (url, result, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                         (self.normalize(page_url), json.dumps(result), etag, last_modified, time.time()))
+        self._puts += 1
+        if self._puts % self.PRUNE_EVERY == 0: self.prune()
+
+    def prune(self):
+        """Apaga as linhas velhas demais e, acima de max_rows, as menos recentes. Retorna quantas saíram."""
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM scrape_cache WHERE fetched_at < ?", (time.time() - self.max_age,)).rowcount
+            removed += conn.execute("""DELETE FROM scrape_cache WHERE url IN (
+                SELECT url FROM scrape_cache ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)""", (self.max_rows,)).rowcount
+        return removed
+
+    def touch(self, page_url):
+        with self._connect() as conn:
+            conn.execute("UPDATE scrape_cache SET fetched_at = ? WHERE url = ?", (time.time(), self.normalize(page_url)))
+
+
+def default_scrape_cache():
+    path = os.getenv("SCRAPE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "vapt_scrape_cache.sqlite"))
+    try: return ScrapeCache(path, ttl=int(os.getenv("SCRAPE_CACHE_TTL", str(6 * 3600))),
+                            max_rows=int(os.getenv("SCRAPE_CACHE_MAX_ROWS", "5000")))
+    except sqlite3.Error as e:
+        logger.warning(f"Cache do scraper indisponível ({path}): {e}")
+        return None
+
+
+def _encoding_of(response):
+    m = _CHARSET_RE.search(response.headers.get('content-type', ''))
+    return valid_encoding(m.group(1) if m else None)
+
+
+def fetch_product_data(page_url, max_bytes=MAX_HTML_BYTES, timeout=15, stats=None, etag=None, last_modified=None):
+    """
+    Baixa e extrai. Com etag/last_modified faz GET condicional: num 304
+    retorna (None, {"not_modified": True}). info traz os validadores novos.
+    """
+    headers = dict(FETCH_HEADERS)
+    if etag: headers['If-None-Match'] = etag
+    if last_modified: headers['If-Modified-Since'] = last_modified
+    with http_utils.stream('GET', page_url, headers=headers, timeout=timeout) as response:
+        if response.status_code == 304:
+            return None, {"not_modified": True}
+        response.raise_for_status()
+        data, info = extract_from_stream(response.iter_bytes(CHUNK_SIZE), page_url, _encoding_of(response), max_bytes, stats)
+        info.update(not_modified=False, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+    logger.info(f"Scraper {page_url}: {info}")
+    return data, info
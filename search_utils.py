@@ -0,0 +1,181 @@
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text):
+    """Minúsculas sem acentos: 'Café' -> 'cafe', 'Ação' -> 'acao'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """
+    Índice invertido em memória (tokens + trigramas) sobre nome e descrição.
+    Guarda só texto dobrado e ids; os dados do card são buscados por id depois,
+    então estoque/preço nunca ficam velhos.
+
+    Só o primeiro build (cold start) segura a busca. Depois disso, índice velho
+    continua respondendo enquanto uma thread traz só o que mudou desde a última
+    atualização; a carga completa (que também limpa excluídos) roda a cada
+    `full_every` segundos, também em segundo plano.
+    """
+    NAME_EXACT, NAME_PARTIAL, DESC_EXACT, DESC_PARTIAL = 3.0, 2.0, 1.0, 0.5
+    CLOCK_SKEW = 60  # folga entre o relógio do app e o now() do banco no filtro incremental
+
+    def __init__(self, max_age=300, full_every=3600):
+        self.max_age = max_age
+        self.full_every = full_every
+        self.built_at = 0.0       # última carga completa
+        self.refreshed_at = 0.0   # última atualização (completa ou incremental)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._docs = {}                        # id -> (nome_dobrado, desc_dobrada, created_at)
+        self._name_tokens = defaultdict(set)   # token -> ids
+        self._desc_tokens = defaultdict(set)
+        self._grams = defaultdict(set)         # trigrama -> ids (nome + descrição)
+
+    @property
+    def is_stale(self):
+        return not self.built_at or (time.time() - self.refreshed_at) > self.max_age
+
+    def ensure_fresh(self, loader, background=True):
+        """
+        loader(since): since=None -> todos os produtos ativos; senão os alterados
+        desde `since` (epoch), com is_active para saber quais sair do índice.
+        Vazio: constrói agora (um build por vez). Velho: atualiza em segundo plano
+        e a busca segue com o índice atual.
+        """
+        if not self.is_stale: return
+        if not self.built_at:
+            with self._build_lock:
+                if not self.built_at: self._refresh(loader)
+            return
+        if not self._build_lock.acquire(blocking=False): return  # outra thread já está atualizando
+        if not background:
+            try: self._refresh(loader)
+            finally: self._build_lock.release()
+            return
+        threading.Thread(target=self._refresh_in_background, args=(loader,), name="search-refresh", daemon=True).start()
+
+    def _refresh_in_background(self, loader):
+        try: self._refresh(loader)
+        except Exception as e: logger.warning(f"Atualização do índice de busca falhou: {e}")
+        finally: self._build_lock.release()
+
+    def _refresh(self, loader):
+        started = time.time()
+        if self.built_at and started - self.built_at < self.full_every:
+            try:
+                self.apply(loader(self.refreshed_at - self.CLOCK_SKEW))
+                self.refreshed_at = started
+                return
+            except Exception as e:
+                logger.warning(f"Atualização incremental da busca falhou, recarregando tudo: {e}")
+        self.build(loader(None))
+        self.built_at = self.refreshed_at = started
+
+    def invalidate(self):
+        """Marca como velho: a próxima busca dispara uma atualização (ex.: depois de uma importação em lote)."""
+        self.refreshed_at = 0.0
+
+    def build(self, products):
+        with self._lock:
+            self._reset()
+            for p in products: self._add(p)
+            self.built_at = self.refreshed_at = time.time()
+
+    def apply(self, changed):
+        """Aplica linhas alteradas: ativas entram (ou são reindexadas), inativas saem."""
+        with self._lock:
+            for p in changed:
+                self._remove(str(p['id']))
+                if p.get('is_active', True) is not False: self._add(p)
+
+    def add(self, product):
+        with self._lock:
+            self._remove(str(product['id']))
+            self._add(product)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(str(product_id))
+
+    def _add(self, p):
+        pid = str(p['id'])
+        name, desc = fold(p.get('name')), fold(p.get('description'))
+        self._docs[pid] = (name, desc, p.get('created_at') or '')
+        name_tokens, desc_tokens = set(_TOKEN_RE.findall(name)), set(_TOKEN_RE.findall(desc))
+        for t in name_tokens: self._name_tokens[t].add(pid)
+        for t in desc_tokens: self._desc_tokens[t].add(pid)
+        for t in name_tokens | desc_tokens:
+            for g in trigrams(t): self._grams[g].add(pid)
+
+    def _remove(self, pid):
+        doc = self._docs.pop(pid, None)
+        if not doc: return
+        name_tokens, desc_tokens = set(_TOKEN_RE.findall(doc[0])), set(_TOKEN_RE.findall(doc[1]))
+        for index, tokens in ((self._name_tokens, name_tokens), (self._desc_tokens, desc_tokens)):
+            for t in tokens:
+                ids = index.get(t)
+                if ids is not None:
+                    ids.discard(pid)
+                    if not ids: del index[t]
+        for t in name_tokens | desc_tokens:
+            for g in trigrams(t):
+                ids = self._grams.get(g)
+                if ids is not None:
+                    ids.discard(pid)
+                    if not ids: del self._grams[g]
+
+    def _score_token(self, token):
+        scores = defaultdict(float)
+        for pid in self._name_tokens.get(token, ()): scores[pid] += self.NAME_EXACT
+        for pid in self._desc_tokens.get(token, ()): scores[pid] += self.DESC_EXACT
+
+        # Parciais ('fone' em 'headfone'): candidatos pela interseção dos trigramas, confirmados por substring
+        grams = trigrams(token)
+        if grams:
+            postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings[0] else set()
+            for pid in candidates:
+                if pid in scores: continue
+                name, desc, _ = self._docs[pid]
+                if token in name: scores[pid] += self.NAME_PARTIAL
+                elif token in desc: scores[pid] += self.DESC_PARTIAL
+        return scores
+
+    def search(self, query, limit=None):
+        """Ids ordenados por relevância (todos os termos precisam casar); empate -> mais recente."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens: return []
+        with self._lock:
+            total = None
+            for token in tokens:
+                scores = self._score_token(token)
+                if total is None: total = scores
+                else: total = {pid: s + scores[pid] for pid, s in total.items() if pid in scores}
+                if not total: return []
+            ranked = sorted(total, key=lambda pid: (total[pid], self._docs[pid][2]), reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def __len__(self):
+        return len(self._docs)
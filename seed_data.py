@@ -1,15 +1,39 @@
+"""
+Dados de teste.
+
+    python seed_data.py                      # loja demo + 3 produtos (cadastro manual rápido)
+
+    # Massa sintética para achar limites de escala (determinística pela --seed)
+    python seed_data.py --stores 20 --products 20000 --customers 5000 --orders 50000
+    python seed_data.py --products 5000 --orders 20000 --fixture dados.json   # para o supabase_stub / bench_load
+
+A massa sintética tem popularidade desigual (Zipf): poucas lojas concentram o
+catálogo, poucos produtos concentram cliques e pedidos, alguns clientes
+compram muito. Os pedidos se espalham por --days dias até --end, com
+crescimento ao longo do período e pico nos fins de semana e à noite.
+Mesma seed e mesmos parâmetros geram exatamente os mesmos ids e linhas, então
+rodar de novo contra o banco é um upsert idempotente.
+"""
 import os
+import sys
+import json
+import math
+import uuid
+import random
+import argparse
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
 load_dotenv()
 
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-supabase: Client = create_client(url, key)
+
+def get_client() -> Client:
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
 
 def seed():
     print("Iniciando cadastro de dados de teste...")
+    supabase = get_client()
 
     # 1. Criar Loja de Teste
     store_data = {
@@ -69,5 +93,196 @@ def seed():
         print(f"Erro ao inserir dados: {e}")
         print("DICA: Você já rodou o SQL no painel do Supabase?")
 
+# --- MASSA SINTÉTICA ---
+
+CATEGORIES = {
+    "Fone": ("Bluetooth", "com Cancelamento de Ruído", "Esportivo", "Over-ear", "Gamer"),
+    "Carregador": ("Rápido 20W", "Turbo 65W", "Veicular", "Sem Fio", "Portátil 10000mAh"),
+    "Cabo": ("USB-C 2m", "Lightning", "HDMI 4K", "Micro USB", "Reforçado"),
+    "Camiseta": ("Algodão", "Dry Fit", "Oversized", "Polo", "Estampada"),
+    "Tênis": ("Corrida", "Casual", "Skate", "Caminhada", "Infantil"),
+    "Garrafa": ("Térmica 500ml", "Inox 1L", "Squeeze", "de Vidro", "Dobrável"),
+    "Mochila": ("Notebook", "Escolar", "Viagem", "Antifurto", "Hidratação"),
+    "Relógio": ("Smartwatch", "Analógico", "Digital", "Esportivo", "Fitness"),
+}
+COLORS = ("Preto", "Branco", "Azul", "Vermelho", "Verde", "Cinza", "Rosa")
+FIRST_NAMES = ("Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+               "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "William")
+LAST_NAMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Almeida", "Ferreira", "Rodrigues")
+CITIES = (("São Paulo", "SP"), ("Rio de Janeiro", "RJ"), ("Belo Horizonte", "MG"), ("Curitiba", "PR"),
+          ("Porto Alegre", "RS"), ("Salvador", "BA"), ("Recife", "PE"), ("Fortaleza", "CE"))
+# (status, idade mínima em dias): pedidos antigos já andaram no funil
+STATUS_FLOW = (("delivered", 7), ("shipped", 3), ("paid", 1), ("pending_payment", 0))
+CANCEL_RATE = 0.06
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 6, 6, 6, 6, 7, 8, 10, 11, 10, 7, 3]
+# Ordem de escrita respeitando as FKs
+TABLE_ORDER = ("stores", "customers", "products", "product_images", "orders", "order_items")
+DEFAULT_END = date(2025, 6, 30)  # fixo para o resultado não depender do dia em que roda
+
+
+def zipf_weights(n, s=1.1):
+    return [1 / (rank + 1) ** s for rank in range(n)]
+
+
+class Generator:
+    """Gera as linhas de cada tabela em memória, só a partir de `seed` e dos tamanhos."""
+    def __init__(self, seed=42, end=DEFAULT_END, days=180):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.end = datetime(end.year, end.month, end.day, 23, 59, 59, tzinfo=timezone.utc)
+        self.days = days
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self, max_age_days, bias=1.0):
+        """Instante nos últimos `max_age_days` dias; bias > 1 puxa para o fim do período (crescimento)."""
+        age = max_age_days * (1 - self.rng.random() ** (1 / bias))
+        day = self.end - timedelta(days=int(age))
+        hour = self.rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        return day.replace(hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60),
+                           microsecond=self.rng.randrange(10 ** 6))
+
+    def stores(self, n, default_slug=False):
+        rows = []
+        for i in range(n):
+            city, _ = self.rng.choice(CITIES)
+            slug = "default" if default_slug and i == 0 else f"gen-{self.seed}-{i}"
+            rows.append({"id": self.uuid(), "slug": slug, "name": f"Loja {self.rng.choice(LAST_NAMES)} {i + 1}",
+                         "whatsapp": f"55119{self.rng.randrange(10 ** 8):08d}", "primary_color": "#0EA5E9",
+                         "admin_user": "admin", "admin_password": "admin", "pix_key": f"loja{i}@pix.com",
+                         "pix_name": f"LOJA {i + 1}", "pix_city": city.upper(),
+                         "created_at": self.timestamp(self.days + 30).isoformat()})
+        return rows
+
+    def customers(self, n):
+        rows = []
+        for i in range(n):
+            city, uf = self.rng.choice(CITIES)
+            name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+            rows.append({"id": self.uuid(), "name": name, "email": f"cliente{i}.s{self.seed}@exemplo.invalid",
+                         # Semente inteira no número (como no email): únicos entre rodadas com sementes diferentes
+                         "whatsapp": f"5511{self.seed}{i:08d}", "password": "teste123",
+                         "address_full": f"Rua {self.rng.choice(LAST_NAMES)}, {self.rng.randint(1, 2000)}, Centro, {city} - {uf}",
+                         "created_at": self.timestamp(self.days, bias=1.5).isoformat()})
+        return rows
+
+    def products(self, n, stores, max_images=4):
+        """Produtos distribuídos entre as lojas por Zipf (a primeira loja é a maior)."""
+        products, images = [], []
+        owners = self.rng.choices(stores, weights=zipf_weights(len(stores), 0.8), k=n)
+        for i, store in enumerate(owners):
+            category = self.rng.choice(list(CATEGORIES))
+            name = f"{category} {self.rng.choice(CATEGORIES[category])} {self.rng.choice(COLORS)}"
+            pid = self.uuid()
+            price = round(math.exp(self.rng.gauss(4.2, 0.8)), 2)  # mediana ~R$ 67, cauda até alguns milhares
+            image = f"https://picsum.photos/seed/{pid[:8]}/800/800"
+            products.append({"id": pid, "store_id": store["id"], "sku": f"SKU-{i:07d}", "name": name,
+                             "description": f"{name}. Produto de teste gerado automaticamente ({category.lower()}).",
+                             "price": max(price, 4.9), "stock_quantity": self.rng.choice((0, 5, 20, 50, 100, 500)),
+                             "is_active": self.rng.random() > 0.05, "clicks_count": 0, "image_url": image,
+                             "external_url": f"https://fornecedor.exemplo.invalid/p/{pid[:8]}",
+                             "created_at": self.timestamp(self.days + 30, bias=1.3).isoformat()})
+            for k in range(self.rng.randint(0, max_images)):
+                src = f"https://picsum.photos/seed/{pid[:8]}-{k}/800/800"
+                images.append({"id": self.uuid(), "product_id": pid, "image_url": src, "source_url": src, "display_order": k})
+        return products, images
+
+    def orders(self, n, products, customers):
+        """
+        Pedidos com 1-4 itens da mesma loja. Produto pela popularidade global
+        (Zipf); cliente também (recorrentes compram mais). Cliques acompanham a
+        popularidade com conversão de 1-5%.
+        """
+        active = [p for p in products if p["is_active"]]
+        popularity = list(active)
+        self.rng.shuffle(popularity)
+        weights = zipf_weights(len(popularity))
+        by_store = {}
+        for rank, p in enumerate(popularity): by_store.setdefault(p["store_id"], []).append((p, weights[rank]))
+        buyer_weights = zipf_weights(len(customers), 0.7)
+
+        orders, items = [], []
+        picks = self.rng.choices(popularity, weights=weights, k=n)
+        buyers = self.rng.choices(customers, weights=buyer_weights, k=n)
+        sold = {}
+        for first, customer in zip(picks, buyers):
+            created = self.timestamp(self.days, bias=1.6)
+            # Fim de semana vende mais: parte dos pedidos de dia útil migra para o sábado seguinte
+            if created.weekday() < 5 and self.rng.random() < 0.15:
+                created = min(created + timedelta(days=5 - created.weekday()), self.end)
+            store_items = by_store[first["store_id"]]
+            lines = {first["id"]: (first, self.rng.randint(1, 2))}
+            for p, _ in self.rng.choices(store_items, weights=[w for _, w in store_items], k=self.rng.randint(0, 3)):
+                lines.setdefault(p["id"], (p, 1))
+
+            oid = self.uuid()
+            total = round(sum(p["price"] * q for p, q in lines.values()), 2)
+            age = (self.end - created).days
+            status = "cancelled" if self.rng.random() < CANCEL_RATE else next(s for s, min_age in STATUS_FLOW if age >= min_age)
+            orders.append({"id": oid, "store_id": first["store_id"], "customer_id": customer["id"], "subtotal": total, "total": total,
+                           "status": status, "delivery_address": customer["address_full"], "created_at": created.isoformat()})
+            for p, q in lines.values():
+                items.append({"id": self.uuid(), "order_id": oid, "product_id": p["id"], "quantity": q, "unit_price": p["price"]})
+                sold[p["id"]] = sold.get(p["id"], 0) + q
+
+        for p in products:
+            units = sold.get(p["id"], 0)
+            p["clicks_count"] = int(units / self.rng.uniform(0.01, 0.05)) + self.rng.randint(0, 20)
+        return orders, items
+
+
+def generate(stores=5, products=2000, customers=500, orders=5000, seed=42, end=DEFAULT_END, days=180,
+             max_images=4, default_slug=False):
+    """{tabela: [linhas]} pronto para upsert ou para a fixture do stub."""
+    gen = Generator(seed, end, days)
+    store_rows = gen.stores(stores, default_slug)
+    customer_rows = gen.customers(customers)
+    product_rows, image_rows = gen.products(products, store_rows, max_images)
+    order_rows, item_rows = gen.orders(orders, product_rows, customer_rows) if customer_rows else ([], [])
+    return {"stores": store_rows, "customers": customer_rows, "products": product_rows,
+            "product_images": image_rows, "orders": order_rows, "order_items": item_rows}
+
+
+def write_fixture(tables, path):
+    with open(path, 'w', encoding='utf-8') as f: json.dump(tables, f, ensure_ascii=False)
+
+
+def upsert_all(supabase, tables, batch_size=500):
+    """Upsert por id em lotes, na ordem das FKs. Rodar de novo com a mesma seed não duplica nada."""
+    for table in TABLE_ORDER:
+        rows = tables.get(table) or []
+        for start in range(0, len(rows), batch_size):
+            supabase.table(table).upsert(rows[start:start + batch_size], returning='minimal').execute()
+            print(f"\r{table}: {min(start + batch_size, len(rows))}/{len(rows)}", end="", flush=True)
+        if rows: print()
+
+
 if __name__ == "__main__":
-    seed()
+    if len(sys.argv) == 1:
+        seed()
+        sys.exit()
+
+    parser = argparse.ArgumentParser(description="Gerador de massa sintética (determinística pela seed)")
+    parser.add_argument('--stores', type=int, default=5)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=180, help="período coberto pelos pedidos")
+    parser.add_argument('--end', type=date.fromisoformat, default=DEFAULT_END, help="último dia do período (AAAA-MM-DD)")
+    parser.add_argument('--max-images', type=int, default=4, help="imagens extras por produto (0 a N)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--fixture', help="grava JSON {tabela: [linhas]} em vez de enviar ao Supabase "
+                                          "(a primeira loja vira 'default', como o app espera)")
+    args = parser.parse_args()
+
+    tables = generate(args.stores, args.products, args.customers, args.orders, args.seed, args.end, args.days,
+                      args.max_images, default_slug=bool(args.fixture))
+    print(", ".join(f"{len(rows)} {table}" for table, rows in tables.items()))
+    if args.fixture:
+        write_fixture(tables, args.fixture)
+        print(f"Fixture gravada em {args.fixture} (python supabase_stub.py --fixture {args.fixture})")
+    else:
+        upsert_all(get_client(), tables, args.batch_size)
+        print("Pronto. O rollup daily_sales é alimentado pelo trigger de orders.")
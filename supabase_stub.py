@@ -0,0 +1,461 @@
+"""
+Servidor local que imita o PostgREST e o Storage do Supabase, para benchmark e testes.
+
+    python supabase_stub.py --port 54321 --latency 0.02 --fixture dados.json
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=stub python app.py
+
+Cobre o subconjunto que o app usa, tudo em memória:
+- select com colunas e recursos embutidos (`product_images(...)`, `stores(*)`,
+  `customers(name)`), filtros eq/neq/gt/gte/lt/lte/in/is, `or=(...)` aninhado,
+  order e limit;
+- insert/upsert (`on_conflict`, merge ou ignore), update e delete com filtros;
+- RPCs place_order, increment_clicks, store_dashboard_stats e sales_summary
+  (as agregações saem direto de `orders`, sem o rollup diário);
+- Storage: upload (409 em duplicado, como o real) e leitura pública.
+
+`--latency` (+ `--jitter`) atrasa cada chamada como a rede até o Supabase.
+GET /__stats devolve as chamadas por rota ("GET products", "RPC place_order"...).
+Em testes/benchmark, `start_stub()` sobe o mesmo servidor numa thread.
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.parse
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from migrations import LATEST_VERSION
+
+# Colunas preenchidas pelo banco quando o insert não manda
+DEFAULTS = {
+    "products": {"is_active": True, "stock_quantity": 0, "clicks_count": 0},
+    "orders": {"status": "pending_payment"},
+    "stores": {"is_active": True},
+}
+OPERATORS = {
+    "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+}
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _text(value):
+    if isinstance(value, bool): return 'true' if value else 'false'
+    return 'null' if value is None else str(value)
+
+
+def _sort_key(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool): return (value is None, value, '')
+    return (value is None, 0, _text(value))
+
+
+def _compare(op, value, raw):
+    """Compara como o Postgres faria para os tipos que o app usa (número, texto ISO, uuid, bool)."""
+    if value is None: return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try: return OPERATORS[op](float(value), float(raw))
+        except ValueError: return False
+    return OPERATORS[op](_text(value), raw)
+
+
+# --- PARSER DE FILTROS ---
+
+def _split_top(text):
+    """Divide por vírgulas fora de parênteses/aspas."""
+    parts, depth, quoted, cur = [], 0, False, []
+    for ch in text:
+        if ch == '"': quoted = not quoted
+        elif not quoted and ch == '(': depth += 1
+        elif not quoted and ch == ')': depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            parts.append(''.join(cur))
+            cur = []
+        else: cur.append(ch)
+    if cur: parts.append(''.join(cur))
+    return parts
+
+
+def _unquote(value):
+    """Tira as aspas e normaliza literais do Postgres (o postgrest-py manda `eq.True`)."""
+    value = value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+    return value.lower() if value.lower() in ('true', 'false', 'null') else value
+
+
+def parse_condition(column, expr):
+    """('id', 'in.("a","b")') -> função row -> bool."""
+    negate = expr.startswith('not.')
+    if negate: expr = expr[4:]
+    op, _, raw = expr.partition('.')
+    if op == 'in':
+        values = {_unquote(v) for v in _split_top(raw.strip('()'))}
+        test = lambda row: _text(row.get(column)) in values
+    elif op == 'is':
+        raw = _unquote(raw)
+        test = lambda row: _text(row.get(column)) == raw
+    elif op in OPERATORS:
+        raw = _unquote(raw)
+        test = lambda row: _compare(op, row.get(column), raw)
+    else:
+        raise ValueError(f"operador não suportado: {op}")
+    return (lambda row: not test(row)) if negate else test
+
+
+def parse_logic(kind, body):
+    """or=(a.eq.1,and(b.eq.2,c.lt.3)) -> função row -> bool."""
+    tests = []
+    for part in _split_top(body):
+        if part.startswith(('and(', 'or(')):
+            sub, _, rest = part.partition('(')
+            tests.append(parse_logic(sub, rest[:-1]))
+        else:
+            column, _, expr = part.partition('.')
+            tests.append(parse_condition(column, expr))
+    join = any if kind == 'or' else all
+    return lambda row: join(t(row) for t in tests)
+
+
+def parse_select(text):
+    """'id, name, product_images(image_url)' -> [('id', None), ('product_images', [...])]."""
+    fields = []
+    for part in _split_top(text or '*'):
+        part = part.strip()
+        if '(' in part:
+            name, _, inner = part.partition('(')
+            fields.append((name.split(':')[-1].strip(), parse_select(inner[:-1])))
+        elif part: fields.append((part, None))
+    return fields
+
+
+class Database:
+    """Tabelas em memória: {tabela: {id: linha}} com índices por coluna refeitos sob demanda."""
+    def __init__(self, tables=None):
+        self.lock = threading.RLock()
+        self.tables = defaultdict(dict)
+        self._indexes = {}   # (tabela, coluna) -> {valor: [ids]}
+        self._sorted = {}    # (tabela, order) -> [ids]
+        self.objects = {}    # (bucket, caminho) -> (bytes, content-type)
+        for table, rows in (tables or {}).items():
+            for row in rows: self.tables[table][str(row.get('id') or uuid.uuid4())] = dict(row)
+        self.tables["schema_version"].setdefault("1", {"id": 1, "version": LATEST_VERSION})
+
+    # Índices e ordenações ficam em cache até a tabela mudar nas colunas envolvidas
+    def _touch(self, table, columns=None):
+        for key in [k for k in self._indexes if k[0] == table and (columns is None or k[1] in columns)]:
+            del self._indexes[key]
+        for key in [k for k in self._sorted if k[0] == table and (columns is None or set(c for c, _ in k[1]) & set(columns))]:
+            del self._sorted[key]
+
+    def index(self, table, column):
+        key = (table, column)
+        if key not in self._indexes:
+            idx = defaultdict(list)
+            for rid, row in self.tables[table].items(): idx[_text(row.get(column))].append(rid)
+            self._indexes[key] = idx
+        return self._indexes[key]
+
+    def ordered(self, table, order):
+        key = (table, order)
+        if key not in self._sorted:
+            rows, ids = self.tables[table], list(self.tables[table])
+            for column, desc in reversed(order): ids.sort(key=lambda rid: _sort_key(rows[rid].get(column)), reverse=desc)
+            self._sorted[key] = ids
+        return self._sorted[key]
+
+    # --- leitura ---
+    def select(self, table, params):
+        rows = self.tables[table]
+        filters, candidates = [], None
+        for column, expr in params:
+            if column in ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns'): continue
+            if column in ('or', 'and'):
+                filters.append(parse_logic(column, expr[1:-1]))
+                continue
+            if candidates is None and expr.startswith('eq.'):
+                candidates = [rows[i] for i in self.index(table, column).get(_unquote(expr[3:]), []) if i in rows]
+            filters.append(parse_condition(column, expr))
+
+        args = dict(params)
+        limit = int(args['limit']) if 'limit' in args else None
+        offset = int(args.get('offset') or 0)
+        if 'order' in args:
+            order = tuple((spec.split('.')[0], '.desc' in spec) for spec in args['order'].split(','))
+            # Filtro pouco seletivo (ex.: is_active=eq.true): melhor varrer a ordenação em cache até o limit
+            if candidates is not None and len(candidates) > 256: candidates = None
+            if candidates is None: candidates = (rows[i] for i in self.ordered(table, order))
+            else:
+                candidates = list(candidates)
+                for column, desc in reversed(order): candidates.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+        elif candidates is None: candidates = rows.values()
+
+        out = []
+        for row in candidates:
+            if all(f(row) for f in filters):
+                if offset: offset -= 1
+                else: out.append(row)
+                if limit is not None and len(out) >= limit: break
+        return out
+
+    def project(self, table, row, fields):
+        out = {}
+        for name, sub in fields:
+            if sub is None:
+                if name == '*': out.update(row)
+                else: out[name] = row.get(name)
+                continue
+            fk = f"{name[:-1]}_id"  # stores -> store_id (muitos-para-um)
+            if fk in row:
+                parent = self.tables[name].get(_text(row[fk]))
+                out[name] = self.project(name, parent, sub) if parent else None
+            else:  # products -> product_images.product_id (um-para-muitos)
+                back = f"{table[:-1]}_id"
+                children = self.tables[name]
+                out[name] = [self.project(name, children[i], sub) for i in self.index(name, back).get(_text(row.get('id')), [])
+                             if i in children]
+        return out
+
+    # --- escrita ---
+    def insert(self, table, rows, on_conflict=None, resolution=None):
+        written = []
+        for data in rows:
+            existing = None
+            cols = on_conflict.split(',') if on_conflict else []
+            if cols and all(data.get(c) is not None for c in cols):
+                matches = self.select(table, [(c, f"eq.{_text(data.get(c))}") for c in cols])
+                existing = matches[0] if matches else None
+            if existing is not None:
+                if resolution == 'ignore-duplicates': continue
+                existing.update(data)
+                self._touch(table, list(data))
+                written.append(existing)
+                continue
+            row = dict(DEFAULTS.get(table, {}), id=str(uuid.uuid4()), created_at=now_iso())
+            row.update(data)
+            self.tables[table][_text(row['id'])] = row
+            self._touch(table)
+            written.append(row)
+        return written
+
+    def update(self, table, params, data):
+        rows = self.select(table, params)
+        for row in rows: row.update(data)
+        if rows: self._touch(table, list(data))
+        return rows
+
+    def delete(self, table, params):
+        rows = self.select(table, params)
+        for row in rows: self.tables[table].pop(_text(row['id']), None)
+        if rows: self._touch(table)
+        return rows
+
+    # --- RPCs ---
+    def rpc_place_order(self, p_store_id, p_customer_id, p_delivery_address, p_items):
+        products = self.tables['products']
+        failures = []
+        for item in p_items:
+            p = products.get(_text(item['product_id']))
+            if not p or p.get('is_active') is False:
+                failures.append({"product_id": item['product_id'], "reason": "not_found", "requested": item['quantity'], "available": 0})
+            elif (p.get('stock_quantity') or 0) < item['quantity']:
+                failures.append({"product_id": item['product_id'], "reason": "insufficient_stock",
+                                 "requested": item['quantity'], "available": p.get('stock_quantity') or 0})
+        if failures: return {"order_id": None, "total": 0, "failures": failures}
+
+        total = round(sum(float(products[_text(i['product_id'])]['price']) * i['quantity'] for i in p_items), 2)
+        for item in p_items: products[_text(item['product_id'])]['stock_quantity'] -= item['quantity']
+        self._touch('products', ['stock_quantity'])
+        order = self.insert('orders', [{"store_id": p_store_id, "customer_id": p_customer_id, "subtotal": total, "total": total,
+                                        "delivery_address": p_delivery_address}])[0]
+        self.insert('order_items', [{"order_id": order['id'], "product_id": i['product_id'], "quantity": i['quantity'],
+                                     "unit_price": products[_text(i['product_id'])]['price']} for i in p_items])
+        return {"order_id": order['id'], "total": total, "failures": []}
+
+    def rpc_increment_clicks(self, increments):
+        for pid, n in increments.items():
+            p = self.tables['products'].get(pid)
+            if p: p['clicks_count'] = (p.get('clicks_count') or 0) + int(n)
+        return None
+
+    def _orders(self, store_id=None, date_from=None, date_to=None):
+        for o in (self.select('orders', [('store_id', f"eq.{store_id}")]) if store_id else self.tables['orders'].values()):
+            day = str(o.get('created_at') or '')[:10]
+            if (date_from and day < date_from) or (date_to and day > date_to): continue
+            yield o, day
+
+    def rpc_store_dashboard_stats(self, p_store_id):
+        breakdown = defaultdict(lambda: {"count": 0, "revenue": 0.0})
+        for o, _ in self._orders(p_store_id):
+            b = breakdown[o.get('status') or 'unknown']
+            b["count"] += 1
+            b["revenue"] += float(o.get('total') or 0)
+        return {"total_revenue": sum(v["revenue"] for k, v in breakdown.items() if k != 'cancelled'),
+                "order_count": sum(v["count"] for v in breakdown.values()),
+                "product_count": len(self.index('products', 'store_id').get(_text(p_store_id), [])),
+                "status_breakdown": dict(breakdown)}
+
+    def rpc_sales_summary(self, p_from=None, p_to=None, p_store_id=None):
+        by_status = defaultdict(lambda: {"count": 0, "revenue": 0.0})
+        by_store = defaultdict(lambda: {"orders": 0, "revenue": 0.0})
+        by_day = defaultdict(lambda: {"orders": 0, "revenue": 0.0})
+        for o, day in self._orders(p_store_id, p_from, p_to):
+            total, status = float(o.get('total') or 0), o.get('status') or 'unknown'
+            by_status[status]["count"] += 1
+            by_status[status]["revenue"] += total
+            for bucket in (by_store[o.get('store_id')], by_day[day]):
+                bucket["orders"] += 1
+                if status != 'cancelled': bucket["revenue"] += total
+        return {"total_sales": sum(v["revenue"] for k, v in by_status.items() if k != 'cancelled'),
+                "total_orders": sum(v["count"] for v in by_status.values()),
+                "by_status": dict(by_status),
+                "by_store": sorted(({"store_id": k, **v} for k, v in by_store.items()), key=lambda r: -r["revenue"]),
+                "by_day": [{"day": k, **by_day[k]} for k in sorted(by_day)]}
+
+
+class SupabaseStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados: sem isso, +40 ms de ACK atrasado
+
+    def log_message(self, *args): pass
+
+    def _reply(self, status, body=None, raw=None, content_type='application/json'):
+        if raw is None: raw = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        if self.command != 'HEAD': self.wfile.write(raw)
+
+    def _body(self):
+        length = self.headers.get('Content-Length')
+        if length is not None: return self.rfile.read(int(length))
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if not size: break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b''.join(chunks)
+        return b''
+
+    def _handle(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in url.path.split('/') if p]
+        params = urllib.parse.parse_qsl(url.query, keep_blank_values=True)
+        body = self._body()
+        if parts == ['__stats']: return self._reply(200, dict(server.stats))
+
+        delay = server.latency + (random.uniform(0, server.jitter) if server.jitter else 0)
+        if delay: time.sleep(delay)
+
+        if parts[:2] == ['rest', 'v1'] and len(parts) >= 3: return self._rest(parts[2:], params, body)
+        if parts[:3] == ['storage', 'v1', 'object'] and len(parts) >= 4: return self._storage(parts[3:], body)
+        self._reply(404, {"message": "not found"})
+
+    def _rest(self, parts, params, body):
+        db, prefer = self.server.db, self.headers.get('Prefer', '')
+        data = json.loads(body) if body else None
+        with db.lock:
+            if parts[0] == 'rpc':
+                self.server.stats[f"RPC {parts[1]}"] += 1
+                fn = getattr(db, f"rpc_{parts[1]}", None)
+                if fn is None: return self._reply(404, {"message": f"function {parts[1]} not found"})
+                return self._reply(200, fn(**(data or {})))
+
+            table = parts[0]
+            self.server.stats[f"{self.command} {table}"] += 1
+            fields = parse_select(dict(params).get('select'))
+            try:
+                if self.command in ('GET', 'HEAD'): rows = db.select(table, params)
+                elif self.command == 'POST':
+                    resolution = next((p.split('=')[1] for p in prefer.split(',') if p.strip().startswith('resolution=')), None)
+                    rows = db.insert(table, data if isinstance(data, list) else [data],
+                                     dict(params).get('on_conflict') if resolution else None, resolution)
+                elif self.command == 'PATCH': rows = db.update(table, params, data)
+                elif self.command == 'DELETE': rows = db.delete(table, params)
+                else: return self._reply(405, {"message": "method not allowed"})
+            except ValueError as e:
+                return self._reply(400, {"message": str(e)})
+            if self.command != 'GET' and 'return=representation' not in prefer: return self._reply(201 if self.command == 'POST' else 204, raw=b'')
+            return self._reply(201 if self.command == 'POST' else 200, [db.project(table, r, fields) for r in rows])
+
+    def _storage(self, parts, body):
+        db = self.server.db
+        if parts[0] == 'public' and self.command == 'GET':
+            self.server.stats["GET storage"] += 1
+            obj = db.objects.get((parts[1], '/'.join(parts[2:])))
+            if not obj: return self._reply(404, {"message": "Object not found"})
+            return self._reply(200, raw=obj[0], content_type=obj[1])
+        if self.command in ('POST', 'PUT'):
+            self.server.stats["UPLOAD storage"] += 1
+            key = (parts[0], '/'.join(parts[1:]))
+            data, ctype = _multipart_file(self.headers.get('Content-Type', ''), body)
+            with db.lock:
+                if self.command == 'POST' and key in db.objects and self.headers.get('x-upsert') != 'true':
+                    return self._reply(409, {"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"})
+                db.objects[key] = (data, ctype)
+            return self._reply(200, {"Key": '/'.join(key), "Id": str(uuid.uuid4())})
+        self._reply(405, {"message": "method not allowed"})
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+
+def _multipart_file(content_type, body):
+    """Extrai (bytes, content-type) do campo de arquivo de um multipart/form-data."""
+    if 'boundary=' not in content_type: return body, content_type
+    boundary = b'--' + content_type.split('boundary=')[1].strip('"').encode()
+    for part in body.split(boundary):
+        head, _, data = part.partition(b'\r\n\r\n')
+        if b'filename=' in head:
+            ctype = next((line.split(b':', 1)[1].strip().decode() for line in head.split(b'\r\n')
+                          if line.lower().startswith(b'content-type')), 'application/octet-stream')
+            return data[:-2] if data.endswith(b'\r\n') else data, ctype
+    return b'', 'application/octet-stream'
+
+
+def load_fixture(path):
+    """Fixture JSON {"tabela": [linhas]} (ex.: gerada por seed_data.py --fixture)."""
+    with open(path, encoding='utf-8') as f: return json.load(f)
+
+
+def make_server(host='127.0.0.1', port=0, tables=None, latency=0.0, jitter=0.0):
+    server = ThreadingHTTPServer((host, port), SupabaseStubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    server.db = Database(tables)
+    server.stats = Counter()
+    server.latency = latency
+    server.jitter = jitter
+    return server
+
+
+def start_stub(port=0, tables=None, latency=0.0, jitter=0.0):
+    """Sobe o stub numa thread daemon. Retorna (server, base_url)."""
+    server = make_server(port=port, tables=tables, latency=latency, jitter=jitter)
+    threading.Thread(target=server.serve_forever, name="supabase-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local do PostgREST/Storage do Supabase")
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--fixture', help="JSON {tabela: [linhas]} para carregar na partida")
+    parser.add_argument('--latency', type=float, default=0.0, help="atraso fixo por chamada (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="atraso extra aleatório de 0 até este valor (s)")
+    args = parser.parse_args()
+
+    server = make_server(port=args.port, tables=load_fixture(args.fixture) if args.fixture else None,
+                         latency=args.latency, jitter=args.jitter)
+    base = f"http://127.0.0.1:{args.port}"
+    print(f"Stub Supabase em {base}")
+    print(f"  SUPABASE_URL={base} SUPABASE_SERVICE_ROLE_KEY=stub")
+    server.serve_forever()
@@ -0,0 +1,49 @@
+import json
+import base64
+
+import pytest
+
+from catalog_utils import encode_cursor, decode_cursor, keyset_page
+
+
+def _cursor(created_at, pid):
+    raw = json.dumps([created_at, pid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+class RecordingQuery:
+    def __init__(self):
+        self.or_filters = []
+
+    def or_(self, expr):
+        self.or_filters.append(expr)
+        return self
+
+    def order(self, *args, **kwargs): return self
+    def limit(self, n): return self
+
+    def execute(self):
+        class Result: data = []
+        return Result()
+
+
+def test_round_trip():
+    product = {"created_at": "2025-01-01T12:00:00.123456+00:00", "id": "0b5f0c3e-8f1a-4d39-9a53-6f7c2a1d9e10"}
+    assert decode_cursor(encode_cursor(product)) == (product["created_at"], product["id"])
+
+
+@pytest.mark.parametrize("created_at, pid", [
+    ('2025-01-01",id.gt."0', "0b5f0c3e-8f1a-4d39-9a53-6f7c2a1d9e10"),
+    ("2025-01-01T00:00:00+00:00", '0",is_active.eq.false,id.lt."z'),
+    ("2025-01-01T00:00:00+00:00)", "0b5f0c3e-8f1a-4d39-9a53-6f7c2a1d9e10"),
+    (["2025-01-01"], "0b5f0c3e-8f1a-4d39-9a53-6f7c2a1d9e10"),
+])
+def test_malicious_cursor_is_rejected(created_at, pid):
+    cursor = _cursor(created_at, pid)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+    query = RecordingQuery()
+    with pytest.raises(ValueError):
+        keyset_page(query, cursor)
+    assert query.or_filters == []  # nada chega ao PostgREST
@@ -0,0 +1,81 @@
+from checkout_utils import validate_cart, place_order, describe_failure
+
+P1 = "00000000-0000-4000-9000-000000000001"
+P2 = "00000000-0000-4000-9000-000000000002"
+PRODUCTS = {
+    P1: {"id": P1, "name": "Fone", "price": "99.90", "stock_quantity": 10, "is_active": True},
+    P2: {"id": P2, "name": "Cabo", "price": "19.90", "stock_quantity": 1, "is_active": True},
+}
+
+
+class Result:
+    def __init__(self, data): self.data = data
+
+
+class FakeSupabase:
+    """Só o que o checkout usa: products.select().in_() e rpc('place_order')."""
+    def __init__(self, rpc_result=None):
+        self.in_calls, self.rpc_calls = [], []
+        self.rpc_result = rpc_result
+
+    def table(self, name):
+        assert name == 'products'
+        return self
+
+    def select(self, columns): return self
+
+    def in_(self, column, values):
+        self.in_calls.append(list(values))
+        self._rows = [PRODUCTS[v] for v in values if v in PRODUCTS]
+        return self
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        self._rows = self.rpc_result
+        return self
+
+    def execute(self): return Result(self._rows)
+
+
+def test_invalid_id_is_reported_without_reaching_the_query():
+    supabase = FakeSupabase()
+    lines, failures = validate_cart(supabase, {"não-é-uuid": 1, P1: 2})
+
+    assert supabase.in_calls == [[P1]]
+    assert [l["product_id"] for l in lines] == [P1]
+    assert failures == [{"product_id": "não-é-uuid", "name": None, "reason": "not_found", "requested": 1, "available": 0}]
+    assert describe_failure(failures[0]) == "Produto: produto indisponível"
+
+
+def test_cart_with_only_invalid_ids_skips_the_query():
+    supabase = FakeSupabase()
+    lines, failures = validate_cart(supabase, {"1; drop": 1})
+    assert supabase.in_calls == [] and lines == []
+    assert failures[0]["reason"] == "not_found"
+
+
+def test_insufficient_stock_blocks_the_order():
+    supabase = FakeSupabase()
+    order, failures = place_order(supabase, "loja", "cliente", {P2: 3}, "Rua A")
+
+    assert order is None and supabase.rpc_calls == []
+    assert failures[0]["reason"] == "insufficient_stock"
+    assert describe_failure(failures[0]) == "Cabo: estoque insuficiente (1 disponíveis, 3 pedidos)"
+
+
+def test_rpc_failures_are_named():
+    supabase = FakeSupabase(rpc_result={"failures": [{"product_id": P1, "reason": "insufficient_stock", "requested": 2, "available": 0}]})
+    order, failures = place_order(supabase, "loja", "cliente", {P1: 2}, "Rua A")
+
+    assert order is None
+    assert failures[0]["name"] == "Fone"
+    assert describe_failure(failures[0]) == "Fone: estoque insuficiente (0 disponíveis, 2 pedidos)"
+
+
+def test_order_placed_in_one_rpc():
+    supabase = FakeSupabase(rpc_result={"order_id": "pedido-1", "total": "199.80"})
+    order, failures = place_order(supabase, "loja", "cliente", {P1: 2}, "Rua A")
+
+    assert failures == []
+    assert order == {"id": "pedido-1", "total": 199.80, "items": [{"name": "Fone", "quantity": 2}]}
+    assert supabase.rpc_calls[0][1]["p_items"] == [{"product_id": P1, "quantity": 2}]
@@ -0,0 +1,76 @@
+import time
+import threading
+
+from click_utils import ClickCounter
+
+
+def test_outage_does_not_spawn_threads_or_hammer_the_database():
+    calls = []
+
+    def failing_flush(batch):
+        calls.append(batch)
+        raise RuntimeError("banco fora")
+
+    counter = ClickCounter(failing_flush, interval=0.05, max_pending=10, max_backoff=0.4).start()
+    threads_before = threading.active_count()
+    for i in range(5000):
+        counter.add(f"p{i % 50}")
+    time.sleep(0.3)
+
+    assert threading.active_count() <= threads_before
+    assert len(calls) <= 4  # backoff 0.05, 0.1, 0.2... não uma chamada por clique
+    stats = counter.stats()
+    assert stats["pending"] == 5000  # nada se perde
+    assert stats["failures"] == len(calls)
+    counter._stop.set()
+    counter._wake.set()
+
+
+def test_threshold_wakes_flusher_and_recovers():
+    batches = []
+    counter = ClickCounter(batches.append, interval=60, max_pending=100).start()
+    for _ in range(100):
+        counter.add("p1")
+    deadline = time.time() + 2
+    while not batches and time.time() < deadline:
+        time.sleep(0.01)
+    assert batches == [{"p1": 100}]
+    assert counter.stats()["pending"] == 0
+    counter.shutdown()
+
+
+def test_add_flushes_inline_when_interval_elapsed_without_thread():
+    # Serverless: a thread nunca roda (sem start); o próprio add descarrega
+    batches = []
+    counter = ClickCounter(batches.append, interval=0.05, max_pending=10 ** 6)
+    counter.add("p1")
+    counter.add("p2")
+    assert batches == []
+    time.sleep(0.06)
+    counter.add("p1")
+    assert batches == [{"p1": 2, "p2": 1}]
+    assert counter.stats()["pending"] == 0
+
+
+def test_inline_flush_does_not_wait_for_a_flush_in_progress():
+    release = threading.Event()
+    batches = []
+
+    def slow_flush(batch):
+        release.wait(2)
+        batches.append(batch)
+
+    counter = ClickCounter(slow_flush, interval=0.01, max_pending=10 ** 6)
+    counter.add("p1")
+    time.sleep(0.02)
+    worker = threading.Thread(target=counter.add, args=("p1",))
+    worker.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    time.sleep(0.02)
+    counter.add("p2")  # envio em andamento: não bloqueia
+    assert time.monotonic() - started < 0.5
+    release.set()
+    worker.join()
+    assert batches == [{"p1": 2}]
+    assert counter.stats()["pending"] == 1
@@ -0,0 +1,50 @@
+import time
+import threading
+
+from image_utils import map_bounded, persist_image, ImageIndex
+
+
+def test_map_bounded_passes_remaining_time_and_skips_late_tasks():
+    calls, lock = [], threading.Lock()
+
+    def slow(url, timeout):
+        with lock: calls.append((url, timeout))
+        time.sleep(0.25)
+        return url
+
+    # Um host, uma vaga: a 1ª termina no prazo, a 2ª estoura, as demais nem começam
+    urls = [f"https://cdn.example.com/{i}.jpg" for i in range(4)]
+    out = map_bounded(slow, urls, max_workers=4, per_host=1, deadline=0.4)
+    time.sleep(0.6)  # tempo para as da fila rodarem, se fossem rodar
+
+    assert out == [urls[0], None, None, None]
+    assert [url for url, _ in calls] == urls[:2]
+    assert calls[0][1] <= 0.4
+    assert calls[1][1] < 0.2  # só o que sobrava do prazo
+
+
+class CountingSupabase:
+    """Storage falso que conta os uploads."""
+    def __init__(self):
+        self.uploads = []
+        self.storage = self
+
+    def from_(self, bucket): return self
+
+    def upload(self, path, data, options=None): self.uploads.append(path)
+
+    def get_public_url(self, path): return f"https://storage.test/{path}"
+
+
+def test_failed_renditions_do_not_disable_dedup(tmp_path):
+    index = ImageIndex(str(tmp_path / "index.sqlite"))
+    supabase = CountingSupabase()
+    broken = b"\xff\xd8\xff\xe0" + b"\x00" * 64  # assinatura JPEG, conteúdo ilegível: versões falham
+
+    first = persist_image(supabase, broken, "d" * 64, "jpg", index)
+    assert first == {"url": f"https://storage.test/{'d' * 64}.jpg", "renditions": {}}
+    assert supabase.uploads == [f"{'d' * 64}.jpg"]
+
+    again = persist_image(supabase, broken, "d" * 64, "jpg", index)
+    assert again == first
+    assert len(supabase.uploads) == 1  # índice respondeu: nada foi enviado de novo
@@ -0,0 +1,52 @@
+import io
+
+from import_utils import CatalogImporter, iter_rows
+
+
+class Result:
+    def __init__(self, data): self.data = data
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.upserted = []
+
+    def table(self, name):
+        self._table = name
+        return self
+
+    def select(self, *args): return self
+    def in_(self, *args): return self
+
+    def upsert(self, rows, **kwargs):
+        if self._table == 'products':
+            self.upserted += rows
+            self._rows = [{"sku": r["sku"], "id": f"id-{r['sku']}"} for r in rows]
+        else:
+            self._rows = []
+        return self
+
+    def execute(self):
+        rows, self._rows = getattr(self, '_rows', []), []
+        return Result(rows)
+
+
+def _feed(n):
+    lines = ["sku,name,price,stock_quantity"] + [f"s{i},Produto {i},{10 + i},5" for i in range(n)]
+    return io.BytesIO("\n".join(lines).encode())
+
+
+def test_import_stops_at_max_rows_and_flags_truncation():
+    supabase = FakeSupabase()
+    importer = CatalogImporter(supabase, "loja", batch_size=3, persist_images=False)
+    report = importer.run(iter_rows(_feed(10), 'csv'), max_rows=4)
+
+    assert report["read"] == 4 and report["imported"] == 4
+    assert report["truncated"] and report["done"]
+    assert [p["sku"] for p in supabase.upserted] == ["s0", "s1", "s2", "s3"]
+
+
+def test_import_within_limit_is_not_truncated():
+    importer = CatalogImporter(FakeSupabase(), "loja", persist_images=False)
+    report = importer.run(iter_rows(_feed(4), 'csv'), max_rows=4)
+    assert report["imported"] == 4 and not report["truncated"]
@@ -0,0 +1,64 @@
+"""
+Idas ao banco por rota, contra o stub local do Supabase (supabase_stub.py).
+Cada rota tem um orçamento fixo: um N+1 que volte quebra o teste.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+import trace_utils
+from bench_load import demo_tables
+from supabase_stub import start_stub
+
+
+@pytest.fixture(scope="module")
+def client():
+    server, base = start_stub(tables=demo_tables(products=60))
+    tmp = tempfile.mkdtemp()
+    os.environ.update({"SUPABASE_URL": base, "SUPABASE_SERVICE_ROLE_KEY": "stub",
+                       "IMAGE_INDEX_PATH": os.path.join(tmp, "index.sqlite"),
+                       "SCRAPER_STATS_PATH": os.path.join(tmp, "stats.sqlite"),
+                       "SCRAPE_CACHE_PATH": os.path.join(tmp, "cache.sqlite")})
+    sys.modules.pop('app', None)
+    import app as vapt
+    vapt.app.config['TESTING'] = True
+    with vapt.app.test_client() as c:
+        c.get('/')  # aquece o cache da loja
+        yield c
+    vapt.click_counter.shutdown()
+    server.shutdown()
+
+
+def _product_id(client):
+    return client.get('/api/catalogo', query_string={"limit": 1}).get_json()["products"][0]["id"]
+
+
+def test_storefront_is_one_query(client):
+    with trace_utils.query_budget(1):
+        assert client.get('/').status_code == 200
+
+
+def test_search_is_one_lookup_once_indexed(client):
+    client.get('/', query_string={"q": "fone"})  # primeira busca constrói o índice
+    with trace_utils.query_budget(1):
+        assert client.get('/', query_string={"q": "fone"}).status_code == 200
+
+
+def test_checkout_is_customer_upsert_batch_select_and_one_rpc(client):
+    pid = _product_id(client)
+    assert client.post('/carrinho/adicionar', data={"product_id": pid, "quantity": 2}).get_json()["status"] == "success"
+    form = {"name": "Cliente", "email": "cliente@teste.local", "whatsapp": "11999999999", "street": "Rua A", "number": "1",
+            "neighborhood": "Centro", "city": "São Paulo", "state": "SP", "cep": "01000-000"}
+    with trace_utils.query_budget(3) as log:
+        response = client.post('/checkout', data=form)
+    assert response.status_code == 302 and '/confirmacao/' in response.headers['location']
+    assert [(c["op"], c["target"]) for c in log.calls] == [("upsert", "customers"), ("select", "products"), ("rpc", "place_order")]
+
+
+def test_seller_dashboard_is_stats_rpc_plus_pages(client):
+    with client.session_transaction() as session: session['is_admin'] = True
+    with trace_utils.query_budget(3) as log:
+        assert client.get('/vendedor').status_code == 200
+    assert ("rpc", "store_dashboard_stats") in [(c["op"], c["target"]) for c in log.calls]
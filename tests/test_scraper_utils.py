@@ -0,0 +1,80 @@
+import json
+
+from scraper_utils import StrategyStats, ScrapeCache, FastScanner, extract_from_stream, valid_encoding
+
+URL = "https://loja.example.com/produto/1"
+
+
+def _page(price_html):
+    ld = {"@context": "https://schema.org", "@type": "Product", "name": "Fone Bluetooth",
+          "image": ["https://loja.example.com/fone.jpg"], "offers": {"@type": "Offer", "price": "199.90"}}
+    return (f'<html><head><title>Fone Bluetooth</title>'
+            f'<script type="application/ld+json">{json.dumps(ld)}</script></head>'
+            f'<body>{price_html}</body></html>').encode()
+
+
+def test_jsonld_wins_even_when_stats_favor_selectors(tmp_path):
+    stats = StrategyStats(str(tmp_path / "stats.sqlite"))
+    for _ in range(50):
+        stats.record("loja.example.com", "price", ["selectors"], "selectors")
+
+    # Preço "de" riscado no DOM: se os seletores rodassem antes, viria o valor errado
+    data, info = extract_from_stream([_page('<span class="price">R$ 299,90</span>')], URL, stats=stats)
+
+    assert info["price_from"] == "jsonld"
+    assert data["price"] == 199.90
+    assert not info["full_dom"]
+
+
+def test_fallbacks_ranked_by_win_rate(tmp_path):
+    stats = StrategyStats(str(tmp_path / "stats.sqlite"))
+    domain = "loja.example.com"
+    for i in range(100):  # 10 vitórias em 100 tentativas
+        stats.record(domain, "price", ["selectors"], "selectors" if i < 10 else None)
+    for _ in range(3):    # 3 em 3
+        stats.record(domain, "price", ["text_regex"], "text_regex")
+
+    alive, dead = stats.order(domain, "price", ["selectors", "text_regex"])
+    assert alive == ["text_regex", "selectors"]
+    assert dead == []
+
+
+def test_scrape_cache_prunes_old_rows_and_caps_size(tmp_path):
+    cache = ScrapeCache(str(tmp_path / "cache.sqlite"), ttl=60, max_rows=3)
+    cache.put("https://a.example.com/velho", {"title": "velho"})
+    with cache._connect() as conn:
+        conn.execute("UPDATE scrape_cache SET fetched_at = fetched_at - 3600")
+    for i in range(5):
+        cache.put(f"https://a.example.com/{i}", {"title": str(i)})
+
+    cache.prune()
+    with cache._connect() as conn:
+        urls = {row[0] for row in conn.execute("SELECT url FROM scrape_cache")}
+    assert cache.get("https://a.example.com/velho") is None
+    assert len(urls) == 3
+
+
+def test_scrape_cache_prunes_on_put(tmp_path):
+    cache = ScrapeCache(str(tmp_path / "cache.sqlite"), ttl=60, max_rows=10)
+    for i in range(ScrapeCache.PRUNE_EVERY):
+        cache.put(f"https://a.example.com/{i}", {"title": str(i)})
+    with cache._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM scrape_cache").fetchone()[0] == 10
+
+
+def test_scanner_finds_title_and_meta_split_across_chunks():
+    page = (b"<html><head>" + b"<!-- x -->" * 2000 + b"<title>Caf\xc3\xa9 Torrado</title>"
+            b'<meta property="og:price:amount" content="29,90"></head><body></body></html>')
+    scanner = FastScanner()
+    for i in range(0, len(page), 7):  # blocos minúsculos cortam as tags no meio
+        scanner.feed(page[i:i + 7])
+    assert scanner.title == "Café Torrado"
+    assert scanner.meta["og:price:amount"] == "29,90"
+
+
+def test_unknown_charset_falls_back_to_utf8():
+    assert valid_encoding("utf8mb4") == "utf-8"
+    assert valid_encoding("ISO-8859-1") == "iso8859-1"
+    data, info = extract_from_stream([_page("")], URL, encoding="utf8mb4")
+    assert data["title"] == "Fone Bluetooth"
+    assert data["price"] == 199.90
@@ -0,0 +1,74 @@
+import time
+import threading
+
+from search_utils import SearchIndex, fold, tokenize
+
+PRODUCTS = [
+    {"id": "1", "name": "Café Torrado", "description": "grãos especiais", "created_at": "2025-01-01"},
+    {"id": "2", "name": "Headfone Bluetooth", "description": "fone sem fio", "created_at": "2025-01-02"},
+    {"id": "3", "name": "Fone de Ouvido", "description": "com cabo", "created_at": "2025-01-03"},
+]
+
+
+def test_accent_folding():
+    assert fold("Ação Café") == "acao cafe"
+    assert tokenize("Pão-de-Açúcar!") == ["pao", "de", "acucar"]
+
+
+def test_cafe_finds_cafe_with_accent():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    assert index.search("cafe") == ["1"]
+    assert index.search("CAFÉ torrado") == ["1"]
+
+
+def test_ranking_name_exact_before_partial_and_description():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    # '3' tem 'fone' no nome; '2' tem em 'headfone' (parcial) e na descrição
+    assert index.search("fone") == ["3", "2"]
+
+
+def test_add_and_remove():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    index.add({"id": "4", "name": "Café Solúvel", "created_at": "2025-01-04"})
+    assert index.search("cafe") == ["4", "1"]
+    index.remove("1")
+    assert index.search("cafe") == ["4"]
+    assert index.search("torrado") == []
+
+
+def test_stale_index_is_served_while_refreshing_in_background():
+    index = SearchIndex(max_age=0)
+    index.ensure_fresh(lambda since: PRODUCTS)
+    assert index.search("cafe") == ["1"]
+
+    release, calls = threading.Event(), []
+
+    def slow_loader(since):
+        calls.append(since)
+        release.wait(2)
+        return [{"id": "1", "name": "Café Torrado", "is_active": False},
+                {"id": "5", "name": "Café Gelado", "created_at": "2025-01-05"}]
+
+    started = time.monotonic()
+    index.ensure_fresh(slow_loader)
+    index.ensure_fresh(slow_loader)  # atualização em andamento: não dispara outra
+    assert time.monotonic() - started < 0.5
+    assert index.search("cafe") == ["1"]  # índice velho segue respondendo
+
+    release.set()
+    deadline = time.time() + 2
+    while index.search("cafe") != ["5"] and time.time() < deadline: time.sleep(0.01)
+    assert index.search("cafe") == ["5"]
+    assert len(calls) == 1 and calls[0] is not None  # incremental, não recarga completa
+
+
+def test_full_reload_when_due():
+    index = SearchIndex(max_age=0, full_every=0)
+    index.build(PRODUCTS)
+    seen = []
+    index.ensure_fresh(lambda since: seen.append(since) or PRODUCTS[1:], background=False)
+    assert seen == [None]
+    assert index.search("cafe") == []
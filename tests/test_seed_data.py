@@ -0,0 +1,11 @@
+from seed_data import Generator
+
+
+def test_customer_whatsapp_unique_across_seeds():
+    # 1 e 11 colidiam com seed % 10; customers.whatsapp é UNIQUE
+    numbers = [c["whatsapp"] for seed in (1, 11, 21) for c in Generator(seed=seed).customers(50)]
+    assert len(numbers) == len(set(numbers))
+
+
+def test_customers_deterministic_per_seed():
+    assert Generator(seed=7).customers(5) == Generator(seed=7).customers(5)
@@ -0,0 +1,13 @@
+import time
+
+from uber_utils import TokenCache, DEFAULT_TOKEN_LIFETIME, TOKEN_REFRESH_MARGIN
+
+
+def test_token_without_expires_in_is_cached():
+    cache = TokenCache()
+    fetch = lambda: ("tok", None)
+
+    assert cache.get(fetch) == "tok"
+    assert cache.get(fetch) == "tok"
+    assert cache.fetches == 1
+    assert cache.expires_at > time.time() + DEFAULT_TOKEN_LIFETIME - TOKEN_REFRESH_MARGIN - 5
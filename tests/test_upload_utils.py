@@ -0,0 +1,65 @@
+import io
+import tempfile
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from image_utils import persist_image
+from upload_utils import open_image_upload, UPLOAD_SPOOL_BYTES
+
+
+class FakeBucket:
+    """Imita o storage3: lê o arquivo recebido e fecha BufferedReader/FileIO."""
+    def __init__(self, objects):
+        self.objects = objects
+
+    def upload(self, path, file, options=None):
+        if isinstance(file, (bytes, bytearray)): data = bytes(file)
+        else:
+            file.seek(0)
+            data = file.read()
+            file.close()
+        self.objects[path] = data
+
+    def get_public_url(self, path):
+        return f"https://storage.test/{path}"
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.objects = {}
+        self.storage = self
+
+    def from_(self, bucket):
+        return FakeBucket(self.objects)
+
+
+def _spooled_jpeg(width=1600, height=1200):
+    buf = io.BytesIO()
+    Image.effect_noise((width, height), 80).convert('RGB').save(buf, 'JPEG', quality=95)
+    data = buf.getvalue()
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='w+b')
+    spool.write(data)
+    spool.seek(0)
+    return FileStorage(stream=spool, filename='foto.jpg'), data
+
+
+def test_large_upload_stores_renditions():
+    file, data = _spooled_jpeg()
+    assert len(data) > UPLOAD_SPOOL_BYTES
+    supabase = FakeSupabase()
+
+    with open_image_upload(file) as upload:
+        assert not isinstance(upload["source"], bytes)  # caminho em blocos, não em memória
+        persisted = persist_image(supabase, upload["source"], upload["digest"], upload["ext"], size=upload["size"])
+
+    assert persisted["renditions"], "versões responsivas não foram geradas"
+    assert {w for w, _ in persisted["renditions"]["webp"]} == {320, 640, 1024}
+    assert supabase.objects[f'{upload["digest"]}.jpg'] == data
+    assert sum(1 for path in supabase.objects if path.startswith('r/')) == 6
+
+
+def test_rejects_non_image():
+    file = FileStorage(stream=io.BytesIO(b'MZ' + b'\0' * 2048), filename='foto.jpg')
+    with open_image_upload(file) as upload:
+        assert upload is None
@@ -0,0 +1,172 @@
+"""
+Contagem e tempo das chamadas ao backend por requisição (Supabase e HTTP de saída).
+
+Ganchos de evento do httpx nos clientes do PostgREST/Storage e no cliente
+compartilhado de http_utils registram cada ida ao servidor: tipo (db,
+storage, http), alvo (tabela, função rpc, bucket, host), operação e
+latência até os cabeçalhos da resposta. No fim da requisição Flask saem:
+
+- cabeçalho `Server-Timing` (db/storage/http/app), visível no DevTools;
+- uma linha de log JSON com rota, status e as chamadas agregadas.
+
+Nos testes, `query_budget` fixa quantas idas ao banco uma rota pode fazer:
+
+    with trace_utils.query_budget(3):
+        client.get('/')     # AssertionError listando as chamadas se passar de 3
+
+Só conta o que roda na thread da requisição; trabalho em pool/threads de
+fundo (download de imagens em paralelo, flush de cliques) fica de fora.
+"""
+import os
+import json
+import time
+import urllib.parse
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter, defaultdict
+
+ENABLED = os.getenv("REQUEST_TRACE", "1") != "0"
+KINDS = ("db", "storage", "http")
+
+_active = ContextVar("trace_collectors", default=())
+_supabase_hosts = set()
+
+
+class CallLog:
+    """Chamadas registradas enquanto ativo: dicts {kind, target, op, ms, status}."""
+    def __init__(self):
+        self.calls = []
+        self.started = time.perf_counter()
+
+    def count(self, kind=None):
+        return sum(1 for c in self.calls if kind is None or c["kind"] == kind)
+
+    def summary(self):
+        """{kind: {"count", "ms"}} e as operações mais repetidas (as candidatas a N+1)."""
+        totals = defaultdict(lambda: {"count": 0, "ms": 0.0})
+        for c in self.calls:
+            totals[c["kind"]]["count"] += 1
+            totals[c["kind"]]["ms"] += c["ms"]
+        repeated = Counter(f'{c["kind"]}:{c["op"]}:{c["target"]}' for c in self.calls)
+        return {k: {"count": v["count"], "ms": round(v["ms"], 1)} for k, v in totals.items()}, repeated.most_common(5)
+
+    def describe(self):
+        return "\n".join(f'  {c["kind"]:<7} {c["op"]:<7} {c["target"]} ({c["ms"]:.1f} ms, {c["status"]})' for c in self.calls)
+
+
+@contextmanager
+def collecting():
+    """Ativa um CallLog no contexto atual (aninhável: cada chamada vai para todos os ativos)."""
+    log = CallLog()
+    token = _active.set(_active.get() + (log,))
+    try: yield log
+    finally: _active.reset(token)
+
+
+def record(kind, target, op, ms, status=None):
+    active = _active.get()
+    if not active: return
+    call = {"kind": kind, "target": target, "op": op, "ms": ms, "status": status}
+    for log in active: log.calls.append(call)
+
+
+# --- GANCHOS HTTPX ---
+
+def classify(request):
+    """httpx.Request -> (kind, target, op)."""
+    url = request.url
+    if url.host not in _supabase_hosts: return "http", url.host, request.method
+    parts = [p for p in url.path.split('/') if p]
+    if parts[:2] == ["rest", "v1"]:
+        if len(parts) > 3 and parts[2] == "rpc": return "db", parts[3], "rpc"
+        target = parts[2] if len(parts) > 2 else "?"
+        if request.method in ("GET", "HEAD"): return "db", target, "select"
+        if request.method == "PATCH": return "db", target, "update"
+        if request.method == "DELETE": return "db", target, "delete"
+        prefer = request.headers.get("prefer", "")
+        return "db", target, "upsert" if "resolution=" in prefer else "insert"
+    if parts[:2] == ["storage", "v1"]:
+        # /storage/v1/object/<bucket>/<caminho>
+        target = parts[3] if len(parts) > 3 else (parts[2] if len(parts) > 2 else "?")
+        return "storage", target, {"POST": "upload", "PUT": "update", "DELETE": "delete"}.get(request.method, request.method.lower())
+    return "db", parts[0] if parts else "?", request.method.lower()
+
+
+def _on_request(request):
+    request.extensions["trace_t0"] = time.perf_counter()
+
+
+def _on_response(response):
+    t0 = response.request.extensions.get("trace_t0")
+    if t0 is None or not _active.get(): return
+    kind, target, op = classify(response.request)
+    record(kind, target, op, (time.perf_counter() - t0) * 1000, response.status_code)
+
+
+def instrument_httpx(client):
+    """Adiciona os ganchos a um httpx.Client (idempotente)."""
+    if not ENABLED or _on_request in client.event_hooks["request"]: return client
+    hooks = client.event_hooks
+    hooks["request"].append(_on_request)
+    hooks["response"].append(_on_response)
+    client.event_hooks = hooks
+    return client
+
+
+def instrument_supabase(supabase, url):
+    """Liga os ganchos nos clientes httpx do PostgREST e do Storage do supabase-py."""
+    _supabase_hosts.add(urllib.parse.urlsplit(url or "").hostname)
+    for client in {id(c): c for c in (supabase.postgrest.session, supabase.storage.session,
+                                         supabase.storage._client)}.values():
+        instrument_httpx(client)
+    return supabase
+
+
+# --- FLASK ---
+
+def server_timing(log, total_ms):
+    summary, _ = log.summary()
+    parts = [f'{k};dur={summary[k]["ms"]};desc="{summary[k]["count"]} chamadas"' for k in KINDS if k in summary]
+    parts.append(f"app;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """before/after_request: abre um CallLog por requisição, grava Server-Timing e a linha de log."""
+    if not ENABLED: return
+    from flask import g, request
+
+    @app.before_request
+    def _trace_start():
+        g._trace = collecting()
+        g._trace_log = g._trace.__enter__()
+
+    @app.after_request
+    def _trace_finish(response):
+        log = g.pop('_trace_log', None)
+        if log is None: return response
+        total_ms = (time.perf_counter() - log.started) * 1000
+        response.headers["Server-Timing"] = server_timing(log, total_ms)
+        summary, repeated = log.summary()
+        if log.calls or total_ms > 500:
+            app.logger.info(json.dumps({
+                "event": "request_trace", "method": request.method, "route": request.url_rule.rule if request.url_rule else request.path,
+                "status": response.status_code, "ms": round(total_ms, 1), "calls": summary,
+                "top": [{"call": call, "n": n} for call, n in repeated if n > 1],
+            }, ensure_ascii=False))
+        return response
+
+    @app.teardown_request
+    def _trace_close(exc):
+        trace = g.pop('_trace', None)
+        if trace is not None: trace.__exit__(None, None, None)
+
+
+@contextmanager
+def query_budget(max_calls, kind="db"):
+    """Falha (AssertionError) se o bloco fizer mais de `max_calls` chamadas do tipo `kind` (None = todas)."""
+    with collecting() as log:
+        yield log
+    used = log.count(kind)
+    if used > max_calls:
+        raise AssertionError(f"Orçamento de chamadas {kind or 'backend'} estourado: {used} > {max_calls}\n{log.describe()}")
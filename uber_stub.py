@@ -0,0 +1,99 @@
+"""
+Servidor local que imita o OAuth e a cotação do Uber Direct, para testes.
+
+    python uber_stub.py --port 8089 --expires-in 3600 --latency 0.2
+
+    UBER_AUTH_URL=http://127.0.0.1:8089/oauth/v2/token \\
+    UBER_API_URL=http://127.0.0.1:8089/v1/delivery python app.py
+
+GET /__stats devolve quantas chamadas de token e de cotação chegaram;
+é o jeito de conferir que o cache está segurando as idas ao "Uber".
+Em testes, `start_stub()` sobe o mesmo servidor numa thread.
+"""
+import json
+import time
+import zlib
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class UberStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args): pass
+
+    def _reply(self, status, body):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if 'json' in self.headers.get('Content-Type', ''): return json.loads(raw or b'{}')
+        return dict(urllib.parse.parse_qsl(raw.decode()))
+
+    def do_GET(self):
+        if self.path == '/__stats': return self._reply(200, self.server.stats)
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self._body()
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            if self.path.endswith('/oauth/v2/token'):
+                self.server.stats["token"] += 1
+                n = self.server.stats["token"]
+                if body.get('grant_type') != 'client_credentials':
+                    return self._reply(400, {"error": "unsupported_grant_type"})
+                token = f"stub-token-{n}"
+                self.server.valid_tokens.add(token)
+                return self._reply(200, {"access_token": token, "token_type": "Bearer", "expires_in": self.server.expires_in})
+
+            if self.path.endswith('/quote'):
+                self.server.stats["quote"] += 1
+                token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+                if token not in self.server.valid_tokens:
+                    return self._reply(401, {"code": "unauthorized"})
+                # Tarifa determinística pelo par de endereços (em centavos, como a API real)
+                key = f"{body.get('pickup_address')}|{body.get('dropoff_address')}".encode()
+                return self._reply(200, {"fee": 800 + zlib.crc32(key) % 2000, "currency": "brl"})
+
+        self._reply(404, {"error": "not found"})
+
+
+def make_server(host='127.0.0.1', port=0, expires_in=3600, latency=0.0):
+    server = ThreadingHTTPServer((host, port), UberStubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.stats = {"token": 0, "quote": 0}
+    server.valid_tokens = set()
+    server.expires_in = expires_in
+    server.latency = latency
+    return server
+
+
+def start_stub(port=0, expires_in=3600, latency=0.0):
+    """Sobe o stub numa thread daemon. Retorna (server, base_url)."""
+    server = make_server(port=port, expires_in=expires_in, latency=latency)
+    threading.Thread(target=server.serve_forever, name="uber-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local do Uber Direct")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--expires-in', type=int, default=3600, help="validade do token em segundos")
+    parser.add_argument('--latency', type=float, default=0.0, help="atraso artificial por chamada (s)")
+    args = parser.parse_args()
+
+    server = make_server(port=args.port, expires_in=args.expires_in, latency=args.latency)
+    base = f"http://127.0.0.1:{args.port}"
+    print(f"Stub Uber Direct em {base}")
+    print(f"  UBER_AUTH_URL={base}/oauth/v2/token")
+    print(f"  UBER_API_URL={base}/v1/delivery")
+    server.serve_forever()
@@ -1,54 +1,141 @@
-import requests
 import os
+import json
+import time
+import threading
+from cachetools import TTLCache
 from dotenv import load_dotenv
+import http_utils
+from search_utils import tokenize
 
 load_dotenv()
 
+TOKEN_REFRESH_MARGIN = 60  # renova um pouco antes de expirar
+DEFAULT_TOKEN_LIFETIME = 3600  # quando a resposta não traz expires_in
+QUOTE_TTL = int(os.getenv("UBER_QUOTE_TTL", "120"))
+DEFAULT_FEE = 15.00
+
+
+def normalize_address(address):
+    """'Av. Paulista, 1000 ' e 'av paulista 1000' viram a mesma chave."""
+    if isinstance(address, dict): address = json.dumps(address, sort_keys=True, ensure_ascii=False)
+    return " ".join(tokenize(address))
+
+
+class TokenCache:
+    """Token OAuth compartilhado entre instâncias; só uma thread renova por vez."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.token = None
+        self.expires_at = 0.0
+        self.fetches = 0
+
+    def get(self, fetch):
+        if self.token and time.time() < self.expires_at: return self.token
+        with self._lock:
+            # Outra thread pode ter renovado enquanto esta esperava
+            if self.token and time.time() < self.expires_at: return self.token
+            token, expires_in = fetch()
+            self.fetches += 1
+            if token:
+                self.token = token
+                self.expires_at = time.time() + max(0, int(expires_in or DEFAULT_TOKEN_LIFETIME) - TOKEN_REFRESH_MARGIN)
+            return token
+
+    def invalidate(self):
+        with self._lock:
+            self.token, self.expires_at = None, 0.0
+
+
 class UberDirect:
+    # Cache de processo: as instâncias são baratas, o token e as cotações não
+    _tokens = TokenCache()
+    _quotes = TTLCache(maxsize=2048, ttl=QUOTE_TTL)
+    _quotes_lock = threading.Lock()
+    _inflight = {}
+
     def __init__(self):
         self.client_id = os.getenv("UBER_CLIENT_ID")
         self.client_secret = os.getenv("UBER_CLIENT_SECRET")
         self.customer_id = os.getenv("UBER_CUSTOMER_ID")
-        self.base_url = "https://api.uber.com/v1/delivery"
-        self.auth_url = "https://auth.uber.com/oauth/v2/token"
+        self.base_url = os.getenv("UBER_API_URL", "https://api.uber.com/v1/delivery")
+        self.auth_url = os.getenv("UBER_AUTH_URL", "https://auth.uber.com/oauth/v2/token")
 
-    def get_token(self):
+    def _fetch_token(self):
         payload = {
             'client_id': self.client_id,
             'client_secret': self.client_secret,
             'grant_type': 'client_credentials',
             'scope': 'direct.delivery'
         }
-        res = requests.post(self.auth_url, data=payload)
+        res = http_utils.request('POST', self.auth_url, data=payload)
         if res.status_code == 200:
-            return res.json().get('access_token')
-        return None
-
-    def estimate_delivery(self, pickup_address, dropoff_address):
-        token = self.get_token()
-        if not token:
-            return None, "Erro na autenticação Uber"
+            body = res.json()
+            return body.get('access_token'), body.get('expires_in')
+        return None, 0
 
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
+    def get_token(self):
+        return self._tokens.get(self._fetch_token)
 
+    def _quote(self, pickup_address, dropoff_address):
         # Payload simplificado para estimativa
         data = {
             "pickup_address": pickup_address,
             "dropoff_address": dropoff_address,
             "customer_id": self.customer_id
         }
+        for attempt in range(2):
+            token = self.get_token()
+            if not token:
+                return None, "Erro na autenticação Uber"
 
-        # Endpoint de cotação (Quote)
-        res = requests.post(f"{self.base_url}/quote", headers=headers, json=data)
+            headers = {
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json'
+            }
+            # Endpoint de cotação (Quote)
+            res = http_utils.request('POST', f"{self.base_url}/quote", headers=headers, json=data)
+            if res.status_code == 401 and attempt == 0:
+                self._tokens.invalidate()  # revogado antes do prazo: renova uma vez
+                continue
+            break
 
         if res.status_code == 200:
             quote = res.json()
             return quote.get('fee') / 100, None # Uber cost is in cents
 
-        return 15.00, f"Erro Uber: {res.text}" # Valor padrão caso falhe
+        return DEFAULT_FEE, f"Erro Uber: {res.text}" # Valor padrão caso falhe
+
+    def estimate_delivery(self, pickup_address, dropoff_address):
+        """
+        Cotação memorizada por (coleta, entrega) normalizados durante QUOTE_TTL.
+        Pedidos simultâneos do mesmo par esperam a mesma chamada. Erros não entram no cache.
+        """
+        key = (normalize_address(pickup_address), normalize_address(dropoff_address))
+        with self._quotes_lock:
+            cached = self._quotes.get(key)
+            if cached is not None: return cached, None
+            pending = self._inflight.get(key)
+            if pending is None: pending = self._inflight[key] = threading.Lock()
+
+        with pending:
+            with self._quotes_lock:
+                cached = self._quotes.get(key)
+            if cached is not None: return cached, None
+            try:
+                fee, error = self._quote(pickup_address, dropoff_address)
+                if not error:
+                    with self._quotes_lock: self._quotes[key] = fee
+                return fee, error
+            finally:
+                # Só remove o próprio lock: outra leva pode já ter registrado um novo para a chave
+                with self._quotes_lock:
+                    if self._inflight.get(key) is pending: del self._inflight[key]
+
+    @classmethod
+    def stats(cls):
+        with cls._quotes_lock:
+            return {"token_fetches": cls._tokens.fetches, "token_valid_for": max(0, int(cls._tokens.expires_at - time.time())),
+                    "quotes_cached": len(cls._quotes), "quote_ttl": QUOTE_TTL}
 
 if __name__ == "__main__":
     uber = UberDirect()
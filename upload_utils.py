@@ -0,0 +1,102 @@
+"""
+Uploads do painel (logo, imagens de produto, catálogo CSV/JSONL) sem
+carregar o arquivo inteiro na memória do worker.
+
+- O parser multipart grava cada arquivo num SpooledTemporaryFile: fica em
+  memória até UPLOAD_SPOOL_BYTES e vai para disco depois disso.
+- Cada rota tem seu teto (`@upload_limit`), aplicado enquanto o corpo é
+  lido, mesmo sem content-length: estourou, 413 antes de chegar na view.
+- O tipo vem dos magic bytes, nunca da extensão do nome do arquivo.
+- O sha256 sai numa passada em blocos; o que vai para o Storage é um
+  leitor sobre o mesmo arquivo temporário, enviado em blocos pelo httpx.
+
+    @upload_limit(LOGO_MAX_BYTES)
+    def rota():
+        with open_image_upload(request.files.get('file'), LOGO_MAX_BYTES) as upload:
+            if upload: bucket.upload(nome, upload["source"], ...)
+"""
+import io
+import os
+import hashlib
+import tempfile
+from functools import wraps
+from contextlib import contextmanager
+
+from flask import Request, request, abort
+
+from image_utils import sniff_image_type, MAX_IMAGE_BYTES, CHUNK_SIZE
+
+MB = 1024 * 1024
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_KB", "512")) * 1024
+LOGO_MAX_BYTES = int(os.getenv("LOGO_MAX_MB", "2")) * MB
+PRODUCT_IMAGE_MAX_BYTES = MAX_IMAGE_BYTES
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_MB", "64")) * MB
+# Teto global (MAX_CONTENT_LENGTH): o maior das rotas; as demais apertam com @upload_limit
+MAX_UPLOAD_BYTES = max(LOGO_MAX_BYTES, PRODUCT_IMAGE_MAX_BYTES, IMPORT_MAX_BYTES)
+FORM_OVERHEAD = 64 * 1024  # campos de texto e cabeçalhos multipart que vêm junto do arquivo
+
+
+class UploadRequest(Request):
+    """Request do app: arquivos do multipart vão para um spool com limite configurável."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='w+b')
+
+
+def upload_limit(max_bytes):
+    """
+    Teto do corpo da requisição para a rota. O formulário é lido aqui, antes
+    da view: um 413 não cai no try/except genérico das rotas.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request.max_content_length = max_bytes + FORM_OVERHEAD
+            if request.content_length and request.content_length > request.max_content_length: abort(413)
+            if request.method == 'POST': request.files  # noqa: B018  (dispara o parse com o teto da rota)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _reader(stream):
+    """Leitor só-leitura sobre o arquivo em disco (storage3 aceita BufferedReader e envia em blocos)."""
+    return open(os.dup(stream.fileno()), 'rb')
+
+
+@contextmanager
+def open_image_upload(file, max_bytes=PRODUCT_IMAGE_MAX_BYTES):
+    """
+    Entrega {"source", "digest", "ext", "size"} de um FileStorage de imagem,
+    ou None se vazio, maior que `max_bytes` ou sem assinatura de jpg/png/webp/gif.
+    `source` são bytes quando o arquivo coube no spool em memória; senão um
+    leitor do arquivo temporário, fechado ao sair do bloco.
+    """
+    if not file or not file.filename:
+        yield None
+        return
+    stream = file.stream
+    stream.seek(0)
+    head = stream.read(16)
+    ext = sniff_image_type(head)
+    if not ext:
+        yield None
+        return
+
+    sha, size, chunk = hashlib.sha256(head), len(head), head
+    while chunk:
+        chunk = stream.read(CHUNK_SIZE)
+        sha.update(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            yield None
+            return
+    stream.seek(0)
+
+    source = None
+    if size > UPLOAD_SPOOL_BYTES:
+        try: source = _reader(stream)
+        except (AttributeError, OSError, io.UnsupportedOperation): pass  # stream sem arquivo por trás
+    try:
+        yield {"source": source or stream.read(), "digest": sha.hexdigest(), "ext": ext, "size": size}
+    finally:
+        if source: source.close()